@@ -265,6 +265,7 @@ def admin_dashboard(request):
     from projects.models import Project
     from application.models import Application
     from assessment.models import AssessmentSchema, Assessment, StudentSubmission
+    from defaults.dashboard_views import application_rows
     
     # Basic counts
     total_students = Student.objects.count()
@@ -280,9 +281,7 @@ def admin_dashboard(request):
     department_stats = Student.objects.values('department').annotate(count=Count('id')).order_by('-count')
     
     # Recent applications (last 5)
-    recent_applications = Application.objects.select_related(
-        'project'
-    ).order_by('-applied_at')[:5]
+    recent_applications = application_rows(Application.objects.order_by('-applied_at')[:5])
     
     # Recent activities (simulated for now)
     recent_activities = [
@@ -308,26 +307,6 @@ def admin_dashboard(request):
         }
     ]
     
-    # Monthly application trends (last 12 months)
-    monthly_applications = []
-    for i in range(12):
-        month_start = timezone.now().replace(day=1) - timedelta(days=30*i)
-        month_end = month_start.replace(day=28) + timedelta(days=4)
-        month_end = month_end.replace(day=1) - timedelta(days=1)
-        
-        count = Application.objects.filter(
-            applied_at__gte=month_start,
-            applied_at__lte=month_end
-        ).count()
-        
-        monthly_applications.append({
-            'month': month_start.strftime('%b'),
-            'count': count
-        })
-    
-    # Reverse to show oldest to newest
-    monthly_applications.reverse()
-    
     context = {
         'total_students': total_students,
         'total_supervisors': total_supervisors,
@@ -337,7 +316,6 @@ def admin_dashboard(request):
         'department_stats': department_stats,
         'recent_applications': recent_applications,
         'recent_activities': recent_activities,
-        'monthly_applications': monthly_applications,
     }
     
     return render(request, 'admin_dashboard.html', context)
@@ -6,7 +6,7 @@ from django.conf import settings
 from .models import Application, ApplicationMember
 from projects.models import Project
 from django.contrib.auth import get_user_model
-from defaults.models import Notification
+from defaults.notifications import NotificationBatch, notify
 from defaults.decorators import *
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
@@ -52,9 +52,9 @@ def apply_to_project(request, project_id):
             messages.success(request, "Your individual application has been submitted.")
 
             # Notify supervisor
-            Notification.objects.create(
-                user=project.supervisor,
-                message=f"{applicant.get_full_name()} applied to your project '{project.title}'.",
+            notify(
+                project.supervisor_id,
+                f"{applicant.get_full_name()} applied to your project '{project.title}'.",
                 url=reverse('project_detail', args=[project.id])
             )
 
@@ -101,21 +101,20 @@ def apply_to_project(request, project_id):
 
             messages.success(request, "Group application submitted successfully.")
 
-            # Notify supervisor
-            Notification.objects.create(
-                user=project.supervisor,
-                message=f"{applicant.get_full_name()} applied to your project '{project.title}' as a group.",
-                url=reverse('project_detail', args=[project.id])
+            # Notify supervisor and group members except leader, in one insert
+            project_url = reverse('project_detail', args=[project.id])
+            batch = NotificationBatch()
+            batch.add(
+                project.supervisor_id,
+                f"{applicant.get_full_name()} applied to your project '{project.title}' as a group.",
+                url=project_url
             )
-
-            # Notify group members except leader
-            for user in users:
-                if user != applicant:
-                    Notification.objects.create(
-                        user=user,
-                        message=f"You were added by {applicant.get_full_name()} to apply for the project '{project.title}'.",
-                        url=reverse('project_detail', args=[project.id])
-                    )
+            batch.add(
+                [user for user in users if user != applicant],
+                f"You were added by {applicant.get_full_name()} to apply for the project '{project.title}'.",
+                url=project_url
+            )
+            batch.send()
 
         return redirect('project_detail', project_id=project.id)
 
@@ -142,12 +141,12 @@ def accept_application(request, application_id):
         messages.success(request, "Application accepted.")
 
 
-        for member in application.members.all():
-            Notification.objects.create(
-                user=member.user,  # Send notification to each member of the application
-                message=f"Your application to the project '{application.project.title}' has been accepted.",
-                url=reverse('project_detail', args=[application.project.id])  # Redirect to project detail page
-            )
+        # Send notification to each member of the application, in one insert
+        notify(
+            list(application.members.values_list('user_id', flat=True)),
+            f"Your application to the project '{application.project.title}' has been accepted.",
+            url=reverse('project_detail', args=[application.project.id])  # Redirect to project detail page
+        )
     return redirect('supervisor_application')
 
 
@@ -7,4 +7,5 @@ admin.site.register(Assessment)
 admin.site.register(AssessmentDetailFile)
 admin.site.register(AssessmentSampleFile)
 admin.site.register(StudentSubmission)
-admin.site.register(SubmissionFile)
\ No newline at end of file
+admin.site.register(SubmissionFile)
+admin.site.register(UploadSession)
@@ -0,0 +1,107 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.utils.text import get_valid_filename
+from defaults.files import upload_metadata
+from defaults.previews import schedule_previews
+from defaults.storage import add_references, blob_storage
+from .models import AssessmentDetailFile, AssessmentSampleFile
+
+# Form field prefix of each kind of assessment attachment
+ATTACHMENT_FIELDS = (
+    ('assignment_files', AssessmentDetailFile),
+    ('sample_files', AssessmentSampleFile),
+)
+
+# Files read, hashed and written at the same time while saving a form
+UPLOAD_WORKERS = getattr(settings, 'UPLOAD_WORKERS', 4)
+
+
+def collect_attachments(request, assessment, suffix=''):
+    """
+    Detail and sample files uploaded for one assessment of a form, as
+    (model, assessment, upload, name) with the name the admin typed, or the
+    file's own, keeping the file's extension. `suffix` is the assessment's
+    index on the schema forms, e.g. '_2'.
+    """
+    attachments = []
+    for field, model in ATTACHMENT_FIELDS:
+        file_key = f'{field}{suffix}'
+        for i, upload in enumerate(request.FILES.getlist(file_key)):
+            custom_base = request.POST.get(f'{file_key}_name_{i}', '') or os.path.splitext(upload.name)[0]
+            original_ext = os.path.splitext(upload.name)[1]
+            attachments.append((model, assessment, upload, get_valid_filename(f"{custom_base}{original_ext}")))
+    return attachments
+
+
+def allocate_names(attachments):
+    """
+    Give every attachment a name not yet used by its assessment's files of
+    the same kind, adding _1, _2... as before. The names taken are read with
+    one query per model, and each base name keeps its next free suffix, so no
+    candidate is ever checked twice.
+    """
+    taken = set()
+    for model in {model for model, *_ in attachments}:
+        assessment_ids = {assessment.id for kind, assessment, *_ in attachments if kind is model}
+        taken.update(
+            (model, assessment_id, name)
+            for assessment_id, name in model.objects.filter(assessment_id__in=assessment_ids).values_list('assessment_id', 'name')
+        )
+
+    next_suffix = defaultdict(lambda: 1)
+    named = []
+    for model, assessment, upload, name in attachments:
+        base, ext = os.path.splitext(name)
+        key = (model, assessment.id, base, ext)
+        while (model, assessment.id, name) in taken:
+            name = f"{base}_{next_suffix[key]}{ext}"
+            next_suffix[key] += 1
+        taken.add((model, assessment.id, name))
+        named.append((model, assessment, upload, name))
+    return named
+
+
+def _stage(upload, name):
+    # Runs on a worker thread: reads and writes files only, the database stays with the request.
+    # The checksum read for the metadata names the blob too, the upload is hashed once.
+    metadata = upload_metadata(upload)
+    return blob_storage.stage(name, upload, sha256=metadata['sha256']), metadata
+
+
+def save_attachments(attachments):
+    """
+    Store uploaded assessment attachments and create their rows. Files are
+    hashed and written on a bounded thread pool, then filed as blobs and
+    inserted with one bulk_create per model. Returns the created rows.
+    """
+    attachments = allocate_names(attachments)
+    if not attachments:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(attachments)), thread_name_prefix='upload') as pool:
+        futures = [pool.submit(_stage, upload, name) for model, assessment, upload, name in attachments]
+        staged = []
+        try:
+            for future in futures:
+                staged.append(future.result())
+        except Exception:
+            # Leave no half-saved temporary files behind
+            for future in futures:
+                if future.exception() is None:
+                    blob_storage.discard(future.result()[0])
+            raise
+
+    blob_names = blob_storage.commit_many([staged_file for staged_file, metadata in staged])
+    rows = defaultdict(list)
+    for (model, assessment, upload, name), (staged_file, metadata), blob_name in zip(attachments, staged, blob_names):
+        rows[model].append(model(assessment=assessment, name=name, file=blob_name, **metadata))
+
+    created = []
+    for model, objects in rows.items():
+        created += model.objects.bulk_create(objects)
+    # bulk_create sends no post_save, so count the blob references and queue the previews here
+    add_references(row.file.name for row in created)
+    schedule_previews(created)
+    return created
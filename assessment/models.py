@@ -1,7 +1,11 @@
-from django.db import models
+import uuid
+from django.db import models, transaction
 from django.utils import timezone
+from django.urls import reverse
 from django.conf import settings
 from projects.models import *
+from defaults.models import FileMetadata, preview_upload_path
+from defaults.storage import blob_storage, private_storage
 
 
 
@@ -45,23 +49,29 @@ class Assessment(models.Model):
         return f"{self.title} ({self.weight}%)"
 
 
-class AssessmentDetailFile(models.Model):
+class AssessmentDetailFile(FileMetadata):
     assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name='detail_files')
     name = models.CharField(max_length=255, help_text="Descriptive name for this file (e.g., 'Assignment Guidelines')")
-    file = models.FileField(upload_to=assignment_detail_upload_path)
+    file = models.FileField(upload_to=assignment_detail_upload_path, storage=blob_storage)
 
     def __str__(self):
         return self.name
 
+    def get_absolute_url(self):
+        return reverse('assessment_detail_file', args=[self.pk])
 
-class AssessmentSampleFile(models.Model):
+
+class AssessmentSampleFile(FileMetadata):
     assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name='sample_files')
     name = models.CharField(max_length=255, help_text="Descriptive name for this file (e.g., 'Sample Report')")
-    file = models.FileField(upload_to=sample_file_upload_path)
+    file = models.FileField(upload_to=sample_file_upload_path, storage=blob_storage)
 
     def __str__(self):
         return self.name
 
+    def get_absolute_url(self):
+        return reverse('assessment_sample_file', args=[self.pk])
+
 from django.utils import timezone
 
 class StudentSubmission(models.Model):
@@ -75,6 +85,23 @@ class StudentSubmission(models.Model):
     grades_received = models.PositiveIntegerField(blank=True, null=True)
     feedback = models.CharField(max_length=255, blank=True, null=True)
     is_late = models.BooleanField(default=False)  # New field to track late submissions
+    graded_at = models.DateTimeField(blank=True, null=True)  # When the submission was first graded
+    # Newest attempt of its owner for the assessment, see same_owner(), maintained by save()
+    is_latest = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            # Grading queue: newest first within an assessment, keyset paginated
+            models.Index(fields=['assignment', 'submitted_at', 'id'], name='submission_queue_idx'),
+        ]
+        constraints = [
+            # One latest attempt per student, application and assessment, also the
+            # partial index of latest attempts most figures are computed from. The
+            # database cannot see the submission type, save() keeps group
+            # assessments to one latest attempt per application.
+            models.UniqueConstraint(fields=['assignment', 'application', 'submitted_by'],
+                                    condition=models.Q(is_latest=True), name='submission_latest_unique'),
+        ]
 
     def __str__(self):
         return f"{self.assignment.title} (Attempt {self.attempt_number})"
@@ -84,14 +111,103 @@ class StudentSubmission(models.Model):
         if not self.pk:  # Only for new submissions
             if timezone.now().date() > self.assignment.due_date:
                 self.is_late = True
-        super().save(*args, **kwargs)
+        if self.grades_received is not None and self.graded_at is None:
+            self.graded_at = timezone.now()
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            self.lock_attempts(self.application_id)
+            attempts = StudentSubmission.objects.filter(
+                self.same_owner(self.submitted_by_id), application_id=self.application_id, assignment_id=self.assignment_id,
+            )
+            self.is_latest = not attempts.filter(attempt_number__gt=self.attempt_number).exists()
+            if self.is_latest:
+                # The new attempt takes over from the previous latest one
+                attempts.filter(is_latest=True).update(is_latest=False)
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def lock_attempts(cls, application_id):
+        """
+        Lock the application row until the transaction ends, so attempts of
+        the same application are numbered and flagged one after the other.
+        """
+        application_model = cls._meta.get_field('application').related_model
+        list(application_model.objects.select_for_update().filter(pk=application_id).values_list('pk', flat=True))
+
+    @staticmethod
+    def same_owner(submitted_by):
+        """
+        Attempts that follow on from each other: every attempt of the application
+        for group assessments, the student's own attempts for individual ones.
+        `submitted_by` may be an OuterRef.
+        """
+        return models.Q(assignment__submission_type='group') | models.Q(submitted_by=submitted_by)
+
+    @classmethod
+    def next_attempt_number(cls, application, assignment, submitted_by):
+        """Number of the owner's next attempt, call inside the transaction that creates it."""
+        cls.lock_attempts(application.pk)
+        return cls.objects.filter(cls.same_owner(submitted_by), application=application, assignment=assignment).count() + 1
+
+
+
+
+class SubmissionFile(FileMetadata):
+    submission = models.ForeignKey(StudentSubmission, on_delete=models.CASCADE, related_name='files')
+    file = models.FileField(upload_to=student_submission_upload_path, storage=blob_storage)
+    # Shows a student's work, so only submission_file_thumbnail serves it
+    thumbnail = models.ImageField(upload_to=preview_upload_path, storage=private_storage, blank=True)
 
+    def __str__(self):
+        return f"SubmissionFile #{self.id}"
 
+    def get_absolute_url(self):
+        # Served through a view that checks access, never straight from MEDIA_URL
+        return reverse('submission_file', args=[self.pk])
 
 
-class SubmissionFile(models.Model):
-    submission = models.ForeignKey(StudentSubmission, on_delete=models.CASCADE, related_name='files')
-    file = models.FileField(upload_to=student_submission_upload_path)
+class UploadSession(models.Model):
+    """A submission file being uploaded in chunks, see assessment/uploads.py."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name='upload_sessions')
+    application = models.ForeignKey('application.Application', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    total_chunks = models.PositiveIntegerField()
+    # Client supplied key (name, size, modification time) so the same file resumes its session
+    fingerprint = models.CharField(max_length=255, blank=True)
+    # Optional SHA-256 of the whole file, checked once the chunks are assembled
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'assessment', 'fingerprint'], name='upload_session_resume_idx'),
+        ]
+
+    def __str__(self):
+        return f"Upload of {self.filename} by {self.user}"
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='upload_chunk_unique'),
+        ]
 
     def __str__(self):
-        return f"SubmissionFile #{self.id}"
\ No newline at end of file
+        return f"Chunk {self.index} of {self.session_id}"
@@ -1,3 +1,183 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.views.static import serve
+from accounts.models import User
+from defaults import media
+from application.models import Application, ApplicationMember
+from projects.models import Project
+from . import uploads
+from .models import *
 
-# Create your tests here.
+
+class SubmissionTestCase(TestCase):
+    """One accepted individual application with an open assessment, files kept in temporary folders."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = User.objects.create_user('sup', 'sup@example.com', 'pw', is_staff=True)
+        cls.student = User.objects.create_user('student', 'student@example.com', 'pw')
+        cls.other_student = User.objects.create_user('other', 'other@example.com', 'pw')
+        project = Project.objects.create(
+            title='Project', project_type='Research', prerequisites='-', description='-', supervisor=cls.supervisor,
+        )
+        schema = AssessmentSchema.objects.create(name='Schema', start_date=date.today(), end_date=date.today())
+        cls.assessment = Assessment.objects.create(
+            schema=schema, title='Report', weight=100, submission_type='individual',
+            due_date=date.today() + timedelta(days=7), submit_by=date.today() + timedelta(days=7),
+        )
+        cls.application = Application.objects.create(project=project, application_type='individual', status='accepted')
+        ApplicationMember.objects.create(application=cls.application, user=cls.student, is_leader=True)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        staging_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, staging_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, PRIVATE_MEDIA_ROOT=os.path.join(media_root, 'private'))
+        media.enable()
+        self.addCleanup(media.disable)
+        for patcher in (
+            mock.patch.object(uploads, 'UPLOAD_STAGING_ROOT', staging_root),
+            mock.patch.object(uploads, 'UPLOAD_CHUNK_SIZE', 10),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class ChunkedUploadTests(SubmissionTestCase):
+    data = b'0123456789abcdefghijklmnopqrstuvwxyz'
+
+    def start(self):
+        return uploads.start_upload(
+            self.student, self.assessment, self.application, 'report.txt', len(self.data), fingerprint='report',
+        )
+
+    def send(self, session, index, body=None, checksum=None):
+        if body is None:
+            body = self.data[index * session.chunk_size:(index + 1) * session.chunk_size]
+        return uploads.receive_chunk(session, index, io.BytesIO(body), checksum or hashlib.sha256(body).hexdigest())
+
+    def test_short_chunk_is_rejected(self):
+        session = self.start()
+        with self.assertRaises(uploads.UploadError) as raised:
+            self.send(session, 0, body=b'abc')
+        self.assertIn('should be 10 bytes', str(raised.exception))
+        self.assertFalse(session.chunks.exists())
+
+    def test_bad_checksum_is_rejected(self):
+        session = self.start()
+        with self.assertRaises(uploads.UploadError) as raised:
+            self.send(session, 0, checksum='0' * 64)
+        self.assertEqual(raised.exception.status, 400)
+        self.assertFalse(session.chunks.exists())
+
+    def test_resume_returns_received_chunks(self):
+        session = self.start()
+        self.send(session, 0)
+        self.send(session, 2)
+        resumed = self.start()
+        self.assertEqual(resumed.pk, session.pk)
+        self.assertEqual(uploads.upload_status(resumed)['received'], [0, 2])
+
+    def test_submit_refuses_missing_chunks(self):
+        session = self.start()
+        self.send(session, 0)
+        with self.assertRaises(uploads.UploadError) as raised:
+            uploads.submit_uploads(self.student, self.assessment, self.application, [session.pk])
+        self.assertEqual(raised.exception.status, 409)
+        self.assertFalse(StudentSubmission.objects.exists())
+
+    def test_submit_creates_one_attempt(self):
+        session = self.start()
+        for index in range(session.total_chunks):
+            self.send(session, index)
+        submission = uploads.submit_uploads(self.student, self.assessment, self.application, [session.pk])
+        submission_file = submission.files.get()
+        self.assertEqual(submission_file.original_name, 'report.txt')
+        self.assertEqual(submission_file.sha256, hashlib.sha256(self.data).hexdigest())
+        with submission_file.file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.data)
+
+        # Submitting the same uploads again, e.g. a double click, makes no second attempt
+        with self.assertRaises(uploads.UploadError):
+            uploads.submit_uploads(self.student, self.assessment, self.application, [session.pk])
+        self.assertEqual(StudentSubmission.objects.count(), 1)
+
+
+class SubmissionFileDownloadTests(SubmissionTestCase):
+    data = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        submission = StudentSubmission.objects.create(
+            application=self.application, assignment=self.assessment, submitted_by=self.student,
+        )
+        self.file = SubmissionFile.objects.create(submission=submission, file=ContentFile(self.data, name='report.txt'))
+        self.url = reverse('submission_file', args=[self.file.pk])
+        self.client.force_login(self.student)
+
+    def test_members_supervisor_and_admin_can_download(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        for user in (self.student, self.supervisor, admin):
+            self.client.force_login(user)
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_others_get_404(self):
+        other_supervisor = User.objects.create_user('sup2', 'sup2@example.com', 'pw', is_staff=True)
+        for user in (self.other_student, other_supervisor):
+            self.client.force_login(user)
+            self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], f'"{self.file.sha256}"')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-24')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-24:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_if_range(self):
+        etag = f'"{self.file.sha256}"'
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        # The client holds part of another version, it gets the whole file
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_not_reachable_under_media_url(self):
+        name = self.file.file.name
+        self.assertTrue(self.file.file.path.startswith(settings.PRIVATE_MEDIA_ROOT))
+        # What the /media/ route, static() in DEBUG or the web server's alias, would serve
+        request = RequestFactory().get(settings.MEDIA_URL + name)
+        with self.assertRaises(Http404):
+            serve(request, name, document_root=settings.MEDIA_ROOT)
+
+    def test_accel_redirect_to_the_private_location(self):
+        with mock.patch.object(media, 'MEDIA_DELIVERY', 'x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], settings.PRIVATE_MEDIA_ACCEL_PREFIX + self.file.file.name)
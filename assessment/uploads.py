@@ -0,0 +1,289 @@
+import hashlib
+import math
+import os
+import re
+import shutil
+import uuid
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from defaults.files import inspect_file
+from defaults.storage import blob_storage
+from .models import StudentSubmission, SubmissionFile, UploadChunk, UploadSession, student_submission_upload_path
+
+# Chunks are kept outside MEDIA_ROOT so half-uploaded files are never served
+UPLOAD_STAGING_ROOT = getattr(settings, 'UPLOAD_STAGING_ROOT', os.path.join(settings.BASE_DIR, 'upload_staging'))
+UPLOAD_CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 1024 * 1024)
+SUBMISSION_MAX_UPLOAD_SIZE = getattr(settings, 'SUBMISSION_MAX_UPLOAD_SIZE', 500 * 1024 * 1024)
+# Sessions untouched for this long can no longer be resumed and are cleared by clear_stale_uploads
+UPLOAD_SESSION_TTL = timedelta(seconds=getattr(settings, 'UPLOAD_SESSION_TTL', 24 * 60 * 60))
+
+READ_SIZE = 64 * 1024
+CHECKSUM_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(Exception):
+    """A chunked upload request that cannot be accepted, the message is shown to the student."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class StagedFile(File):
+    # Lets the storage move the assembled file into place instead of copying it
+    def __init__(self, path, name):
+        super().__init__(open(path, 'rb'), name)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def staging_dir(session):
+    return os.path.join(UPLOAD_STAGING_ROOT, str(session.pk))
+
+
+def chunk_path(session, index):
+    return os.path.join(staging_dir(session), f'{index}.part')
+
+
+def active_sessions(user):
+    return UploadSession.objects.filter(user=user, updated_at__gte=timezone.now() - UPLOAD_SESSION_TTL)
+
+
+def upload_status(session):
+    received = sorted(session.chunks.values_list('index', flat=True))
+    return {
+        'upload_id': str(session.pk),
+        'filename': session.filename,
+        'size': session.size,
+        'chunk_size': session.chunk_size,
+        'total_chunks': session.total_chunks,
+        'received': received,
+        'complete': len(received) == session.total_chunks,
+    }
+
+
+def _checksum(value, label):
+    value = (value or '').strip().lower()
+    if not CHECKSUM_PATTERN.match(value):
+        raise UploadError(f"{label} must be a hex SHA-256 digest.")
+    return value
+
+
+def start_upload(user, assessment, application, filename, size, fingerprint='', sha256=''):
+    """
+    Open an upload session for one file, or return the unexpired session
+    already open for the same file so the client can resume it.
+    """
+    filename = os.path.basename(str(filename or '').replace('\\', '/')).strip()[:255]
+    if not filename:
+        raise UploadError("A file name is required.")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("File size must be a number of bytes.")
+    if size <= 0:
+        raise UploadError(f"{filename} is empty.")
+    if size > SUBMISSION_MAX_UPLOAD_SIZE:
+        raise UploadError(f"{filename} is larger than the {SUBMISSION_MAX_UPLOAD_SIZE // (1024 * 1024)} MB limit.", 413)
+    sha256 = _checksum(sha256, "File checksum") if sha256 else ''
+    fingerprint = str(fingerprint or f'{filename}:{size}')[:255]
+
+    existing = active_sessions(user).filter(
+        assessment=assessment, application=application, fingerprint=fingerprint, filename=filename, size=size,
+    ).order_by('-updated_at').first()
+    if existing is not None and existing.sha256 == sha256:
+        return existing
+
+    session = UploadSession.objects.create(
+        user=user,
+        assessment=assessment,
+        application=application,
+        filename=filename,
+        size=size,
+        chunk_size=UPLOAD_CHUNK_SIZE,
+        total_chunks=math.ceil(size / UPLOAD_CHUNK_SIZE),
+        fingerprint=fingerprint,
+        sha256=sha256,
+    )
+    os.makedirs(staging_dir(session), exist_ok=True)
+    return session
+
+
+def receive_chunk(session, index, stream, checksum):
+    """
+    Stream one chunk into the staging area and record it once its size and
+    SHA-256 match. A chunk already received with the same checksum is not read again.
+    """
+    if not 0 <= index < session.total_chunks:
+        raise UploadError(f"Chunk {index} is out of range, the file has {session.total_chunks} chunks.", 404)
+    checksum = _checksum(checksum, "Chunk checksum")
+    expected = session.chunk_length(index)
+
+    existing = session.chunks.filter(index=index).first()
+    if existing is not None and existing.sha256 == checksum and os.path.exists(chunk_path(session, index)):
+        return existing
+
+    os.makedirs(staging_dir(session), exist_ok=True)
+    # Concurrent retries of the same chunk each write their own file, the last verified one wins
+    partial_path = f'{chunk_path(session, index)}.{uuid.uuid4().hex}'
+    digest = hashlib.sha256()
+    received = 0
+    try:
+        with open(partial_path, 'wb') as out:
+            while received <= expected:
+                data = stream.read(min(READ_SIZE, expected + 1 - received))
+                if not data:
+                    break
+                digest.update(data)
+                received += len(data)
+                out.write(data)
+        if received != expected:
+            raise UploadError(f"Chunk {index} should be {expected} bytes, received {received}.")
+        if digest.hexdigest() != checksum:
+            raise UploadError(f"Chunk {index} does not match its checksum, please resend it.")
+        os.replace(partial_path, chunk_path(session, index))
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    chunk, _ = UploadChunk.objects.update_or_create(
+        session=session, index=index, defaults={'size': received, 'sha256': checksum, 'received_at': timezone.now()},
+    )
+    # Keeps the session from expiring while it is being uploaded
+    UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+    return chunk
+
+
+def _assemble(session):
+    """Concatenate the verified chunks into one staged file, checking every chunk again as it is read."""
+    chunks = {chunk.index: chunk for chunk in session.chunks.all()}
+    missing = [index for index in range(session.total_chunks) if index not in chunks]
+    if missing:
+        raise UploadError(f"{session.filename} is missing {len(missing)} of {session.total_chunks} chunks.", 409)
+
+    # Named per request so concurrent submits never write into the same file
+    path = os.path.join(staging_dir(session), f'assembled.{uuid.uuid4().hex}')
+    try:
+        with open(path, 'wb') as out:
+            for index in range(session.total_chunks):
+                digest = hashlib.sha256()
+                try:
+                    with open(chunk_path(session, index), 'rb') as part:
+                        for data in iter(lambda: part.read(READ_SIZE), b''):
+                            digest.update(data)
+                            out.write(data)
+                except FileNotFoundError:
+                    chunks[index].delete()
+                    raise UploadError(f"Chunk {index} of {session.filename} was lost, please resend it.", 409)
+                if digest.hexdigest() != chunks[index].sha256:
+                    # Drop the damaged chunk so the client's status check asks for it again
+                    chunks[index].delete()
+                    raise UploadError(f"Chunk {index} of {session.filename} is damaged, please resend it.", 409)
+    except UploadError:
+        os.remove(path)
+        raise
+    return path
+
+
+def _remove_staging(paths):
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def submit_uploads(user, assessment, application, upload_ids):
+    """
+    Create the next attempt at the assessment from completed upload sessions,
+    one SubmissionFile per session in the given order. Nothing is created
+    unless every chunk of every file is present and verified.
+    """
+    upload_ids = list(dict.fromkeys(str(upload_id) for upload_id in upload_ids or []))
+    if not upload_ids:
+        raise UploadError("Please upload at least one file.")
+    try:
+        upload_ids = [uuid.UUID(upload_id) for upload_id in upload_ids]
+    except ValueError:
+        raise UploadError("Unknown upload.", 404)
+
+    sessions = {
+        session.pk: session
+        for session in active_sessions(user).filter(pk__in=upload_ids, assessment=assessment, application=application)
+    }
+    if len(sessions) != len(upload_ids):
+        raise UploadError("Some uploads have expired or were already submitted, please upload them again.", 404)
+    sessions = [sessions[upload_id] for upload_id in upload_ids]
+
+    # Assembled outside the transaction so damaged chunks stay dropped when this fails
+    staged = []
+    try:
+        for session in sessions:
+            path = _assemble(session)
+            staged.append(path)
+            with open(path, 'rb') as assembled:
+                metadata = inspect_file(File(assembled), session.filename)
+            if metadata['size'] != session.size:
+                raise UploadError(f"{session.filename} should be {session.size} bytes, received {metadata['size']}.", 409)
+            if session.sha256 and metadata['sha256'] != session.sha256:
+                raise UploadError(f"{session.filename} does not match its checksum.", 409)
+            session.metadata = metadata
+
+        with transaction.atomic():
+            # Locked so a double-clicked submit cannot turn the same uploads into two attempts
+            locked = list(active_sessions(user).select_for_update().filter(pk__in=upload_ids).values_list('pk', flat=True))
+            if len(locked) != len(upload_ids):
+                raise UploadError("These uploads were already submitted.", 409)
+
+            submission = StudentSubmission.objects.create(
+                application=application,
+                assignment=assessment,
+                submitted_by=user,
+                attempt_number=StudentSubmission.next_attempt_number(application, assessment, user),
+            )
+            for session, path in zip(sessions, staged):
+                name = student_submission_upload_path(SubmissionFile(submission=submission), session.filename)
+                staged_file = StagedFile(path, session.filename)
+                try:
+                    # Hashed once already by inspect_file above
+                    name = blob_storage.commit(blob_storage.stage(name, staged_file, sha256=session.metadata['sha256']))
+                finally:
+                    staged_file.close()
+                SubmissionFile.objects.create(
+                    submission=submission, file=name, original_name=session.filename, **session.metadata,
+                )
+
+            UploadSession.objects.filter(pk__in=upload_ids).delete()
+            transaction.on_commit(partial(_remove_staging, [staging_dir(session) for session in sessions]))
+    finally:
+        # Files moved into storage are gone already, these are left from a failed submit
+        for path in staged:
+            if os.path.exists(path):
+                os.remove(path)
+    return submission
+
+
+def discard_upload(session):
+    path = staging_dir(session)
+    session.delete()
+    _remove_staging([path])
+
+
+def clear_stale_uploads():
+    """Delete expired sessions and staging folders left without a session. Returns how many were removed."""
+    stale = UploadSession.objects.filter(updated_at__lt=timezone.now() - UPLOAD_SESSION_TTL)
+    paths = [os.path.join(UPLOAD_STAGING_ROOT, str(pk)) for pk in stale.values_list('pk', flat=True)]
+    stale.delete()
+    if os.path.isdir(UPLOAD_STAGING_ROOT):
+        # Folders of sessions removed along with their assessment or user
+        known = {str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)}
+        cutoff = (timezone.now() - UPLOAD_SESSION_TTL).timestamp()
+        for name in os.listdir(UPLOAD_STAGING_ROOT):
+            path = os.path.join(UPLOAD_STAGING_ROOT, name)
+            if name not in known and path not in paths and os.path.getmtime(path) < cutoff:
+                paths.append(path)
+    _remove_staging(paths)
+    return len(paths)
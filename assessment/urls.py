@@ -10,6 +10,14 @@ urlpatterns = [
     path('delete_assessment/<int:id>/', views.delete_assessment, name='delete_assessment'),
     path('student_view_assignment', views.student_view_assignment, name='student_view_assignment'),
     path('attempt_assessment/<int:id>', views.attempt_assessment, name='attempt_assessment'),
+    path('attempt_assessment/<int:id>/uploads/', views.start_upload, name='start_upload'),
+    path('attempt_assessment/<int:id>/uploads/submit/', views.submit_uploads, name='submit_uploads'),
+    path('uploads/<uuid:upload_id>/', views.upload_status, name='upload_status'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>', views.upload_chunk, name='upload_chunk'),
+    path('files/<int:file_id>/', views.submission_file, name='submission_file'),
+    path('files/<int:file_id>/thumbnail/', views.submission_file_thumbnail, name='submission_file_thumbnail'),
+    path('details/<int:file_id>/', views.assessment_detail_file, name='assessment_detail_file'),
+    path('samples/<int:file_id>/', views.assessment_sample_file, name='assessment_sample_file'),
     path('view_individual/<int:assessment_id>/', views.view_individual_submission, name='view_individual_submission'),
     path('view_group/<int:assessment_id>/', views.view_group_submission, name='view_group_submission'),
 
@@ -1,19 +1,26 @@
+import json
 import os
 from datetime import date
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from django.utils import timezone
-from django.utils.text import get_valid_filename
-from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.db import transaction
-from django.db.models import Avg, Sum, Count, Q
+from django.db.models import Avg, Sum, Count, Exists, OuterRef, Q
 from django.utils.dateparse import parse_date
 from django.contrib.auth.decorators import login_required
 from defaults.decorators import *
 
 from .models import *
 from application.models import *
+from grading.results import get_final_mark
+from defaults.media import serve_file
+from defaults.storage import blob_storage
+from .attachments import collect_attachments, save_attachments
+from . import uploads
 
 @is_admin
 @login_required
@@ -72,6 +79,7 @@ def create_assessment_schema(request):
                 return render(request, 'assessment/create_schema.html')
 
             # Process each assignment
+            attachments = []
             for idx in assignment_indices:
                 name = request.POST.get(f'assignment_name_{idx}')
                 due_date = parse_date(request.POST.get(f'assignment_due_{idx}'))
@@ -104,56 +112,10 @@ def create_assessment_schema(request):
                     submission_type=submission_type
                 )
 
-                # Helper function to process uploaded files
-                def process_uploaded_files(file_key, base_path, model_class):
-                    if file_key in request.FILES:
-                        for i, file in enumerate(request.FILES.getlist(file_key)):
-                            # Get custom name from form or use original name
-                            custom_base = request.POST.get(f'{file_key}_name_{i}', '')
-                            if not custom_base:  # If no custom name provided
-                                custom_base = os.path.splitext(file.name)[0]
-                            
-                            # Preserve original extension
-                            original_ext = os.path.splitext(file.name)[1]
-                            custom_name = f"{custom_base}{original_ext}"
-                            
-                            # Sanitize filename
-                            custom_name = get_valid_filename(custom_name)
-                            
-                            # Create file path
-                            file_path = f"{base_path}/schema_{schema.id}/assessment_{assignment.id}/{custom_name}"
-                            
-                            # Handle duplicate filenames
-                            base, ext = os.path.splitext(custom_name)
-                            counter = 1
-                            while default_storage.exists(file_path):
-                                custom_name = f"{base}_{counter}{ext}"
-                                file_path = f"{base_path}/schema_{schema.id}/assessment_{assignment.id}/{custom_name}"
-                                counter += 1
-
-                            # Save file
-                            default_storage.save(file_path, file)
-                            
-                            # Create database record
-                            model_class.objects.create(
-                                assessment=assignment,
-                                name=custom_name,
-                                file=file_path
-                            )
-
-                # Process assignment detail files
-                process_uploaded_files(
-                    file_key=f'assignment_files_{idx}',
-                    base_path='assessment_details/details',
-                    model_class=AssessmentDetailFile
-                )
+                # Files are saved together once every assessment exists
+                attachments += collect_attachments(request, assignment, f'_{idx}')
 
-                # Process sample files
-                process_uploaded_files(
-                    file_key=f'sample_files_{idx}',
-                    base_path='assessment_samples/samples',
-                    model_class=AssessmentSampleFile
-                )
+            save_attachments(attachments)
 
             messages.success(request, "Assessment schema created successfully!")
             return redirect('assessment_schema')
@@ -241,6 +203,7 @@ def edit_schema(request, id):
                 # Replace assessments
                 schema.assessments.all().delete()
 
+                attachments = []
                 for item in assignments_to_create:
                     assignment = Assessment.objects.create(
                         schema=schema,
@@ -252,41 +215,10 @@ def edit_schema(request, id):
                         submission_type=item['submission_type']
                     )
 
-                    # Helper for files
-                    def process_uploaded_files(file_key, base_path, model_class):
-                        if file_key in request.FILES:
-                            for i, file in enumerate(request.FILES.getlist(file_key)):
-                                custom_base = request.POST.get(f'{file_key}_name_{i}', '') or os.path.splitext(file.name)[0]
-                                original_ext = os.path.splitext(file.name)[1]
-                                custom_name = get_valid_filename(f"{custom_base}{original_ext}")
-                                file_path = f"{base_path}/schema_{schema.id}/assessment_{assignment.id}/{custom_name}"
-
-                                base_name, ext = os.path.splitext(custom_name)
-                                counter = 1
-                                while default_storage.exists(file_path):
-                                    custom_name = f"{base_name}_{counter}{ext}"
-                                    file_path = f"{base_path}/schema_{schema.id}/assessment_{assignment.id}/{custom_name}"
-                                    counter += 1
-
-                                default_storage.save(file_path, file)
-                                model_class.objects.create(
-                                    assessment=assignment,
-                                    name=custom_name,
-                                    file=file_path,
-                                )
-
                     # Files per assignment index
-                    idx = item['idx']
-                    process_uploaded_files(
-                        file_key=f'assignment_files_{idx}',
-                        base_path='assessment_details/details',
-                        model_class=AssessmentDetailFile,
-                    )
-                    process_uploaded_files(
-                        file_key=f'sample_files_{idx}',
-                        base_path='assessment_samples/samples',
-                        model_class=AssessmentSampleFile,
-                    )
+                    attachments += collect_attachments(request, assignment, f"_{item['idx']}")
+
+                save_attachments(attachments)
 
             messages.success(request, "Assessment schema updated successfully!")
             return redirect('assessment_schema')
@@ -353,30 +285,7 @@ def add_assessment(request, id):
                     submission_type=submission_type,
                 )
 
-                def process_uploaded_files(file_key, base_path, model_class):
-                    if file_key in request.FILES:
-                        for i, file in enumerate(request.FILES.getlist(file_key)):
-                            custom_base = request.POST.get(f'{file_key}_name_{i}', '') or os.path.splitext(file.name)[0]
-                            original_ext = os.path.splitext(file.name)[1]
-                            custom_name = get_valid_filename(f"{custom_base}{original_ext}")
-                            file_path = f"{base_path}/schema_{schema.id}/assessment_{assignment.id}/{custom_name}"
-
-                            base_name, ext = os.path.splitext(custom_name)
-                            counter = 1
-                            while default_storage.exists(file_path):
-                                custom_name = f"{base_name}_{counter}{ext}"
-                                file_path = f"{base_path}/schema_{schema.id}/assessment_{assignment.id}/{custom_name}"
-                                counter += 1
-
-                            default_storage.save(file_path, file)
-                            model_class.objects.create(
-                                assessment=assignment,
-                                name=custom_name,
-                                file=file_path,
-                            )
-
-                process_uploaded_files('assignment_files', 'assessment_details/details', AssessmentDetailFile)
-                process_uploaded_files('sample_files', 'assessment_samples/samples', AssessmentSampleFile)
+                save_attachments(collect_attachments(request, assignment))
 
             messages.success(request, "Assessment added successfully!")
             return redirect('assessment_schema')
@@ -446,31 +355,8 @@ def edit_assessment(request, id):
                 assignment.submission_type = submission_type
                 assignment.save()
 
-                def process_uploaded_files(file_key, base_path, model_class):
-                    if file_key in request.FILES:
-                        for i, file in enumerate(request.FILES.getlist(file_key)):
-                            custom_base = request.POST.get(f'{file_key}_name_{i}', '') or os.path.splitext(file.name)[0]
-                            original_ext = os.path.splitext(file.name)[1]
-                            custom_name = get_valid_filename(f"{custom_base}{original_ext}")
-                            file_path = f"{base_path}/schema_{schema.id}/assessment_{assignment.id}/{custom_name}"
-
-                            base_name, ext = os.path.splitext(custom_name)
-                            counter = 1
-                            while default_storage.exists(file_path):
-                                custom_name = f"{base_name}_{counter}{ext}"
-                                file_path = f"{base_path}/schema_{schema.id}/assessment_{assignment.id}/{custom_name}"
-                                counter += 1
-
-                            default_storage.save(file_path, file)
-                            model_class.objects.create(
-                                assessment=assignment,
-                                name=custom_name,
-                                file=file_path,
-                            )
-
                 # Append new files (does not delete existing)
-                process_uploaded_files('assignment_files', 'assessment_details/details', AssessmentDetailFile)
-                process_uploaded_files('sample_files', 'assessment_samples/samples', AssessmentSampleFile)
+                save_attachments(collect_attachments(request, assignment))
 
             messages.success(request, "Assessment updated successfully!")
             return redirect('assessment_schema')
@@ -516,12 +402,14 @@ def delete_assessment(request, id):
                 # Delete related files first
                 for detail_file in assessment.detail_files.all():
                     if detail_file.file:
-                        default_storage.delete(detail_file.file.path)
+                        # Shared blobs stay until no row uses them, see gc_blobs
+                        blob_storage.delete(detail_file.file.name)
                     detail_file.delete()
                 
                 for sample_file in assessment.sample_files.all():
                     if sample_file.file:
-                        default_storage.delete(sample_file.file.path)
+                        # Shared blobs stay until no row uses them, see gc_blobs
+                        blob_storage.delete(sample_file.file.name)
                     sample_file.delete()
                 
                 # Delete the assessment (this will cascade to related models)
@@ -566,22 +454,16 @@ def student_view_assignment(request):
     total_submitted = all_subs.count()
     total_graded = all_subs.filter(grades_received__isnull=False).count()
 
-    # 5️⃣ Sum grades only from graded + published submissions
-    total_percentage = all_subs.filter(
-        grades_received__isnull=False,
-        published_status="published"
-    ).aggregate(total=Sum('grades_received'))['total'] or 0
-
-    
-
-
-
     has_accepted_project = ApplicationMember.objects.filter(
         user=request.user,
         application__status='accepted'
     ).exists()
 
     schema = AssessmentSchema.objects.first()
+
+    # 5️⃣ Weighted total of the published grades, precomputed by grading.results
+    final_mark = get_final_mark(request.user, schema) if schema else None
+    total_percentage = final_mark.published_percentage if final_mark else 0
     context = {
         "total_submitted": total_submitted,
         "total_graded": total_graded,
@@ -681,20 +563,17 @@ def attempt_assessment(request, id):
             messages.error(request, "Please upload at least one file.")
             return redirect(request.path)
 
-        # Count previous attempts
-        previous_attempts = StudentSubmission.objects.filter(
-            assignment=assignment, application=application).count()
-
-        # Create new submission
-        submission = StudentSubmission.objects.create(
-            application=application,
-            assignment=assignment,
-            submitted_by=request.user,
-            attempt_number=previous_attempts + 1
-        )
+        with transaction.atomic():
+            # Create new submission, it becomes the latest attempt
+            submission = StudentSubmission.objects.create(
+                application=application,
+                assignment=assignment,
+                submitted_by=request.user,
+                attempt_number=StudentSubmission.next_attempt_number(application, assignment, request.user)
+            )
 
-        for f in files:
-            SubmissionFile.objects.create(submission=submission, file=f)
+            for f in files:
+                SubmissionFile.objects.create(submission=submission, file=f)
 
         messages.success(request, "Assignment submitted successfully.")
         return redirect('student_view_assignment')  # update with your actual view name
@@ -704,6 +583,84 @@ def attempt_assessment(request, id):
     })
 
 
+# Chunked, resumable submission uploads, used by assets/js/submission-upload.js
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise uploads.UploadError("Request body is not valid JSON.")
+    if not isinstance(data, dict):
+        raise uploads.UploadError("Request body must be a JSON object.")
+    return data
+
+
+def _upload_json(session):
+    data = uploads.upload_status(session)
+    data['url'] = reverse('upload_status', args=[session.pk])
+    return data
+
+
+@login_required
+@is_student
+@require_http_methods(['POST'])
+def start_upload(request, id):
+    assignment = get_object_or_404(Assessment, id=id)
+    application = get_object_or_404(
+        Application.objects.filter(members__user=request.user, status='accepted')
+    )
+    try:
+        data = _json_body(request)
+        session = uploads.start_upload(
+            request.user, assignment, application, data.get('filename'), data.get('size'),
+            fingerprint=data.get('fingerprint') or '', sha256=data.get('sha256') or '',
+        )
+    except uploads.UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(_upload_json(session))
+
+
+@login_required
+@is_student
+@require_http_methods(['GET', 'DELETE'])
+def upload_status(request, upload_id):
+    session = get_object_or_404(uploads.active_sessions(request.user), pk=upload_id)
+    if request.method == 'DELETE':
+        uploads.discard_upload(session)
+        return JsonResponse({'upload_id': str(upload_id), 'deleted': True})
+    return JsonResponse(_upload_json(session))
+
+
+@login_required
+@is_student
+@require_http_methods(['PUT'])
+def upload_chunk(request, upload_id, index):
+    session = get_object_or_404(uploads.active_sessions(request.user), pk=upload_id)
+    try:
+        # The body is read straight from the request stream, never held in memory whole
+        uploads.receive_chunk(session, index, request, request.headers.get('X-Chunk-Checksum'))
+    except uploads.UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(_upload_json(session))
+
+
+@login_required
+@is_student
+@require_http_methods(['POST'])
+def submit_uploads(request, id):
+    assignment = get_object_or_404(Assessment, id=id)
+    application = get_object_or_404(
+        Application.objects.filter(members__user=request.user, status='accepted')
+    )
+    try:
+        data = _json_body(request)
+        submission = uploads.submit_uploads(request.user, assignment, application, data.get('uploads'))
+    except uploads.UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    messages.success(request, "Assignment submitted successfully.")
+    return JsonResponse({'submission': submission.id, 'redirect': reverse('student_view_assignment')})
+
+
 
 
 
@@ -734,10 +691,6 @@ def view_individual_submission(request, assessment_id):
     attempt_id = request.GET.get('attempt')
     current_submission = all_attempts.filter(id=attempt_id).first() if attempt_id else all_attempts.first()
 
-    # Attach basename to files
-    for file in current_submission.files.all():
-        file.basename = os.path.basename(file.file.name)
-
     # Can submit new attempt? Only if before submit_by
     can_submit_new_attempt = date.today() <= assessment.submit_by if assessment.submit_by else True
 
@@ -811,10 +764,6 @@ def view_group_submission(request, assessment_id):
         }
         return render(request, 'assessment/view_submission.html', context)
 
-    # 6️⃣ Attach basename for files
-    for file in submission.files.all():
-        file.basename = os.path.basename(file.file.name)
-
     # 7️⃣ Determine if leader can submit new attempt
     can_submit_new_attempt = is_leader and (date.today() <= assessment.submit_by)
 
@@ -830,3 +779,72 @@ def view_group_submission(request, assessment_id):
     }
 
     return render(request, 'assessment/view_submission.html', context)
+
+
+def _visible_submission_files(user):
+    # One query: the student who submitted, anyone in their group, the project's supervisor, or an admin
+    files = SubmissionFile.objects.select_related('submission')
+    if user.is_superuser:
+        return files
+    return files.filter(
+        Q(submission__submitted_by=user)
+        | Q(submission__application__project__supervisor=user)
+        | Q(Exists(ApplicationMember.objects.filter(application=OuterRef('submission__application'), user=user)))
+    )
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def submission_file(request, file_id):
+    """Download of a submission file, for the people allowed to see the submission."""
+    submission_file = get_object_or_404(_visible_submission_files(request.user), pk=file_id)
+    if not submission_file.file:
+        raise Http404("File not found")
+    return serve_file(
+        request, submission_file.file, submission_file.filename,
+        content_type=submission_file.mime_type,
+        # Blobs are named after their content, so the checksum identifies the bytes
+        etag=submission_file.sha256,
+        last_modified=submission_file.submission.submitted_at,
+        as_attachment='download' in request.GET,
+    )
+
+
+def _serve_assessment_file(request, model, file_id):
+    # Handouts for the cohort, any signed-in user may have them
+    assessment_file = get_object_or_404(model, pk=file_id)
+    if not assessment_file.file:
+        raise Http404("File not found")
+    return serve_file(
+        request, assessment_file.file, assessment_file.filename,
+        content_type=assessment_file.mime_type,
+        etag=assessment_file.sha256,
+        as_attachment='download' in request.GET,
+    )
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def assessment_detail_file(request, file_id):
+    return _serve_assessment_file(request, AssessmentDetailFile, file_id)
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def assessment_sample_file(request, file_id):
+    return _serve_assessment_file(request, AssessmentSampleFile, file_id)
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def submission_file_thumbnail(request, file_id):
+    """First page preview of a submission file, with the same access as the file."""
+    submission_file = get_object_or_404(_visible_submission_files(request.user), pk=file_id)
+    if not submission_file.thumbnail:
+        raise Http404("No preview")
+    return serve_file(
+        request, submission_file.thumbnail, os.path.basename(submission_file.thumbnail.name),
+        content_type='image/png',
+        etag=f'{submission_file.pk}-{submission_file.processed_at.timestamp() if submission_file.processed_at else 0}',
+        last_modified=submission_file.processed_at,
+    )
@@ -2,4 +2,7 @@ from django.contrib import admin
 from .models import *
 # Register your models here.
 
-admin.site.register(Notification)
\ No newline at end of file
+admin.site.register(Notification)
+admin.site.register(DashboardStats)
+admin.site.register(SupervisorRollup)
+admin.site.register(Blob)
@@ -0,0 +1,59 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Small in-process worker pool for work that should not hold up the request.
+# Jobs are lost if the process exits before they run, so only hand it work
+# that can be redone (or is harmless to lose).
+BACKGROUND_WORKERS = getattr(settings, 'BACKGROUND_WORKERS', 2)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix='background')
+        return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+        raise
+
+
+def _run_in_worker(func, args, kwargs):
+    try:
+        return _run(func, args, kwargs)
+    finally:
+        # Each worker thread opens its own connections, close them after every job
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """Run func on the worker pool now and return its Future."""
+    if getattr(settings, 'BACKGROUND_TASKS_SYNC', False):
+        # Run inline, handy in tests and when debugging. Callers still get a
+        # Future, already done, holding the result or the exception.
+        future = Future()
+        try:
+            future.set_result(_run(func, args, kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return _get_executor().submit(_run_in_worker, func, args, kwargs)
+
+
+def run_after_commit(func, *args, **kwargs):
+    """Run func on the worker pool once the current transaction commits."""
+    transaction.on_commit(partial(submit, func, *args, **kwargs))
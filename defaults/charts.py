@@ -0,0 +1,131 @@
+import hashlib
+from django.db.models import Count, Q
+from django.utils import timezone
+from application.models import Application
+from projects.models import Project
+from assessment.models import StudentSubmission
+from grading.distribution import grade_distribution
+from .dashboard_cache import DASHBOARD_DEPENDENCIES, get_versions
+from .rollups import get_supervisor_rollup
+from .stats import get_dashboard_stats
+from .timeseries import time_series
+
+STATUS_COLORS = [
+    ('applied', 'Applied', '#f4ba40'),
+    ('accepted', 'Accepted', '#38c786'),
+    ('declined', 'Declined', '#ed5e49'),
+]
+
+
+def _project_type_color(project_type):
+    return '#0c768a' if project_type == 'Research' else '#38c786' if project_type == 'Development' else '#f4ba40'
+
+
+def _status_chart(counts):
+    return [
+        {'status': label, 'count': counts.get(status, 0), 'color': color}
+        for status, label, color in STATUS_COLORS
+    ]
+
+
+def _project_type_chart(counts):
+    return [
+        {'type': project_type, 'count': counts[project_type], 'color': _project_type_color(project_type)}
+        for project_type, _ in Project.PROJECT_TYPES
+        if counts.get(project_type, 0) > 0
+    ]
+
+
+def _status_counts(applications):
+    return applications.aggregate(**{
+        status: Count('id', filter=Q(status=status)) for status, _, _ in STATUS_COLORS
+    })
+
+
+# Student charts
+
+def student_application_status(user):
+    return _status_chart(_status_counts(Application.objects.filter(members__user=user)))
+
+
+def student_grade_ranges(user):
+    submissions = StudentSubmission.objects.filter(application__status='accepted')
+    return grade_distribution(submissions, student=user)['ranges']
+
+
+# Supervisor charts (read from the supervisor's rollup)
+
+def supervisor_application_status(user):
+    rollup = get_supervisor_rollup(user)
+    return _status_chart({
+        'applied': rollup.pending_applications,
+        'accepted': rollup.accepted_applications,
+        'declined': rollup.declined_applications,
+    })
+
+
+def supervisor_grade_ranges(user):
+    return get_supervisor_rollup(user).grade_bins
+
+
+def supervisor_project_types(user):
+    return _project_type_chart(get_supervisor_rollup(user).project_type_counts)
+
+
+# Admin charts (read from the statistics snapshot)
+
+def admin_application_status(user):
+    stats = get_dashboard_stats()
+    return _status_chart({
+        'applied': stats.pending_applications,
+        'accepted': stats.accepted_applications,
+        'declined': stats.declined_applications,
+    })
+
+
+def admin_grade_ranges(user):
+    return get_dashboard_stats().grade_bins
+
+
+def admin_project_types(user):
+    return _project_type_chart(get_dashboard_stats().project_type_counts)
+
+
+def admin_monthly_applications(user):
+    # The last year, as the accounts admin dashboard showed before it shared this chart
+    return time_series('applications', period='month', count=12)
+
+
+CHARTS = {
+    'student': {
+        'application_status': student_application_status,
+        'grade_ranges': student_grade_ranges,
+    },
+    'supervisor': {
+        'application_status': supervisor_application_status,
+        'grade_ranges': supervisor_grade_ranges,
+        'project_types': supervisor_project_types,
+    },
+    'admin': {
+        'application_status': admin_application_status,
+        'grade_ranges': admin_grade_ranges,
+        'project_types': admin_project_types,
+        'monthly_applications': admin_monthly_applications,
+    },
+}
+
+
+def chart_etag(role, user, chart):
+    """
+    Strong ETag for a chart, derived from the versions of the models the
+    dashboard reads. The date is included because some charts are relative
+    to today (e.g. the current month).
+    """
+    labels = DASHBOARD_DEPENDENCIES[role]
+    versions = get_versions(labels)
+    scope = 'all' if role == 'admin' else user.pk
+    seed = ':'.join([
+        role, str(scope), chart, timezone.localdate().isoformat(),
+        *(str(versions[label]) for label in labels),
+    ])
+    return hashlib.sha1(seed.encode()).hexdigest()
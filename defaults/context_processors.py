@@ -1,11 +1,11 @@
-from .models import Notification
+from .notifications import get_notification_summary
 
 def notifications(request):
     if request.user.is_authenticated:
-        # Fetch unread notifications
-        notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-        unread_notifications = notifications.filter(is_read=False)
+        # Unread count and newest unread notifications, cached per user
+        summary = get_notification_summary(request.user)
         return {
-            'unread_notifications': unread_notifications,
+            'unread_notifications': summary['unread'],
+            'unread_notifications_count': summary['unread_count'],
         }
     return {}
@@ -0,0 +1,120 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+# Models each dashboard reads. Saving or deleting any of them bumps its
+# version, which changes the cache key of every dashboard that depends on it.
+DASHBOARD_DEPENDENCIES = {
+    'student': [
+        'application.Application',
+        'application.ApplicationMember',
+        'assessment.Assessment',
+        'assessment.StudentSubmission',
+        'projects.Project',
+    ],
+    'supervisor': [
+        'accounts.User',
+        'application.Application',
+        'application.ApplicationMember',
+        'assessment.Assessment',
+        'assessment.StudentSubmission',
+        'projects.Project',
+    ],
+    'admin': [
+        'accounts.User',
+        'application.Application',
+        'application.ApplicationMember',
+        'assessment.Assessment',
+        'assessment.StudentSubmission',
+        'projects.Project',
+    ],
+}
+
+# Dashboards also show time-relative figures ("due in the next 30 days"),
+# so entries still expire after a while even if no data changes.
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 15 * 60)
+
+VERSION_KEY = 'dashboard:version:{}'
+CONTEXT_KEY = 'dashboard:context:{}:{}:{}'
+COUNTER_KEY = 'dashboard:counter:{}:{}'
+
+
+def _new_version():
+    # Time based so a version that fell out of the cache never comes back
+    # with a value an old entry was stored under
+    return time.time_ns()
+
+
+def dependent_models():
+    labels = set()
+    for models in DASHBOARD_DEPENDENCIES.values():
+        labels.update(models)
+    return labels
+
+
+def get_versions(labels):
+    keys = {label: VERSION_KEY.format(label.lower()) for label in labels}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for label, key in keys.items():
+        if key not in found:
+            cache.add(key, _new_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions[label] = found[key]
+    return versions
+
+
+def bump_version(label):
+    """Invalidate every cached dashboard that depends on the given model."""
+    key = VERSION_KEY.format(label.lower())
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def _count(role, outcome):
+    key = COUNTER_KEY.format(role, outcome)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def cached_dashboard_context(role, user, build_context):
+    """
+    Return (context, hit) for a dashboard. Student and supervisor contexts are
+    cached per user, the admin context is shared by every admin.
+    """
+    labels = DASHBOARD_DEPENDENCIES[role]
+    versions = get_versions(labels)
+    scope = 'all' if role == 'admin' else user.pk
+    key = CONTEXT_KEY.format(role, scope, '-'.join(str(versions[label]) for label in labels))
+
+    context = cache.get(key)
+    if context is not None:
+        _count(role, 'hits')
+        return context, True
+
+    context = build_context(user)
+    cache.set(key, context, DASHBOARD_CACHE_TIMEOUT)
+    _count(role, 'misses')
+    return context, False
+
+
+def cache_counters(reset=False):
+    """Hit/miss counters per dashboard role."""
+    keys = [COUNTER_KEY.format(role, outcome)
+            for role in DASHBOARD_DEPENDENCIES for outcome in ('hits', 'misses')]
+    found = cache.get_many(keys)
+    counters = {
+        role: {
+            'hits': found.get(COUNTER_KEY.format(role, 'hits'), 0),
+            'misses': found.get(COUNTER_KEY.format(role, 'misses'), 0),
+        }
+        for role in DASHBOARD_DEPENDENCIES
+    }
+    if reset:
+        cache.delete_many(keys)
+    return counters
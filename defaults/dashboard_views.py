@@ -1,39 +1,92 @@
 from django.shortcuts import render
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.db.models import Count, Avg, Q
+from django.utils.dateparse import parse_date
+from django.db.models import Count, Q
 from django.contrib.auth import get_user_model
 from application.models import Application
 from projects.models import Project
-from assessment.models import Assessment, StudentSubmission, AssessmentSchema
-from .models import Notification
-import json
+from assessment.models import Assessment, StudentSubmission
+from grading.distribution import grade_distribution
+from .stats import get_dashboard_stats
+from .rollups import get_supervisor_rollup
+from .dashboard_cache import cached_dashboard_context
+from .notifications import get_notification_summary
+from .charts import CHARTS, chart_etag
+from .decorators import _get_role_for_user
+from .profiling import query_budget
 
 # Get the User model (either custom or default)
 User = get_user_model()
 
 
-@login_required
-def student_dashboard(request):
-    """Student dashboard view with statistics, charts, and project information."""
+def notification_context(user):
+    """Latest notifications for the dashboards, from the per-user notification summary."""
+    summary = get_notification_summary(user)
+    return {
+        'notifications': summary['recent'],
+        'unread_notifications_count': summary['unread_count'],
+    }
+
+
+def _render_dashboard(request, role, template, build_context):
+    context, hit = cached_dashboard_context(role, request.user, build_context)
+    context = dict(context, **notification_context(request.user))
+    response = render(request, template, context)
+    response['X-Dashboard-Cache'] = 'hit' if hit else 'miss'
+    return response
+
+
+def application_rows(applications):
+    """Applications with their members as plain dicts, so a cached context holds no querysets."""
+    return [
+        {
+            'project_id': application.project_id,
+            'project_title': application.project.title,
+            'status': application.status,
+            'application_type': application.application_type,
+            'applied_at': application.applied_at,
+            'message': application.message,
+            'members': [
+                {'name': member.user.get_full_name(), 'email': member.user.email, 'is_leader': member.is_leader}
+                for member in application.members.all()
+            ],
+        }
+        for application in applications.select_related('project').prefetch_related('members__user')
+    ]
+
+
+def _submission_rows(submissions):
+    """Submissions as plain dicts for the recent submission lists."""
+    return [
+        {
+            'assignment_title': submission.assignment.title,
+            'student_name': submission.submitted_by.get_full_name(),
+            'submitted_at': submission.submitted_at,
+            'grades_received': submission.grades_received,
+        }
+        for submission in submissions.select_related('assignment', 'submitted_by')
+    ]
+
+
+def student_dashboard_context(user):
+    """Statistics, charts and project information for a student (notifications excluded so it can be cached)."""
     try:
         # Get current date
         today = timezone.now().date()
         
         # Get applications for this student
-        applications = Application.objects.filter(members__user=request.user).select_related('project')
-        total_applications = applications.count()
-        accepted_projects_count = applications.filter(status='accepted').count()
-        pending_applications = applications.filter(status='applied').count()
-        declined_applications = applications.filter(status='declined').count()
+        applications = application_rows(Application.objects.filter(members__user=user))
+        total_applications = len(applications)
+        accepted_projects_count = sum(1 for application in applications if application['status'] == 'accepted')
         
         # Get accepted applications to find submissions
-        accepted_applications = applications.filter(status='accepted')
+        accepted_applications = Application.objects.filter(members__user=user, status='accepted')
         
         # Get submissions for accepted applications
-        submissions = StudentSubmission.objects.filter(
-            application__in=accepted_applications
-        ).select_related('assignment', 'application', 'submitted_by')
+        submissions = StudentSubmission.objects.filter(application__in=accepted_applications)
         
         # Get assessments that have submissions
         assessments = Assessment.objects.filter(
@@ -41,255 +94,138 @@ def student_dashboard(request):
         ).distinct()
         
         # Get upcoming assessments (due in next 30 days)
-        upcoming_assessments = assessments.filter(
+        upcoming_assessments = list(assessments.filter(
             due_date__gte=today,
             due_date__lte=today + timezone.timedelta(days=30)
-        ).order_by('due_date')
+        ).order_by('due_date').values('title', 'due_date', 'weight'))
         
         # Get overdue assessments
-        overdue_assessments = assessments.filter(due_date__lt=today).exclude(
+        overdue_assessments_count = assessments.filter(due_date__lt=today).exclude(
             id__in=submissions.values_list('assignment_id', flat=True)
-        )
+        ).count()
         
         # Get recent submissions (last 7 days)
-        recent_submissions = submissions.filter(
+        recent_submissions = _submission_rows(submissions.filter(
             submitted_at__gte=today - timezone.timedelta(days=7)
-        ).order_by('-submitted_at')
+        ).order_by('-submitted_at'))
         
         # Get grades data
-        graded_submissions = submissions.filter(grades_received__isnull=False)
-        average_grade = graded_submissions.aggregate(avg_grade=Avg('grades_received'))['avg_grade'] or 0
-        
-        # Get notifications
-        notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:5]
-        unread_notifications_count = Notification.objects.filter(user=request.user, is_read=False).count()
-        
-        # Prepare chart data
-        application_status_data = [
-            {'status': 'Applied', 'count': pending_applications, 'color': '#f4ba40'},
-            {'status': 'Accepted', 'count': accepted_projects_count, 'color': '#38c786'},
-            {'status': 'Declined', 'count': declined_applications, 'color': '#ed5e49'}
-        ]
-        
-        # Grade distribution for charts
-        grade_ranges = [
-            {'range': '90-100', 'count': graded_submissions.filter(grades_received__gte=90).count(), 'color': '#38c786'},
-            {'range': '80-89', 'count': graded_submissions.filter(grades_received__gte=80, grades_received__lt=90).count(), 'color': '#0c768a'},
-            {'range': '70-79', 'count': graded_submissions.filter(grades_received__gte=70, grades_received__lt=80).count(), 'color': '#f4ba40'},
-            {'range': '60-69', 'count': graded_submissions.filter(grades_received__gte=60, grades_received__lt=70).count(), 'color': '#ed5e49'},
-            {'range': 'Below 60', 'count': graded_submissions.filter(grades_received__lt=60).count(), 'color': '#8590a5'}
-        ]
-        
-        # Convert to JSON for JavaScript
-        application_status_json = json.dumps(application_status_data)
-        grade_ranges_json = json.dumps(grade_ranges)
+        distribution = grade_distribution(submissions)
+        average_grade = distribution['average']
         
     except Exception as e:
         # If there's an error, provide default values
         print(f"Error in student dashboard: {e}")
-        applications = Application.objects.filter(members__user=request.user)
-        total_applications = applications.count()
-        accepted_projects_count = applications.filter(status='accepted').count()
-        pending_applications = applications.filter(status='applied').count()
-        declined_applications = applications.filter(status='declined').count()
+        applications = application_rows(Application.objects.filter(members__user=user))
+        total_applications = len(applications)
+        accepted_projects_count = sum(1 for application in applications if application['status'] == 'accepted')
         
         # Default values for other data
-        accepted_applications = applications.filter(status='accepted')
-        submissions = StudentSubmission.objects.none()
-        assessments = Assessment.objects.none()
-        upcoming_assessments = Assessment.objects.none()
-        overdue_assessments = Assessment.objects.none()
-        recent_submissions = StudentSubmission.objects.none()
-        notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:5]
-        unread_notifications_count = Notification.objects.filter(user=request.user, is_read=False).count()
+        upcoming_assessments = []
+        overdue_assessments_count = 0
+        recent_submissions = []
         average_grade = 0
-        
-        # Default chart data
-        application_status_data = [
-            {'status': 'Applied', 'count': pending_applications, 'color': '#f4ba40'},
-            {'status': 'Accepted', 'count': accepted_projects_count, 'color': '#38c786'},
-            {'status': 'Declined', 'count': declined_applications, 'color': '#ed5e49'}
-        ]
-        grade_ranges = [
-            {'range': '90-100', 'count': 0, 'color': '#38c786'},
-            {'range': '80-89', 'count': 0, 'color': '#0c768a'},
-            {'range': '70-79', 'count': 0, 'color': '#f4ba40'},
-            {'range': '60-69', 'count': 0, 'color': '#ed5e49'},
-            {'range': 'Below 60', 'count': 0, 'color': '#8590a5'}
-        ]
-        
-        application_status_json = json.dumps(application_status_data)
-        grade_ranges_json = json.dumps(grade_ranges)
     
     context = {
         'applications': applications,
         'total_applications': total_applications,
         'accepted_projects_count': accepted_projects_count,
-        'pending_applications': pending_applications,
-        'declined_applications': declined_applications,
         
-        'assessments': assessments,
-        'submissions': submissions,
         'upcoming_assessments': upcoming_assessments,
-        'overdue_assessments': overdue_assessments,
+        'upcoming_assessments_count': len(upcoming_assessments),
+        'overdue_assessments_count': overdue_assessments_count,
         'recent_submissions': recent_submissions,
-        'notifications': notifications,
-        'unread_notifications_count': unread_notifications_count,
         'average_grade': round(average_grade, 1),
-        
-        # Chart data
-        'application_status_data': application_status_data,
-        'grade_ranges': grade_ranges,
-        'application_status_json': application_status_json,
-        'grade_ranges_json': grade_ranges_json,
     }
     
-    return render(request, 'student_dashboard.html', context)
+    return context
 
 
 @login_required
-def supervisor_dashboard(request):
-    """Supervisor dashboard view with project statistics, charts, and student information."""
+def student_dashboard(request):
+    """Student dashboard view with statistics, charts, and project information."""
+    return _render_dashboard(request, 'student', 'student_dashboard.html', student_dashboard_context)
+
+
+def _assessment_row(row):
+    # Rollup rows are stored as JSON, the template formats the due date
+    return dict(row, due_date=parse_date(row['due_date']) if row['due_date'] else None)
+
+
+def supervisor_dashboard_context(user):
+    """Project statistics, charts and student information for a supervisor (notifications excluded so it can be cached)."""
     try:
         # Get current date
         today = timezone.now().date()
         
-        # Get projects created by this supervisor
-        supervisor_projects = Project.objects.filter(supervisor=request.user)
-        total_projects = supervisor_projects.count()
-        available_projects = supervisor_projects.filter(availability='available').count()
-        taken_projects = supervisor_projects.filter(availability='taken').count()
+        # Counts come from the supervisor's rollup (one row, see defaults/rollups.py)
+        rollup = get_supervisor_rollup(user)
+        total_projects = rollup.total_projects
+        available_projects = rollup.available_projects
+        taken_projects = rollup.taken_projects
         # For now, we'll treat 'taken' as ongoing until we have more specific statuses
         ongoing_projects = taken_projects
         completed_projects = 0  # No completed status exists yet
         
-        # Get applications for supervisor's projects
-        project_applications = Application.objects.filter(
-            project__supervisor=request.user
-        ).select_related('project').prefetch_related('members__user')
-        
-        total_applications = project_applications.count()
-        pending_applications = project_applications.filter(status='applied').count()
-        accepted_applications = project_applications.filter(status='accepted').count()
-        declined_applications = project_applications.filter(status='declined').count()
+        total_applications = rollup.total_applications
+        pending_applications = rollup.pending_applications
+        accepted_applications = rollup.accepted_applications
+        active_students = rollup.active_students
         
-        # Get accepted applications to find active students
-        accepted_applications_list = project_applications.filter(status='accepted')
-        active_students = accepted_applications_list.values('members__user').distinct().count()
-        
-        # Get assessments and submissions for supervisor's projects
-        all_assessments = Assessment.objects.all()
+        # Projects and pending applications listed on the dashboard
+        supervisor_projects = list(
+            Project.objects.filter(supervisor=user).order_by('-created').values('title', 'availability', 'created')[:5]
+        )
+        project_applications = application_rows(Application.objects.filter(project__supervisor=user, status='applied'))
         
-        # Get submissions for accepted applications
-        submissions = StudentSubmission.objects.filter(
-            application__in=accepted_applications_list
-        ).select_related('assignment', 'application', 'submitted_by')
-        
-        # Get assessments that have submissions
-        assessments_with_submissions = all_assessments.filter(
-            id__in=submissions.values_list('assignment_id', flat=True)
-        ).distinct()
+        # Assessments that have submissions from this supervisor's students
+        assessment_stats = [_assessment_row(row) for row in rollup.assessment_stats]
         
         # Get upcoming assessments (due in next 30 days)
-        upcoming_assessments = assessments_with_submissions.filter(
-            due_date__gte=today,
-            due_date__lte=today + timezone.timedelta(days=30)
-        ).order_by('due_date')
+        upcoming_assessments = [
+            row for row in assessment_stats
+            if row['submissions'] and row['due_date']
+            and today <= row['due_date'] <= today + timezone.timedelta(days=30)
+        ]
         
-        # Get overdue assessments
-        overdue_assessments = assessments_with_submissions.filter(due_date__lt=today).exclude(
-            id__in=submissions.values_list('assignment_id', flat=True)
-        )
+        # Overdue: past the due date and not every accepted application has submitted
+        overdue_assessments = [
+            row for row in assessment_stats
+            if row['due_date'] and row['due_date'] < today
+            and row['submitted_applications'] < accepted_applications
+        ]
         
         # Get recent submissions (last 7 days)
-        recent_submissions = submissions.filter(
+        recent_submissions = _submission_rows(StudentSubmission.objects.filter(
+            application__project__supervisor=user,
+            application__status='accepted',
             submitted_at__gte=today - timezone.timedelta(days=7)
-        ).order_by('-submitted_at')
-        
-        # Get grades data
-        graded_submissions = submissions.filter(grades_received__isnull=False)
-        average_grade = graded_submissions.aggregate(avg_grade=Avg('grades_received'))['avg_grade'] or 0
-        
-        # Get notifications
-        notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:5]
-        unread_notifications_count = Notification.objects.filter(user=request.user, is_read=False).count()
-        
-        # Get project type distribution for charts
-        project_type_data = []
-        for project_type, _ in Project.PROJECT_TYPES:
-            count = supervisor_projects.filter(project_type=project_type).count()
-            if count > 0:
-                project_type_data.append({
-                    'type': project_type,
-                    'count': count,
-                    'color': '#0c768a' if project_type == 'Research' else '#38c786' if project_type == 'Development' else '#f4ba40'
-                })
-        
-        # Get application status distribution for charts
-        application_status_data = [
-            {'status': 'Applied', 'count': pending_applications, 'color': '#f4ba40'},
-            {'status': 'Accepted', 'count': accepted_applications, 'color': '#38c786'},
-            {'status': 'Declined', 'count': declined_applications, 'color': '#ed5e49'}
-        ]
+        ).order_by('-submitted_at')[:10])
         
-        # Get grade distribution for charts
-        grade_ranges = [
-            {'range': '90-100', 'count': graded_submissions.filter(grades_received__gte=90).count(), 'color': '#38c786'},
-            {'range': '80-89', 'count': graded_submissions.filter(grades_received__gte=80, grades_received__lt=90).count(), 'color': '#0c768a'},
-            {'range': '70-79', 'count': graded_submissions.filter(grades_received__gte=70, grades_received__lt=80).count(), 'color': '#f4ba40'},
-            {'range': '60-69', 'count': graded_submissions.filter(grades_received__gte=60, grades_received__lt=70).count(), 'color': '#ed5e49'},
-            {'range': 'Below 60', 'count': graded_submissions.filter(grades_received__lt=60).count(), 'color': '#8590a5'}
-        ]
-        
-        # Convert to JSON for JavaScript
-        project_type_json = json.dumps(project_type_data)
-        application_status_json = json.dumps(application_status_data)
-        grade_ranges_json = json.dumps(grade_ranges)
+        average_grade = rollup.average_grade
         
     except Exception as e:
         # If there's an error, provide default values
         print(f"Error in supervisor dashboard: {e}")
-        supervisor_projects = Project.objects.filter(supervisor=request.user)
-        total_projects = supervisor_projects.count()
+        supervisor_projects = list(
+            Project.objects.filter(supervisor=user).order_by('-created').values('title', 'availability', 'created')[:5]
+        )
+        total_projects = Project.objects.filter(supervisor=user).count()
         available_projects = 0
         ongoing_projects = 0
         completed_projects = 0
         
-        project_applications = Application.objects.filter(project__supervisor=request.user)
-        total_applications = project_applications.count()
-        pending_applications = project_applications.filter(status='applied').count()
-        accepted_applications = project_applications.filter(status='accepted').count()
-        declined_applications = project_applications.filter(status='declined').count()
+        applications = Application.objects.filter(project__supervisor=user)
+        project_applications = application_rows(applications.filter(status='applied'))
+        total_applications = applications.count()
+        pending_applications = len(project_applications)
         active_students = 0
         
         # Default values for other data
-        assessments_with_submissions = Assessment.objects.none()
-        submissions = StudentSubmission.objects.none()
-        upcoming_assessments = Assessment.objects.none()
-        overdue_assessments = Assessment.objects.none()
-        recent_submissions = StudentSubmission.objects.none()
-        notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:5]
-        unread_notifications_count = Notification.objects.filter(user=request.user, is_read=False).count()
+        upcoming_assessments = []
+        overdue_assessments = []
+        recent_submissions = []
         average_grade = 0
-        
-        # Default chart data
-        project_type_data = []
-        application_status_data = [
-            {'status': 'Applied', 'count': pending_applications, 'color': '#f4ba40'},
-            {'status': 'Accepted', 'count': accepted_applications, 'color': '#38c786'},
-            {'status': 'Declined', 'count': declined_applications, 'color': '#ed5e49'}
-        ]
-        grade_ranges = [
-            {'range': '90-100', 'count': 0, 'color': '#38c786'},
-            {'range': '80-89', 'count': 0, 'color': '#0c768a'},
-            {'range': '70-79', 'count': 0, 'color': '#f4ba40'},
-            {'range': '60-69', 'count': 0, 'color': '#ed5e49'},
-            {'range': 'Below 60', 'count': 0, 'color': '#8590a5'}
-        ]
-        
-        project_type_json = json.dumps(project_type_data)
-        application_status_json = json.dumps(application_status_data)
-        grade_ranges_json = json.dumps(grade_ranges)
     
     context = {
         'supervisor_projects': supervisor_projects,
@@ -301,141 +237,82 @@ def supervisor_dashboard(request):
         'project_applications': project_applications,
         'total_applications': total_applications,
         'pending_applications': pending_applications,
-        'accepted_applications': accepted_applications,
-        'declined_applications': declined_applications,
         'active_students': active_students,
         
-        'assessments': assessments_with_submissions,
-        'submissions': submissions,
         'upcoming_assessments': upcoming_assessments,
         'overdue_assessments': overdue_assessments,
         'recent_submissions': recent_submissions,
-        'notifications': notifications,
-        'unread_notifications_count': unread_notifications_count,
         'average_grade': round(average_grade, 1),
-        
-        # Chart data
-        'project_type_data': project_type_data,
-        'application_status_data': application_status_data,
-        'grade_ranges': grade_ranges,
-        'project_type_json': project_type_json,
-        'application_status_json': application_status_json,
-        'grade_ranges_json': grade_ranges_json,
     }
     
-    return render(request, 'supervisor_dashboard.html', context)
+    return context
 
 
 @login_required
-def admin_dashboard(request):
-    """Admin dashboard view with comprehensive system statistics and management tools."""
+def supervisor_dashboard(request):
+    """Supervisor dashboard view with project statistics, charts, and student information."""
+    return _render_dashboard(request, 'supervisor', 'supervisor_dashboard.html', supervisor_dashboard_context)
+
+
+def admin_dashboard_context(user):
+    """System-wide statistics for the admin dashboard (notifications excluded so it can be cached)."""
     try:
-        from datetime import datetime, timedelta
+        from datetime import timedelta
         
         # Get current date
         today = timezone.now().date()
         
-        # Basic statistics
-        total_students = User.objects.filter(is_staff=False, is_superuser=False).count()
-        total_supervisors = User.objects.filter(is_staff=True, is_superuser=False).count()
-        total_projects = Project.objects.count()
-        total_applications = Application.objects.count()
+        # Basic statistics come from the stored snapshot (one row, see defaults/stats.py)
+        stats = get_dashboard_stats()
+        total_students = stats.total_students
+        total_supervisors = stats.total_supervisors
+        total_projects = stats.total_projects
+        total_applications = stats.total_applications
         
         # Project statistics
-        available_projects = Project.objects.filter(availability='available').count()
-        taken_projects = Project.objects.filter(availability='taken').count()
+        available_projects = stats.available_projects
+        taken_projects = stats.taken_projects
         # For now, we'll treat 'taken' as ongoing until we have more specific statuses
         ongoing_projects = taken_projects
         completed_projects = 0  # No completed status exists yet
         
         # Application statistics
-        pending_applications = Application.objects.filter(status='applied').count()
-        accepted_applications = Application.objects.filter(status='accepted').count()
-        declined_applications = Application.objects.filter(status='declined').count()
+        pending_applications = stats.pending_applications
+        accepted_applications = stats.accepted_applications
+        declined_applications = stats.declined_applications
         
         # Assessment statistics
-        total_assessments = Assessment.objects.count()
-        total_submissions = StudentSubmission.objects.count()
-        graded_submissions = StudentSubmission.objects.filter(grades_received__isnull=False).count()
-        pending_grading = total_submissions - graded_submissions
+        total_assessments = stats.total_assessments
+        total_submissions = stats.total_submissions
+        graded_submissions = stats.graded_submissions
+        pending_grading = stats.pending_grading
         
         # Recent data
-        recent_applications = Application.objects.select_related('project').prefetch_related('members__user').order_by('-applied_at')[:10]
-        recent_submissions = StudentSubmission.objects.select_related('assignment', 'application', 'submitted_by').order_by('-submitted_at')[:10]
-        recent_projects = Project.objects.select_related('supervisor').order_by('-created')[:5]
-        
-        # Notifications
-        notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:5]
-        unread_notifications_count = Notification.objects.filter(user=request.user, is_read=False).count()
+        recent_applications = application_rows(Application.objects.order_by('-applied_at')[:5])
         
         # Calculate trends (last 30 days vs previous 30 days)
         last_30_days = today - timedelta(days=30)
         last_60_days = today - timedelta(days=60)
         
-        current_period_apps = Application.objects.filter(applied_at__gte=last_30_days).count()
-        previous_period_apps = Application.objects.filter(applied_at__gte=last_60_days, applied_at__lt=last_30_days).count()
+        # Both periods are counted in one query per table
+        app_periods = Application.objects.filter(applied_at__gte=last_60_days).aggregate(
+            current=Count('id', filter=Q(applied_at__gte=last_30_days)),
+            previous=Count('id', filter=Q(applied_at__lt=last_30_days)),
+        )
+        current_period_apps = app_periods['current']
+        previous_period_apps = app_periods['previous']
         apps_trend = ((current_period_apps - previous_period_apps) / max(previous_period_apps, 1)) * 100 if previous_period_apps > 0 else 0
         
-        current_period_subs = StudentSubmission.objects.filter(submitted_at__gte=last_30_days).count()
-        previous_period_subs = StudentSubmission.objects.filter(submitted_at__gte=last_60_days, submitted_at__lt=last_30_days).count()
+        sub_periods = StudentSubmission.objects.filter(submitted_at__gte=last_60_days).aggregate(
+            current=Count('id', filter=Q(submitted_at__gte=last_30_days)),
+            previous=Count('id', filter=Q(submitted_at__lt=last_30_days)),
+        )
+        current_period_subs = sub_periods['current']
+        previous_period_subs = sub_periods['previous']
         subs_trend = ((current_period_subs - previous_period_subs) / max(previous_period_subs, 1)) * 100 if previous_period_subs > 0 else 0
         
-        # Chart data preparation
-        # Application status distribution
-        application_status_data = [
-            {'status': 'Applied', 'count': pending_applications, 'color': '#f4ba40'},
-            {'status': 'Accepted', 'count': accepted_applications, 'color': '#38c786'},
-            {'status': 'Declined', 'count': declined_applications, 'color': '#ed5e49'}
-        ]
-        
-        # Project type distribution
-        project_types_data = []
-        if hasattr(Project, 'PROJECT_TYPES'):
-            for project_type, _ in Project.PROJECT_TYPES:
-                count = Project.objects.filter(project_type=project_type).count()
-                if count > 0:
-                    project_types_data.append({
-                        'type': project_type,
-                        'count': count,
-                        'color': '#0c768a' if project_type == 'Research' else '#38c786' if project_type == 'Development' else '#f4ba40'
-                    })
-        
-        # Grade distribution for all submissions
-        graded_subs = StudentSubmission.objects.filter(grades_received__isnull=False)
-        grade_ranges = [
-            {'range': '90-100', 'count': graded_subs.filter(grades_received__gte=90).count(), 'color': '#38c786'},
-            {'range': '80-89', 'count': graded_subs.filter(grades_received__gte=80, grades_received__lt=90).count(), 'color': '#0c768a'},
-            {'range': '70-79', 'count': graded_subs.filter(grades_received__gte=70, grades_received__lt=80).count(), 'color': '#f4ba40'},
-            {'range': '60-69', 'count': graded_subs.filter(grades_received__gte=60, grades_received__lt=70).count(), 'color': '#ed5e49'},
-            {'range': 'Below 60', 'count': graded_subs.filter(grades_received__lt=60).count(), 'color': '#8590a5'}
-        ]
-        
-        # Monthly applications for trend chart (last 6 months)
-        monthly_applications = []
-        for i in range(6):
-            month_start = today.replace(day=1) - timedelta(days=i*30)
-            month_end = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
-            
-            count = Application.objects.filter(
-                applied_at__date__gte=month_start,
-                applied_at__date__lte=month_end
-            ).count()
-            
-            monthly_applications.append({
-                'month': month_start.strftime('%b %Y'),
-                'count': count
-            })
-        
-        monthly_applications.reverse()  # Show chronologically
-        
-        # Convert to JSON for JavaScript
-        application_status_json = json.dumps(application_status_data)
-        project_types_json = json.dumps(project_types_data)
-        grade_ranges_json = json.dumps(grade_ranges)
-        monthly_applications_json = json.dumps(monthly_applications)
-        
         # Average grade calculation
-        average_grade = graded_subs.aggregate(avg_grade=Avg('grades_received'))['avg_grade'] or 0
+        average_grade = stats.average_grade
         
     except Exception as e:
         # If there's an error, provide default values
@@ -457,32 +334,7 @@ def admin_dashboard(request):
         apps_trend = subs_trend = 0
         average_grade = 0
         
-        recent_applications = Application.objects.none()
-        recent_submissions = StudentSubmission.objects.none()
-        recent_projects = Project.objects.none()
-        notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:5]
-        unread_notifications_count = Notification.objects.filter(user=request.user, is_read=False).count()
-        
-        # Default chart data
-        application_status_data = [
-            {'status': 'Applied', 'count': 0, 'color': '#f4ba40'},
-            {'status': 'Accepted', 'count': 0, 'color': '#38c786'},
-            {'status': 'Declined', 'count': 0, 'color': '#ed5e49'}
-        ]
-        project_types_data = []
-        grade_ranges = [
-            {'range': '90-100', 'count': 0, 'color': '#38c786'},
-            {'range': '80-89', 'count': 0, 'color': '#0c768a'},
-            {'range': '70-79', 'count': 0, 'color': '#f4ba40'},
-            {'range': '60-69', 'count': 0, 'color': '#ed5e49'},
-            {'range': 'Below 60', 'count': 0, 'color': '#8590a5'}
-        ]
-        monthly_applications = []
-        
-        application_status_json = json.dumps(application_status_data)
-        project_types_json = json.dumps(project_types_data)
-        grade_ranges_json = json.dumps(grade_ranges)
-        monthly_applications_json = json.dumps(monthly_applications)
+        recent_applications = []
     
     context = {
         # Basic statistics
@@ -514,20 +366,35 @@ def admin_dashboard(request):
         
         # Recent data
         'recent_applications': recent_applications,
-        'recent_submissions': recent_submissions,
-        'recent_projects': recent_projects,
-        'notifications': notifications,
-        'unread_notifications_count': unread_notifications_count,
-        
-        # Chart data
-        'application_status_data': application_status_data,
-        'project_types_data': project_types_data,
-        'grade_ranges': grade_ranges,
-        'monthly_applications': monthly_applications,
-        'application_status_json': application_status_json,
-        'project_types_json': project_types_json,
-        'grade_ranges_json': grade_ranges_json,
-        'monthly_applications_json': monthly_applications_json,
     }
     
-    return render(request, 'admin_dashboard.html', context)
+    return context
+
+
+@login_required
+def admin_dashboard(request):
+    """Admin dashboard view with comprehensive system statistics and management tools."""
+    return _render_dashboard(request, 'admin', 'admin_dashboard.html', admin_dashboard_context)
+
+
+def _chart_etag(request, chart):
+    role = _get_role_for_user(request.user)
+    if role is None or chart not in CHARTS[role]:
+        return None
+    return chart_etag(role, request.user, chart)
+
+
+@login_required
+@query_budget(max_queries=10)
+@condition(etag_func=_chart_etag)
+def dashboard_chart_data(request, chart):
+    """JSON data for one dashboard chart, answered with 304 while the data is unchanged."""
+    role = _get_role_for_user(request.user)
+    builders = CHARTS.get(role, {})
+    if chart not in builders:
+        raise Http404("Unknown chart")
+
+    response = JsonResponse({'chart': chart, 'data': builders[chart](request.user)})
+    # Let the browser keep the response but revalidate it with the ETag every time
+    response['Cache-Control'] = 'private, no-cache'
+    return response
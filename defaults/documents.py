@@ -0,0 +1,122 @@
+import io
+
+# Runs in worker processes started with "spawn", so nothing here may import
+# Django models or settings; defaults/previews.py stores the results.
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+try:
+    from pdf2image import convert_from_bytes, convert_from_path
+except ImportError:
+    convert_from_bytes = convert_from_path = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+THUMBNAIL_SIZE = (300, 420)
+TEXT_LIMIT = 100_000
+
+
+def _open(source):
+    # A path when the file is on local disk, otherwise its bytes
+    return open(source, 'rb') if isinstance(source, str) else io.BytesIO(source)
+
+
+def _png(image):
+    image.thumbnail(THUMBNAIL_SIZE)
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def _pdf_with_pymupdf(source):
+    document = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype='pdf')
+    with document:
+        parts = []
+        length = 0
+        for page in document:
+            text = page.get_text()
+            parts.append(text)
+            length += len(text)
+            if length >= TEXT_LIMIT:
+                break
+        thumbnail = None
+        if document.page_count:
+            page = document[0]
+            zoom = min(THUMBNAIL_SIZE[0] / page.rect.width, THUMBNAIL_SIZE[1] / page.rect.height, 2)
+            thumbnail = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes('png')
+        return {'page_count': document.page_count, 'text': ''.join(parts)[:TEXT_LIMIT], 'thumbnail': thumbnail}
+
+
+def _pdf_without_pymupdf(source):
+    # pypdf for the text and pdf2image (which needs poppler) for the thumbnail, whichever is installed
+    result = {'page_count': None, 'text': '', 'thumbnail': None}
+    if pypdf is not None:
+        with _open(source) as handle:
+            reader = pypdf.PdfReader(handle)
+            result['page_count'] = len(reader.pages)
+            parts = []
+            length = 0
+            for page in reader.pages:
+                text = page.extract_text() or ''
+                parts.append(text)
+                length += len(text)
+                if length >= TEXT_LIMIT:
+                    break
+            result['text'] = '\n'.join(parts)[:TEXT_LIMIT]
+    if convert_from_path is not None and Image is not None:
+        convert = convert_from_path if isinstance(source, str) else convert_from_bytes
+        try:
+            images = convert(source, first_page=1, last_page=1, size=(THUMBNAIL_SIZE[0], None))
+        except Exception:
+            # Poppler missing or unable to render the file, keep what pypdf read
+            if result['page_count'] is None:
+                raise
+            images = []
+        if images:
+            result['thumbnail'] = _png(images[0])
+    if result['page_count'] is None and result['thumbnail'] is None:
+        return None
+    return result
+
+
+def _image(source):
+    with _open(source) as handle, Image.open(handle) as image:
+        image.load()
+        return {'page_count': None, 'text': '', 'thumbnail': _png(image)}
+
+
+def _text(source):
+    with _open(source) as handle:
+        return {'page_count': None, 'text': handle.read(TEXT_LIMIT * 4).decode('utf-8', 'replace')[:TEXT_LIMIT], 'thumbnail': None}
+
+
+def extract(source, mime_type):
+    """
+    Page count, text and a PNG thumbnail of the first page of a file, given
+    its path or bytes. status is 'unsupported' when no installed library
+    can read the type.
+    """
+    result = None
+    if mime_type == 'application/pdf':
+        result = _pdf_with_pymupdf(source) if fitz is not None else _pdf_without_pymupdf(source)
+    elif mime_type.startswith('image/') and Image is not None:
+        result = _image(source)
+    elif mime_type.startswith('text/'):
+        result = _text(source)
+    if result is None:
+        return {'status': 'unsupported', 'page_count': None, 'text': '', 'thumbnail': None}
+    result['status'] = 'done'
+    return result
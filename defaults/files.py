@@ -0,0 +1,64 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+# Leading bytes of the formats students and supervisors upload most
+SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+# Page objects in an uncompressed PDF, "/Type /Page" but not "/Type /Pages"
+PAGE_PATTERN = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+
+def guess_mime_type(name, head=b''):
+    for signature, mime_type in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return mimetypes.guess_type(name or '')[0] or 'application/octet-stream'
+
+
+def inspect_file(fileobj, name=''):
+    """
+    Size, MIME type, SHA-256 and (for PDFs) page count of a file, read once
+    in chunks. The file is rewound afterwards so it can still be saved.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    scanned_pages = 0
+    tail = b''
+    fileobj.seek(0)
+    chunks = fileobj.chunks() if hasattr(fileobj, 'chunks') else iter(lambda: fileobj.read(64 * 1024), b'')
+    for chunk in chunks:
+        if not head:
+            head = chunk[:16]
+        digest.update(chunk)
+        size += len(chunk)
+        # Keep a little of the previous chunk so a marker split across chunks is still found
+        window = tail + chunk
+        scanned_pages += len(PAGE_PATTERN.findall(window)) - len(PAGE_PATTERN.findall(tail))
+        tail = chunk[-32:]
+
+    mime_type = guess_mime_type(os.path.basename(name), head)
+    # A quick estimate, defaults/previews.py replaces it with the PDF library's count in the background
+    page_count = (scanned_pages or None) if mime_type == 'application/pdf' else None
+    fileobj.seek(0)
+    return {
+        'size': size,
+        'mime_type': mime_type,
+        'sha256': digest.hexdigest(),
+        'page_count': page_count,
+    }
+
+
+def upload_metadata(upload):
+    """inspect_file() of an uploaded file plus its original name, as FileMetadata field values."""
+    metadata = inspect_file(upload, upload.name)
+    metadata['original_name'] = os.path.basename(upload.name)[:255]
+    return metadata
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from assessment.models import AssessmentDetailFile, AssessmentSampleFile, SubmissionFile
+from projects.models import ProjectFile
+
+FILE_MODELS = (SubmissionFile, ProjectFile, AssessmentDetailFile, AssessmentSampleFile)
+
+
+class Command(BaseCommand):
+    help = "Read files uploaded before metadata was recorded and store their size, type, checksum and page count."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Rows updated per query.")
+
+    def handle(self, *args, **options):
+        fields = ['original_name', 'size', 'mime_type', 'sha256', 'page_count']
+        for model in FILE_MODELS:
+            updated, recorded, missing = [], 0, 0
+            for row in model.objects.filter(sha256='').iterator(chunk_size=options['batch_size']):
+                try:
+                    with row.file.open('rb') as handle:
+                        row.capture_file_metadata(handle)
+                except (OSError, ValueError) as e:
+                    self.stderr.write(f"Skipping {model.__name__} {row.pk}: {e}")
+                    missing += 1
+                    continue
+                updated.append(row)
+                recorded += 1
+                if len(updated) >= options['batch_size']:
+                    model.objects.bulk_update(updated, fields)
+                    updated = []
+            model.objects.bulk_update(updated, fields)
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: {recorded} files recorded, {missing} missing."))
@@ -0,0 +1,161 @@
+import json
+import math
+import os
+import subprocess
+import tempfile
+import time
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from application.models import ApplicationMember
+from projects.models import Project
+from assessment.models import Assessment
+from defaults.seeding import PREFIX, SCHEMA_NAME, seed_dataset
+
+User = get_user_model()
+
+# (label, user role, url name, url arguments)
+TARGETS = [
+    ('admin dashboard', 'admin', 'homepage', lambda fixtures: []),
+    ('supervisor dashboard', 'supervisor', 'homepage', lambda fixtures: []),
+    ('student dashboard', 'student', 'homepage', lambda fixtures: []),
+    ('dashboard chart', 'supervisor', 'dashboard_chart_data', lambda fixtures: ['grade_ranges']),
+    ('grading list', 'supervisor', 'grading:grading', lambda fixtures: []),
+    ('grading detail', 'supervisor', 'grading:assessment_detail', lambda fixtures: [fixtures['assessment'].pk]),
+    ('student assignments', 'student', 'student_view_assignment', lambda fixtures: []),
+    ('project catalogue', 'student', 'student_projects', lambda fixtures: []),
+    ('project detail', 'student', 'project_detail', lambda fixtures: [fixtures['project'].pk]),
+    ('supervisor applications', 'supervisor', 'supervisor_application', lambda fixtures: []),
+    ('notifications', 'student', 'view_all_notifications', lambda fixtures: []),
+]
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)), 1) - 1]
+
+
+def _fixtures():
+    """The busiest seeded supervisor, a student in an accepted group and the most submitted assessment."""
+    supervisor = (
+        User.objects.filter(username__startswith=f'{PREFIX}supervisor')
+        .annotate(applications=Count('project__applications')).order_by('-applications').first()
+    )
+    membership = (
+        ApplicationMember.objects.filter(user__username__startswith=PREFIX, application__status='accepted')
+        .order_by('-application__application_type', 'pk').select_related('user').first()
+    )
+    return {
+        'admin': User.objects.get(username=f'{PREFIX}admin'),
+        'supervisor': supervisor,
+        'student': membership.user,
+        'assessment': (
+            Assessment.objects.filter(schema__name=SCHEMA_NAME)
+            .annotate(submissions=Count('studentsubmission')).order_by('-submissions').first()
+        ),
+        'project': Project.objects.filter(supervisor=supervisor).first(),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Seed datasets of several sizes into a throwaway test database and time the main views "
+            "with the test client, reporting latency and query counts.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='25,100,400', help="Comma separated numbers of students.")
+        parser.add_argument('--repeat', type=int, default=5, help="Warm requests per view.")
+        parser.add_argument('--json', dest='json_path', help="Write the results to this file.")
+        parser.add_argument('--compare', help="Results file from an earlier run to compare against.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes must be a comma separated list of numbers")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+        results = {'revision': _git_revision(), 'repeat': options['repeat'], 'sizes': {}}
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root, PRIVATE_MEDIA_ROOT=os.path.join(media_root, 'private'),
+                                      QUERY_BUDGET_RAISE=False):
+                for size in sizes:
+                    call_command('flush', interactive=False, verbosity=0)
+                    cache.clear()
+                    seed_dataset(students=size)
+                    results['sizes'][str(size)] = self.run_size(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.print_table(results, baseline)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f"Results written to {options['json_path']}")
+
+    def run_size(self, repeat):
+        fixtures = _fixtures()
+        clients = {}
+        for role in ('admin', 'supervisor', 'student'):
+            clients[role] = Client()
+            clients[role].force_login(fixtures[role])
+
+        timings = {}
+        for label, role, url_name, url_args in TARGETS:
+            url = reverse(url_name, args=url_args(fixtures))
+            client = clients[role]
+            runs = []
+            # The first request is cold (empty caches), the rest are warm
+            for _ in range(repeat + 1):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    elapsed = (time.perf_counter() - started) * 1000
+                runs.append((elapsed, len(queries.captured_queries), response.status_code))
+            cold, warm = runs[0], runs[1:] or runs[:1]
+            timings[label] = {
+                'status': cold[2],
+                'cold_ms': round(cold[0], 2),
+                'cold_queries': cold[1],
+                'warm_p50_ms': round(_percentile([run[0] for run in warm], 50), 2),
+                'warm_p90_ms': round(_percentile([run[0] for run in warm], 90), 2),
+                'warm_queries': warm[-1][1],
+            }
+        return timings
+
+    def print_table(self, results, baseline=None):
+        header = f"{'students':>8}  {'view':<24} {'status':>6} {'cold ms':>9} {'cold q':>7} " \
+                 f"{'p50 ms':>9} {'p90 ms':>9} {'warm q':>7}"
+        if baseline:
+            header += f" {'Δ p50 ms':>10} {'Δ warm q':>9}"
+        self.stdout.write(f"Revision: {results['revision'] or 'unknown'}"
+                          + (f" (compared with {baseline.get('revision') or 'unknown'})" if baseline else ""))
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for size, timings in results['sizes'].items():
+            for label, row in timings.items():
+                line = f"{size:>8}  {label:<24} {row['status']:>6} {row['cold_ms']:>9.1f} {row['cold_queries']:>7} " \
+                       f"{row['warm_p50_ms']:>9.1f} {row['warm_p90_ms']:>9.1f} {row['warm_queries']:>7}"
+                previous = baseline['sizes'].get(size, {}).get(label) if baseline else None
+                if previous:
+                    line += f" {row['warm_p50_ms'] - previous['warm_p50_ms']:>+10.1f}" \
+                            f" {row['warm_queries'] - previous['warm_queries']:>+9}"
+                self.stdout.write(line)
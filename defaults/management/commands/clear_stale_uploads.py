@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from assessment.uploads import clear_stale_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads that were never submitted and have expired, along with their staged chunks. Run it daily."
+
+    def handle(self, *args, **options):
+        removed = clear_stale_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Stale uploads removed: {removed}."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from defaults.dashboard_cache import cache_counters
+
+
+class Command(BaseCommand):
+    help = "Show dashboard cache hit/miss counters per role."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Reset the counters after printing them.")
+
+    def handle(self, *args, **options):
+        counters = cache_counters(reset=options['reset'])
+        for role, counts in counters.items():
+            total = counts['hits'] + counts['misses']
+            ratio = (counts['hits'] / total * 100) if total else 0
+            self.stdout.write(
+                f"{role:<11} hits={counts['hits']:<8} misses={counts['misses']:<8} hit ratio={ratio:.1f}%"
+            )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from defaults.storage import BLOB_GC_BATCH_SIZE, adopt_files, collect_garbage, recount_references, sweep_untracked
+
+
+class Command(BaseCommand):
+    help = "Delete stored file blobs that no submission or assessment file references any more, and blob files with no record. Run it daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BLOB_GC_BATCH_SIZE, help="Blobs deleted per transaction.")
+        parser.add_argument('--recount', action='store_true', help="Rebuild reference counts from the rows first.")
+        parser.add_argument('--adopt', action='store_true', help="Move files out of MEDIA_ROOT into private blob storage first.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted.")
+
+    def handle(self, *args, **options):
+        if options['adopt']:
+            self.stdout.write(f"Files moved into blob storage: {adopt_files(options['batch_size'])}.")
+        if options['recount']:
+            self.stdout.write(f"Reference counts corrected: {recount_references()}.")
+        removed, freed = collect_garbage(options['batch_size'], dry_run=options['dry_run'])
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} unreferenced blobs ({freed / (1024 * 1024):.1f} MB)."))
+        # Files left behind by rolled back transactions, which never got a Blob row
+        removed, freed = sweep_untracked(options['batch_size'], dry_run=options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} untracked blob files ({freed / (1024 * 1024):.1f} MB)."))
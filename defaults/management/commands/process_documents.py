@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from defaults.previews import process_pending
+
+
+class Command(BaseCommand):
+    help = "Extract text, page counts and thumbnails for uploaded files still waiting for them, e.g. seeded or older files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Files queued at a time.")
+        parser.add_argument('--all', action='store_true', help="Process every file again, not only pending ones.")
+
+    def handle(self, *args, **options):
+        processed = process_pending(options['batch_size'], reprocess=options['all'])
+        self.stdout.write(self.style.SUCCESS(f"Files processed: {processed}."))
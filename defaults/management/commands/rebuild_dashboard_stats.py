@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from defaults.models import SupervisorRollup
+from defaults.rollups import rebuild_supervisor_rollup
+from defaults.stats import rebuild_dashboard_stats
+from grading.models import FinalMark
+from grading.results import rebuild_final_marks
+
+
+class Command(BaseCommand):
+    help = "Recount every dashboard statistic and overwrite the stored snapshot, supervisor rollups and final marks."
+
+    def handle(self, *args, **options):
+        stats = rebuild_dashboard_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Dashboard statistics rebuilt: {stats.total_students} students, "
+            f"{stats.total_projects} projects, {stats.total_applications} applications, "
+            f"{stats.total_submissions} submissions."
+        ))
+
+        supervisor_ids = list(SupervisorRollup.objects.values_list('pk', flat=True))
+        for supervisor_id in supervisor_ids:
+            rebuild_supervisor_rollup(supervisor_id)
+        self.stdout.write(self.style.SUCCESS(f"Supervisor rollups rebuilt: {len(supervisor_ids)}."))
+
+        rebuild_final_marks()
+        self.stdout.write(self.style.SUCCESS(f"Final marks rebuilt: {FinalMark.objects.count()}."))
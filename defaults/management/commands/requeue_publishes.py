@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from grading.publishing import requeue_stalled
+
+
+class Command(BaseCommand):
+    help = "Publish again the grade publish events a restart left pending or running. Run it after deploys or every few minutes."
+
+    def handle(self, *args, **options):
+        published = requeue_stalled()
+        self.stdout.write(self.style.SUCCESS(f"Stalled publish events completed: {published}."))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from defaults.seeding import PASSWORD, PREFIX, clear_seed_data, seed_dataset
+
+
+class Command(BaseCommand):
+    help = "Create a synthetic dataset of configurable size for local load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50)
+        parser.add_argument('--supervisors', type=int, default=None,
+                            help="Defaults to one supervisor per ten students (at least two).")
+        parser.add_argument('--projects-per-supervisor', type=int, default=3)
+        parser.add_argument('--assessments', type=int, default=4)
+        parser.add_argument('--attempts', type=int, default=2, help="Maximum attempts per submission.")
+        parser.add_argument('--group-size', type=int, default=3)
+        parser.add_argument('--group-ratio', type=float, default=0.3,
+                            help="Share of applications made by groups rather than individuals.")
+        parser.add_argument('--notifications', type=int, default=5, help="Notifications per user.")
+        parser.add_argument('--no-files', action='store_true', help="Do not write project and submission files.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, the same seed gives the same data.")
+        parser.add_argument('--clear', action='store_true', help="Delete previously seeded data first.")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted = clear_seed_data()
+            self.stdout.write(f"Deleted {deleted} previously seeded rows.")
+
+        created = seed_dataset(
+            students=options['students'],
+            supervisors=options['supervisors'],
+            projects_per_supervisor=options['projects_per_supervisor'],
+            assessments=options['assessments'],
+            attempts=options['attempts'],
+            group_size=options['group_size'],
+            group_ratio=options['group_ratio'],
+            notifications=options['notifications'],
+            files=not options['no_files'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded " + ", ".join(f"{count} {name}" for name, count in created.items()) + "."
+        ))
+        self.stdout.write(f"Log in as {PREFIX}admin, {PREFIX}supervisor0 or {PREFIX}student0 with password '{PASSWORD}'.")
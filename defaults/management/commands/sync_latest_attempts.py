@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from assessment.models import Assessment, StudentSubmission
+from grading.queries import sync_latest_flags
+from grading.statistics import bump_grade_version
+
+
+class Command(BaseCommand):
+    help = "Recompute the is_latest flag of every submission, e.g. after upgrading or bulk loading submissions."
+
+    def handle(self, *args, **options):
+        if sync_latest_flags():
+            # Cached grade statistics are computed from the latest attempts
+            for assessment_id in Assessment.objects.values_list('id', flat=True):
+                bump_grade_version(assessment_id)
+        latest = StudentSubmission.objects.filter(is_latest=True).count()
+        self.stdout.write(self.style.SUCCESS(f"Latest attempts flagged: {latest}."))
@@ -0,0 +1,139 @@
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+# How protected media is handed to the client:
+#   ''                 Django streams it, through wsgi.file_wrapper (sendfile) where the server has one
+#   'x-sendfile'       Apache mod_xsendfile / lighttpd send the file named in the header
+#   'x-accel-redirect' nginx serves it from an internal location at the storage's accel_prefix
+#                      (PRIVATE_MEDIA_ACCEL_PREFIX for submission files), or MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT
+MEDIA_DELIVERY = getattr(settings, 'MEDIA_DELIVERY', '')
+MEDIA_ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Reads at most `length` bytes of an open file from where it is positioned."""
+
+    def __init__(self, handle, length):
+        self.handle = handle
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.handle.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.handle.close()
+
+
+def parse_range(header, size):
+    """
+    The (first, last) bytes asked for by a single-range Range header, None
+    when the whole file should be sent instead (no header, a malformed one or
+    several ranges, all of which the client must accept), or False when the
+    range lies past the end of the file.
+    """
+    match = RANGE_PATTERN.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N, the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = int(last) if last else size - 1
+    if first >= size:
+        return False
+    if last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+def _open(fieldfile):
+    # A real file where storage is on local disk, so servers can sendfile() it
+    try:
+        return open(fieldfile.path, 'rb')
+    except NotImplementedError:
+        return fieldfile.storage.open(fieldfile.name, 'rb')
+
+
+def _size(handle, fieldfile):
+    try:
+        return os.fstat(handle.fileno()).st_size
+    except (AttributeError, OSError):
+        return fieldfile.size
+
+
+def _file_response(request, fieldfile, filename, content_type, as_attachment, etag, timestamp):
+    handle = _open(fieldfile)
+    size = _size(handle, fieldfile)
+
+    # If-Range: only resume from a range when the file is still the one the client has part of
+    if_range = request.headers.get('If-Range')
+    byte_range = None
+    if not if_range or if_range in (etag, timestamp is not None and http_date(timestamp)):
+        byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range is False:
+        handle.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        return FileResponse(handle, content_type=content_type, as_attachment=as_attachment, filename=filename)
+
+    first, last = byte_range
+    handle.seek(first)
+    # A range running to the end is still the file itself, which keeps sendfile() available
+    body = handle if last == size - 1 else RangeFile(handle, last - first + 1)
+    response = FileResponse(body, content_type=content_type, as_attachment=as_attachment, filename=filename)
+    response.status_code = 206
+    response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    response['Content-Length'] = last - first + 1
+    return response
+
+
+def serve_file(request, fieldfile, filename, content_type='', etag='', last_modified=None, as_attachment=False):
+    """
+    Send a stored file after the view has checked who may see it. Answers
+    conditional requests with 304/412 from the ETag and Last-Modified, then
+    hands the transfer to the front-end server when MEDIA_DELIVERY says so,
+    otherwise streams it with Range support.
+    """
+    etag = quote_etag(etag) if etag else None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        content_type = content_type or 'application/octet-stream'
+        if MEDIA_DELIVERY == 'x-accel-redirect':
+            response = HttpResponse(content_type=content_type)
+            prefix = getattr(fieldfile.storage, 'accel_prefix', MEDIA_ACCEL_PREFIX)
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(fieldfile.name)
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        elif MEDIA_DELIVERY == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = fieldfile.path
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        else:
+            response = _file_response(request, fieldfile, filename, content_type, as_attachment, etag, timestamp)
+            response['Accept-Ranges'] = 'bytes'
+
+    if etag:
+        response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Only ever cached by the browser that was allowed to see it, and checked again before reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
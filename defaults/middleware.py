@@ -0,0 +1,54 @@
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+from . import profiling
+
+
+class QueryProfilingMiddleware:
+    """
+    Record query count, SQL time, the slowest statements and template render
+    time for every request, grouped by URL name.
+
+    Opt-in: does nothing unless QUERY_PROFILING is True. Figures are added as
+    response headers and collected for the staff summary at /profiling/queries/.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if not getattr(Template.render, 'profiled', False):
+            Template.render = profiling.timed_template_render(Template.render)
+
+    def __call__(self, request):
+        profile, token = profiling.start_profile()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profiling.query_recorder))
+                response = self.get_response(request)
+        finally:
+            profiling.stop_profile(token)
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else '<unresolved>'
+        budget = getattr(request, '_query_budget', None)
+        problems = budget.violations(profile) if budget else []
+        profiling.record_request(route, profile, budget, over_budget=bool(problems))
+
+        response['X-Query-Count'] = str(profile.query_count)
+        response['X-Query-Time'] = f"{profile.sql_time * 1000:.1f}ms"
+        response['Server-Timing'] = ', '.join([
+            f"sql;dur={profile.sql_time * 1000:.1f};desc=\"{profile.query_count} queries\"",
+            f"template;dur={profile.template_time * 1000:.1f}",
+            f"total;dur={profile.total_time * 1000:.1f}",
+        ])
+
+        if problems:
+            profiling.enforce_budget(route, problems)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
@@ -1,8 +1,90 @@
+import os
+import uuid
 from django.db import models
 from django.contrib.auth.models import User
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
+from .files import inspect_file
+
+# Uploaded file metadata
+
+def preview_upload_path(instance, filename):
+    # Random names, a thumbnail must not be found from its row's id
+    return timezone.now().strftime(f'previews/%Y/%m/{uuid.uuid4().hex}.png')
+
+
+class FileMetadata(models.Model):
+    """
+    Size, type, checksum and page count of an uploaded `file`, recorded once
+    when the upload is saved so lists and exports never have to touch storage,
+    plus the text and thumbnail extracted from it in the background.
+    """
+    original_name = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(blank=True, null=True)
+    mime_type = models.CharField(max_length=100, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    page_count = models.PositiveIntegerField(blank=True, null=True)
+
+    # Filled in after the upload by the background pipeline in defaults/previews.py
+    PREVIEW_STATUSES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('unsupported', 'Unsupported'),
+        ('failed', 'Failed'),
+    ]
+    preview_status = models.CharField(max_length=20, choices=PREVIEW_STATUSES, default='pending', db_index=True)
+    preview_text = models.TextField(blank=True)
+    thumbnail = models.ImageField(upload_to=preview_upload_path, blank=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        abstract = True
+
+    def capture_file_metadata(self, fileobj=None):
+        """Fill in the metadata from the upload, or from storage when given the opened file."""
+        fileobj = fileobj or self.file.file
+        name = getattr(fileobj, 'name', None) or self.file.name
+        for field, value in inspect_file(fileobj, name).items():
+            setattr(self, field, value)
+        if not self.original_name:
+            self.original_name = os.path.basename(name)[:255]
+
+    def save(self, *args, **kwargs):
+        # A file that is not committed yet is still the upload, read it before storage does
+        if self.file and not self.file._committed:
+            self.capture_file_metadata()
+        super().save(*args, **kwargs)
+
+    @property
+    def filename(self):
+        return self.original_name or os.path.basename(self.file.name)
+
+
+class Blob(models.Model):
+    """
+    One stored copy of some file content, shared by every row that uploaded
+    the same bytes. See defaults/storage.py.
+    """
+    # Storage name, blobs/<aa>/<bb>/<sha256><ext>
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    # Rows whose file is this blob, kept by defaults/signals.py, zero once gc_blobs may remove it
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Garbage collection only looks at unreferenced blobs
+            models.Index(fields=['updated_at'], condition=models.Q(ref_count=0), name='blob_orphan_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
 # Notification model
 
 class Notification(models.Model):
@@ -13,4 +95,114 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Notification for {self.user.username}"
\ No newline at end of file
+        return f"Notification for {self.user.username}"
+
+# Submission counters shared by the snapshot and the rollups
+
+GRADE_BINS = 5
+
+
+class SubmissionCounters(models.Model):
+    """
+    Submission counts kept as running totals: saving a submission adds its
+    change with F() expressions (defaults/stats.py apply_submission_delta)
+    instead of recounting the table.
+    """
+    total_submissions = models.PositiveIntegerField(default=0)
+    graded_submissions = models.PositiveIntegerField(default=0)
+    # Sum of graded percentages, and graded submissions per bin of
+    # grading.distribution.DEFAULT_EDGES from the top, GRADE_BINS of them
+    grade_percent_total = models.FloatField(default=0)
+    grade_bin_0 = models.PositiveIntegerField(default=0)
+    grade_bin_1 = models.PositiveIntegerField(default=0)
+    grade_bin_2 = models.PositiveIntegerField(default=0)
+    grade_bin_3 = models.PositiveIntegerField(default=0)
+    grade_bin_4 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def pending_grading(self):
+        return self.total_submissions - self.graded_submissions
+
+    @property
+    def grade_bin_counts(self):
+        return [getattr(self, f'grade_bin_{i}') for i in range(GRADE_BINS)]
+
+    @property
+    def average_grade(self):
+        graded = sum(self.grade_bin_counts)
+        return self.grade_percent_total / graded if graded else 0
+
+    @property
+    def grade_bins(self):
+        # grading imports these models, so not at the top
+        from grading.distribution import distribution_ranges
+        return distribution_ranges(self.grade_bin_counts)
+
+
+# Admin dashboard statistics snapshot
+
+class DashboardStats(SubmissionCounters):
+    """Single-row snapshot of the counts shown on the admin dashboard.
+
+    Kept current by the signals in defaults/signals.py and rebuilt from
+    scratch with `python manage.py rebuild_dashboard_stats`.
+    """
+    # Users
+    total_students = models.PositiveIntegerField(default=0)
+    total_supervisors = models.PositiveIntegerField(default=0)
+
+    # Projects
+    total_projects = models.PositiveIntegerField(default=0)
+    available_projects = models.PositiveIntegerField(default=0)
+    taken_projects = models.PositiveIntegerField(default=0)
+    project_type_counts = models.JSONField(default=dict, blank=True)
+
+    # Applications
+    total_applications = models.PositiveIntegerField(default=0)
+    pending_applications = models.PositiveIntegerField(default=0)
+    accepted_applications = models.PositiveIntegerField(default=0)
+    declined_applications = models.PositiveIntegerField(default=0)
+
+    # Assessments, submissions are counted by SubmissionCounters
+    total_assessments = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dashboard statistics (updated {self.updated_at:%Y-%m-%d %H:%M})"
+
+
+# Supervisor dashboard rollup
+
+class SupervisorRollup(SubmissionCounters):
+    """Per-supervisor counts shown on the supervisor dashboard.
+
+    Kept current by the signals in defaults/signals.py, one section at a
+    time, so the dashboard reads a single row by primary key.
+    """
+    supervisor = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                      primary_key=True, related_name='dashboard_rollup')
+
+    # Projects
+    total_projects = models.PositiveIntegerField(default=0)
+    available_projects = models.PositiveIntegerField(default=0)
+    taken_projects = models.PositiveIntegerField(default=0)
+    project_type_counts = models.JSONField(default=dict, blank=True)
+
+    # Applications
+    total_applications = models.PositiveIntegerField(default=0)
+    pending_applications = models.PositiveIntegerField(default=0)
+    accepted_applications = models.PositiveIntegerField(default=0)
+    declined_applications = models.PositiveIntegerField(default=0)
+    active_students = models.PositiveIntegerField(default=0)
+
+    # Submissions for accepted applications, counted by SubmissionCounters
+    assessment_stats = models.JSONField(default=list, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dashboard rollup for {self.supervisor}"
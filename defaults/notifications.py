@@ -0,0 +1,134 @@
+import time
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from .models import Notification
+from . import background
+
+# How many notifications the header and the dashboards show
+SUMMARY_SIZE = getattr(settings, 'NOTIFICATION_SUMMARY_SIZE', 5)
+SUMMARY_TIMEOUT = getattr(settings, 'NOTIFICATION_SUMMARY_TIMEOUT', 60 * 60)
+
+VERSION_KEY = 'notifications:version:{}'
+SUMMARY_KEY = 'notifications:summary:{}:{}'
+
+SUMMARY_FIELDS = ('id', 'message', 'url', 'is_read', 'created_at')
+
+
+def _version(user_id):
+    key = VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def build_notification_summary(user_id):
+    """Unread count, newest unread and newest overall notifications, as plain dicts."""
+    notifications = Notification.objects.filter(user_id=user_id).order_by('-created_at', '-id')
+    return {
+        'unread_count': notifications.filter(is_read=False).count(),
+        'unread': list(notifications.filter(is_read=False).values(*SUMMARY_FIELDS)[:SUMMARY_SIZE]),
+        'recent': list(notifications.values(*SUMMARY_FIELDS)[:SUMMARY_SIZE]),
+    }
+
+
+def get_notification_summary(user):
+    """
+    Cached notification summary for a user. Stored under a per-user version,
+    so a summary built from data that changed meanwhile is never read again.
+    """
+    key = SUMMARY_KEY.format(user.pk, _version(user.pk))
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_notification_summary(user.pk)
+        cache.set(key, summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_notification_summary(user_id):
+    key = VERSION_KEY.format(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_notification_summaries(user_ids):
+    """Invalidate after the current transaction commits, e.g. after a bulk update."""
+    for user_id in set(user_ids):
+        transaction.on_commit(partial(invalidate_notification_summary, user_id))
+
+
+# Dispatch
+
+def _user_id(user):
+    return user if isinstance(user, int) else user.pk
+
+
+class NotificationBatch:
+    """
+    Collect notifications and create them with one bulk insert.
+
+        batch = NotificationBatch()
+        batch.add(project.supervisor, "New application", url)
+        batch.add(members, "You were added to an application", url)
+        batch.send()
+
+    A user gets each (message, url) once per batch, and not at all while an
+    identical notification is still unread.
+    """
+
+    def __init__(self):
+        self.pending = {}
+
+    def add(self, users, message, url=None):
+        if isinstance(users, int) or hasattr(users, 'pk'):
+            users = [users]
+        for user in users:
+            self.pending.setdefault((_user_id(user), message, url or None), None)
+        return self
+
+    def __len__(self):
+        return len(self.pending)
+
+    def send(self, defer=None):
+        """Create the notifications now, or after commit on the worker pool when deferred."""
+        items = list(self.pending)
+        self.pending = {}
+        if not items:
+            return 0
+        if defer is None:
+            # Read on every send, so override_settings and changes at runtime apply
+            defer = getattr(settings, 'DEFER_NOTIFICATIONS', False)
+        if defer:
+            background.run_after_commit(deliver_notifications, items)
+            return len(items)
+        return deliver_notifications(items)
+
+
+def deliver_notifications(items):
+    """Bulk create (user_id, message, url) notifications, skipping ones the user has unread already."""
+    messages = {(message, url) for _, message, url in items}
+    unread = Q()
+    for message, url in messages:
+        unread |= Q(message=message, url=url) if url else Q(message=message, url__isnull=True)
+    existing = set(
+        Notification.objects.filter(unread, is_read=False, user_id__in={user_id for user_id, _, _ in items})
+        .values_list('user_id', 'message', 'url')
+    )
+    new = [item for item in items if item not in existing]
+    Notification.objects.bulk_create([
+        Notification(user_id=user_id, message=message, url=url) for user_id, message, url in new
+    ])
+    # bulk_create sends no post_save, so invalidate the summaries here
+    invalidate_notification_summaries(user_id for user_id, _, _ in new)
+    return len(new)
+
+
+def notify(users, message, url=None, defer=None):
+    """Send the same notification to one or more users with a single insert."""
+    return NotificationBatch().add(users, message, url).send(defer=defer)
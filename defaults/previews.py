@@ -0,0 +1,152 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from functools import partial
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from . import background, documents
+
+logger = logging.getLogger(__name__)
+
+# Text, page counts and thumbnails are extracted in separate processes, PDF
+# rendering is CPU bound and would hold the GIL of the web workers
+DOCUMENT_WORKERS = getattr(settings, 'DOCUMENT_WORKERS', 2)
+
+# Models whose uploads get a preview
+PREVIEW_MODELS = (
+    'projects.ProjectFile',
+    'assessment.SubmissionFile',
+    'assessment.AssessmentDetailFile',
+    'assessment.AssessmentSampleFile',
+)
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # "spawn" so the workers never inherit the web process's threads or database connections
+            _pool = ProcessPoolExecutor(max_workers=DOCUMENT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _fail(model, pk, error):
+    logger.warning("Could not process %s %s: %s", model._meta.label, pk, error)
+    model.objects.filter(pk=pk).update(preview_status='failed', processed_at=timezone.now())
+
+
+def _store(model, pk, result):
+    fields = {'preview_status': result['status'], 'preview_text': result['text'], 'processed_at': timezone.now()}
+    if result['page_count'] is not None:
+        fields['page_count'] = result['page_count']
+    row = model.objects.filter(pk=pk).only('pk', 'thumbnail').first()
+    if row is None:
+        return
+    if result['thumbnail']:
+        if row.thumbnail:
+            row.thumbnail.delete(save=False)
+        row.thumbnail.save('preview.png', ContentFile(result['thumbnail']), save=False)
+        fields['thumbnail'] = row.thumbnail.name
+    # update() rather than save(), so storing a preview fires no signals
+    model.objects.filter(pk=pk).update(**fields)
+
+
+def _processed_copy(row):
+    """The preview of a finished row with the same bytes, so shared blobs are rendered once."""
+    if not row.sha256:
+        return None
+    # The row's own model first, its previews are the likeliest match
+    for label in sorted(PREVIEW_MODELS, key=lambda label: label != row._meta.label):
+        done = apps.get_model(label).objects.filter(sha256=row.sha256, preview_status='done')
+        if label == row._meta.label:
+            done = done.exclude(pk=row.pk)
+        done = done.first()
+        if done is None:
+            continue
+        thumbnail = None
+        if done.thumbnail:
+            try:
+                with done.thumbnail.open('rb') as handle:
+                    thumbnail = handle.read()
+            except OSError:
+                continue
+        # Each row gets its own copy of the thumbnail, rows delete theirs with them
+        return {'status': 'done', 'page_count': done.page_count, 'text': done.preview_text, 'thumbnail': thumbnail}
+    return None
+
+
+def _finish(model, pk, stored, extraction):
+    try:
+        _store(model, pk, extraction.result())
+    except Exception as e:
+        _fail(model, pk, e)
+    finally:
+        stored.set_result(pk)
+
+
+def _extracted(model, pk, stored, extraction):
+    # Called on the process pool's thread when a worker is done, the
+    # database work goes to the background pool like any other job
+    background.submit(_finish, model, pk, stored, extraction)
+
+
+def process_file(label, pk, reuse=True):
+    """
+    Extract the text, page count and thumbnail of one file row and store
+    them on the row, or copy them from a row with the same bytes when
+    `reuse`. Returns a future that is done once they are stored, or None
+    when that already happened. The extraction runs on the process pool
+    and nothing here waits for it, so background workers stay free.
+    """
+    model = apps.get_model(label)
+    row = model.objects.filter(pk=pk).first()
+    if row is None or not row.file:
+        return None
+    copy = _processed_copy(row) if reuse else None
+    if copy is not None:
+        _store(model, pk, copy)
+        return None
+    try:
+        try:
+            source = row.file.path
+        except NotImplementedError:
+            # Storage without local paths, hand the worker the bytes
+            with row.file.open('rb') as handle:
+                source = handle.read()
+        if getattr(settings, 'BACKGROUND_TASKS_SYNC', False):
+            _store(model, pk, documents.extract(source, row.mime_type))
+            return None
+        extraction = _get_pool().submit(documents.extract, source, row.mime_type)
+    except Exception as e:
+        _fail(model, pk, e)
+        return None
+    stored = Future()
+    extraction.add_done_callback(partial(_extracted, model, pk, stored))
+    return stored
+
+
+def schedule_previews(rows):
+    """Process the rows' files on the background pool once the current transaction commits."""
+    for row in rows:
+        background.run_after_commit(process_file, row._meta.label, row.pk)
+
+
+def process_pending(batch_size=100, reprocess=False):
+    """Process every file still waiting for a preview, or all of them. Returns how many were processed."""
+    processed = 0
+    for label in PREVIEW_MODELS:
+        model = apps.get_model(label)
+        rows = model.objects.all() if reprocess else model.objects.filter(preview_status='pending')
+        pks = list(rows.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), batch_size):
+            # At most a batch of extractions queued on the process pool at a time
+            stored = [process_file(label, pk, reuse=not reprocess) for pk in pks[start:start + batch_size]]
+            wait([future for future in stored if future is not None])
+            processed += len(stored)
+    return processed
@@ -0,0 +1,197 @@
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Samples kept per route and statements kept per request
+MAX_SAMPLES = getattr(settings, 'QUERY_PROFILING_SAMPLES', 500)
+SLOWEST_STATEMENTS = getattr(settings, 'QUERY_PROFILING_SLOWEST', 5)
+
+PERCENTILES = (50, 90, 99)
+
+# Profile of the request being handled on this thread/task
+_current = ContextVar('query_profile', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestProfile:
+    """Queries and template time collected while one request is handled."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = []
+
+    def record_query(self, sql, duration):
+        self.query_count += 1
+        self.sql_time += duration
+        self.statements.append((duration, sql))
+        if len(self.statements) > SLOWEST_STATEMENTS * 4:
+            self.statements = self.slowest()
+
+    def slowest(self):
+        return sorted(self.statements, key=lambda item: item[0], reverse=True)[:SLOWEST_STATEMENTS]
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+
+def start_profile():
+    profile = RequestProfile()
+    return profile, _current.set(profile)
+
+
+def stop_profile(token):
+    _current.reset(token)
+
+
+def query_recorder(execute, sql, params, many, context):
+    """Database execute wrapper that times every statement of the current request."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_query(sql, time.perf_counter() - started)
+
+
+def timed_template_render(render):
+    """Wrap a template backend's render() so its time is added to the current request."""
+    @wraps(render)
+    def _render(self, *args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_time += time.perf_counter() - started
+    _render.profiled = True
+    return _render
+
+
+# Budgets
+
+class QueryBudget:
+    def __init__(self, max_queries=None, max_sql_ms=None):
+        self.max_queries = max_queries
+        self.max_sql_ms = max_sql_ms
+
+    def violations(self, profile):
+        problems = []
+        if self.max_queries is not None and profile.query_count > self.max_queries:
+            problems.append(f"{profile.query_count} queries (budget {self.max_queries})")
+        sql_ms = profile.sql_time * 1000
+        if self.max_sql_ms is not None and sql_ms > self.max_sql_ms:
+            problems.append(f"{sql_ms:.1f}ms of SQL (budget {self.max_sql_ms}ms)")
+        return problems
+
+    def as_dict(self):
+        return {'max_queries': self.max_queries, 'max_sql_ms': self.max_sql_ms}
+
+
+def query_budget(max_queries=None, max_sql_ms=None):
+    """
+    Declare how many queries (and how much SQL time) a view may use.
+
+    Only checked while QUERY_PROFILING is on. Going over the budget is logged,
+    and raises QueryBudgetExceeded when QUERY_BUDGET_RAISE is set (in development).
+    """
+    budget = QueryBudget(max_queries, max_sql_ms)
+
+    def decorator(view_func):
+        # Read by the middleware; functools.wraps carries it through outer decorators
+        view_func.query_budget = budget
+        return view_func
+    return decorator
+
+
+def enforce_budget(route, problems):
+    """Log a request that went over its view's budget, or raise in development."""
+    message = f"Query budget exceeded for {route}: {', '.join(problems)}"
+    if getattr(settings, 'QUERY_BUDGET_RAISE', settings.DEBUG):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+# Per-route statistics, kept in this process
+
+class RouteStats:
+    def __init__(self):
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self.slowest = []
+        self.requests = 0
+        self.over_budget = 0
+        self.budget = None
+
+
+_routes = defaultdict(RouteStats)
+_lock = threading.Lock()
+
+
+def record_request(route, profile, budget=None, over_budget=False):
+    sample = {
+        'queries': profile.query_count,
+        'sql_ms': profile.sql_time * 1000,
+        'template_ms': profile.template_time * 1000,
+        'total_ms': profile.total_time * 1000,
+    }
+    with _lock:
+        stats = _routes[route]
+        stats.samples.append(sample)
+        stats.requests += 1
+        stats.over_budget += int(over_budget)
+        stats.budget = budget
+        slowest = stats.slowest + [(duration * 1000, sql) for duration, sql in profile.slowest()]
+        stats.slowest = sorted(slowest, key=lambda item: item[0], reverse=True)[:SLOWEST_STATEMENTS]
+
+
+def _percentile(values, percent):
+    # Nearest-rank percentile of an already sorted list
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summary(reset=False):
+    """Per-route request counts, percentiles and slowest statements."""
+    with _lock:
+        routes = {}
+        for route, stats in sorted(_routes.items()):
+            samples = list(stats.samples)
+            if not samples:
+                continue
+            metrics = {}
+            for metric in ('queries', 'sql_ms', 'template_ms', 'total_ms'):
+                values = sorted(sample[metric] for sample in samples)
+                metrics[metric] = {
+                    f'p{percent}': round(_percentile(values, percent), 2) for percent in PERCENTILES
+                }
+                metrics[metric]['max'] = round(values[-1], 2)
+            routes[route] = {
+                'requests': stats.requests,
+                'sampled': len(samples),
+                'over_budget': stats.over_budget,
+                'budget': stats.budget.as_dict() if stats.budget else None,
+                'metrics': metrics,
+                'slowest_statements': [
+                    {'ms': round(duration, 2), 'sql': sql} for duration, sql in stats.slowest
+                ],
+            }
+        if reset:
+            _routes.clear()
+    return routes
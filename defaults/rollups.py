@@ -0,0 +1,148 @@
+from django.db.models import Avg, Count, F, FloatField, Q
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+from application.models import Application, ApplicationMember
+from projects.models import Project
+from assessment.models import Assessment, StudentSubmission
+from grading.distribution import grade_distribution
+from .models import SupervisorRollup
+from .stats import apply_submission_delta, grade_counters
+
+
+def project_counts(supervisor_id):
+    counts = Project.objects.filter(supervisor_id=supervisor_id).aggregate(
+        total_projects=Count('id'),
+        available_projects=Count('id', filter=Q(availability='available')),
+        taken_projects=Count('id', filter=Q(availability='taken')),
+        **{
+            f'type_{i}': Count('id', filter=Q(project_type=project_type))
+            for i, (project_type, _) in enumerate(Project.PROJECT_TYPES)
+        }
+    )
+    counts['project_type_counts'] = {
+        project_type: counts.pop(f'type_{i}')
+        for i, (project_type, _) in enumerate(Project.PROJECT_TYPES)
+    }
+    return counts
+
+
+def application_counts(supervisor_id):
+    counts = Application.objects.filter(project__supervisor_id=supervisor_id).aggregate(
+        total_applications=Count('id'),
+        pending_applications=Count('id', filter=Q(status='applied')),
+        accepted_applications=Count('id', filter=Q(status='accepted')),
+        declined_applications=Count('id', filter=Q(status='declined')),
+    )
+    counts['active_students'] = ApplicationMember.objects.filter(
+        application__project__supervisor_id=supervisor_id,
+        application__status='accepted',
+    ).values('user').distinct().count()
+    return counts
+
+
+def _supervised_submissions(supervisor_id):
+    return StudentSubmission.objects.filter(
+        application__project__supervisor_id=supervisor_id,
+        application__status='accepted',
+    )
+
+
+def submission_counts(supervisor_id):
+    submissions = _supervised_submissions(supervisor_id)
+    counts = submissions.aggregate(
+        total_submissions=Count('id'),
+        graded_submissions=Count('id', filter=Q(grades_received__isnull=False)),
+    )
+    counts.update(grade_counters(grade_distribution(submissions)))
+    return counts
+
+
+def assessment_stats(supervisor_id):
+    """Submission and grade figures per assessment, one grouped query plus the assessment list."""
+    rows = (
+        _supervised_submissions(supervisor_id)
+        .values('assignment_id')
+        .annotate(
+            submissions=Count('id'),
+            # Individual assessments have a latest attempt per student, count the applications
+            submitted_applications=Count('application', filter=Q(is_latest=True), distinct=True),
+            graded=Count('id', filter=Q(grades_received__isnull=False)),
+            average=Avg(
+                Cast(F('grades_received'), FloatField()) * 100 / NullIf(F('assignment__weight'), 0),
+                filter=Q(grades_received__isnull=False),
+            ),
+        )
+        .order_by()
+    )
+    per_assessment = {row['assignment_id']: row for row in rows}
+
+    stats = []
+    for assessment in Assessment.objects.order_by('due_date', 'id'):
+        row = per_assessment.get(assessment.id, {})
+        stats.append({
+            'id': assessment.id,
+            'title': assessment.title,
+            'weight': assessment.weight,
+            'due_date': assessment.due_date.isoformat() if assessment.due_date else None,
+            'submissions': row.get('submissions', 0),
+            'submitted_applications': row.get('submitted_applications', 0),
+            'graded': row.get('graded', 0),
+            'average': round(row['average'], 1) if row.get('average') is not None else None,
+        })
+    return stats
+
+
+def assessment_counts(supervisor_id):
+    return {'assessment_stats': assessment_stats(supervisor_id)}
+
+
+# Each section is refreshed on its own when one of its models changes
+SECTIONS = {
+    'projects': project_counts,
+    'applications': application_counts,
+    'submissions': submission_counts,
+    'assessments': assessment_counts,
+}
+
+
+def get_supervisor_rollup(supervisor):
+    """Return the supervisor's rollup, building it on first use."""
+    rollup = SupervisorRollup.objects.filter(pk=supervisor.pk).first()
+    if rollup is None:
+        rollup = rebuild_supervisor_rollup(supervisor.pk)
+    return rollup
+
+
+def refresh_supervisor_rollup(supervisor_id, sections):
+    """Recompute the given sections of one supervisor's rollup."""
+    if not SupervisorRollup.objects.filter(pk=supervisor_id).exists():
+        # Built lazily on the first dashboard visit, nothing to keep up to date yet
+        return
+    values = {}
+    for section in sections:
+        values.update(SECTIONS[section](supervisor_id))
+    values['updated_at'] = timezone.now()
+    SupervisorRollup.objects.filter(pk=supervisor_id).update(**values)
+
+
+def apply_rollup_delta(supervisor_id, delta):
+    """
+    Apply a submission_delta() for a submission of an accepted application
+    to the supervisor's counters, if they have a rollup yet.
+    """
+    apply_submission_delta(SupervisorRollup.objects.filter(pk=supervisor_id), delta)
+
+
+def refresh_all_rollups(sections):
+    """Recompute the given sections for every supervisor that has a rollup."""
+    for supervisor_id in SupervisorRollup.objects.values_list('pk', flat=True):
+        refresh_supervisor_rollup(supervisor_id, sections)
+
+
+def rebuild_supervisor_rollup(supervisor_id):
+    """Recount everything for one supervisor and overwrite their rollup."""
+    values = {}
+    for compute in SECTIONS.values():
+        values.update(compute(supervisor_id))
+    rollup, _ = SupervisorRollup.objects.update_or_create(supervisor_id=supervisor_id, defaults=values)
+    return rollup
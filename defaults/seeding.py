@@ -0,0 +1,239 @@
+import random
+from datetime import datetime, timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import Student, Supervisor
+from application.models import Application, ApplicationMember
+from projects.models import Project, ProjectArea, ProjectFile, ProjectLink
+from assessment.models import AssessmentSchema, Assessment, StudentSubmission, SubmissionFile
+from grading.results import rebuild_final_marks
+from .files import inspect_file
+from .models import Notification, SupervisorRollup
+from .rollups import rebuild_supervisor_rollup
+from .storage import add_references, blob_storage
+from .stats import rebuild_dashboard_stats
+from . import dashboard_cache
+
+User = get_user_model()
+
+# Every seeded row hangs off users or a schema carrying this prefix, so
+# clear_seed_data() can remove them without touching real data
+PREFIX = 'seed_'
+SCHEMA_NAME = 'Seed schema'
+PASSWORD = 'password'
+
+DEPARTMENTS = ['Computer Science', 'Information Systems', 'Data Science', 'Cyber Security']
+AREAS = ['Machine Learning', 'Web', 'Security', 'Networks', 'HCI', 'Databases', 'Cloud', 'IoT']
+
+# Smallest well-formed one-page PDF, so seeded files open like real uploads
+SAMPLE_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+SAMPLE_METADATA = inspect_file(ContentFile(SAMPLE_PDF), 'sample.pdf')
+
+
+def _save_file(path, storage=default_storage):
+    return storage.save(path, ContentFile(SAMPLE_PDF))
+
+
+def _file_metadata(name):
+    # Every seeded file is SAMPLE_PDF, bulk_create skips save() so the metadata is passed in
+    return dict(SAMPLE_METADATA, original_name=name)
+
+
+def clear_seed_data():
+    """Delete everything created by seed_dataset(), including its files."""
+    for path in ProjectFile.objects.filter(project__supervisor__username__startswith=PREFIX).values_list('file', flat=True):
+        default_storage.delete(path)
+    # Submission files share one blob, released as their rows are deleted and left to gc_blobs
+    for path in SubmissionFile.objects.filter(submission__submitted_by__username__startswith=PREFIX).values_list('file', flat=True):
+        blob_storage.delete(path)
+    with transaction.atomic():
+        AssessmentSchema.objects.filter(name=SCHEMA_NAME).delete()
+        deleted, _ = User.objects.filter(username__startswith=PREFIX).delete()
+    refresh_derived_data()
+    return deleted
+
+
+def refresh_derived_data():
+    """bulk_create skips signals, so rebuild the snapshot, rollups and final marks and drop cached dashboards."""
+    rebuild_dashboard_stats()
+    for supervisor_id in SupervisorRollup.objects.values_list('pk', flat=True):
+        rebuild_supervisor_rollup(supervisor_id)
+    rebuild_final_marks()
+    for label in dashboard_cache.dependent_models():
+        dashboard_cache.bump_version(label)
+
+
+def seed_dataset(students=50, supervisors=None, projects_per_supervisor=3, assessments=4,
+                 attempts=2, group_size=3, group_ratio=0.3, notifications=5, files=True, seed=0):
+    """
+    Create a synthetic dataset of the given size with bulk inserts and return
+    the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    supervisors = supervisors or max(2, students // 10)
+    now = timezone.now()
+    today = timezone.localdate()
+    password = make_password(PASSWORD)
+    created = {}
+
+    with transaction.atomic():
+        # Users
+        admin = User.objects.create(
+            username=f'{PREFIX}admin', email=f'{PREFIX}admin@example.com', password=password,
+            is_staff=True, is_superuser=True, first_name='Seed', last_name='Admin',
+        )
+        supervisor_users = User.objects.bulk_create([
+            User(username=f'{PREFIX}supervisor{i}', email=f'{PREFIX}supervisor{i}@example.com',
+                 password=password, is_staff=True, first_name='Supervisor', last_name=str(i))
+            for i in range(supervisors)
+        ])
+        student_users = User.objects.bulk_create([
+            User(username=f'{PREFIX}student{i}', email=f'{PREFIX}student{i}@example.com',
+                 password=password, first_name='Student', last_name=str(i))
+            for i in range(students)
+        ])
+        Supervisor.objects.bulk_create([
+            Supervisor(user=user, staff_id=f'{PREFIX}S{i}', department=rng.choice(DEPARTMENTS))
+            for i, user in enumerate(supervisor_users)
+        ])
+        Student.objects.bulk_create([
+            Student(user=user, student_id=f'{PREFIX}{i}', department=rng.choice(DEPARTMENTS))
+            for i, user in enumerate(student_users)
+        ])
+        created['users'] = 1 + len(supervisor_users) + len(student_users)
+
+        # Projects with areas, links and files
+        projects = Project.objects.bulk_create([
+            Project(
+                title=f'Seed project {i}-{j}',
+                project_type=rng.choice(Project.PROJECT_TYPES)[0],
+                prerequisites='Programming fundamentals',
+                description='Synthetic project created by seed_data.',
+                supervisor=supervisor,
+            )
+            for i, supervisor in enumerate(supervisor_users)
+            for j in range(projects_per_supervisor)
+        ])
+        ProjectArea.objects.bulk_create([
+            ProjectArea(project=project, name=name)
+            for project in projects for name in rng.sample(AREAS, 2)
+        ])
+        ProjectLink.objects.bulk_create([
+            ProjectLink(project=project, url=f'https://example.com/projects/{project.pk}')
+            for project in projects
+        ])
+        if files:
+            ProjectFile.objects.bulk_create([
+                ProjectFile(project=project, display_name='Project brief',
+                            file=_save_file(f'project_files/seed/project_{project.pk}.pdf'),
+                            **_file_metadata(f'project_{project.pk}.pdf'))
+                for project in projects
+            ])
+        created['projects'] = len(projects)
+
+        # Applications: students are split into groups and individuals
+        applications = []
+        memberships = []
+        pool = list(student_users)
+        rng.shuffle(pool)
+        while pool:
+            is_group = len(pool) >= group_size and rng.random() < group_ratio
+            members, pool = (pool[:group_size], pool[group_size:]) if is_group else (pool[:1], pool[1:])
+            status = rng.choices(['accepted', 'applied', 'declined'], weights=[6, 3, 1])[0]
+            applications.append(Application(
+                project=rng.choice(projects),
+                application_type='group' if is_group else 'individual',
+                status=status,
+                message='Seeded application',
+            ))
+            memberships.append(members)
+        applications = Application.objects.bulk_create(applications)
+        ApplicationMember.objects.bulk_create([
+            ApplicationMember(application=application, user=user, is_leader=index == 0)
+            for application, members in zip(applications, memberships)
+            for index, user in enumerate(members)
+        ])
+        # applied_at is auto_now_add, spread it over the last year afterwards
+        for application in applications:
+            application.applied_at = now - timedelta(days=rng.randint(0, 365))
+        Application.objects.bulk_update(applications, ['applied_at'])
+        created['applications'] = len(applications)
+
+        # Schema and assessments, half already past their due date
+        schema = AssessmentSchema.objects.create(
+            name=SCHEMA_NAME, start_date=today - timedelta(days=120), end_date=today + timedelta(days=120),
+        )
+        weights = [100 // assessments] * assessments
+        weights[-1] += 100 - sum(weights)
+        assessment_rows = Assessment.objects.bulk_create([
+            Assessment(
+                schema=schema,
+                title=f'Seed assessment {i + 1}',
+                description='Synthetic assessment created by seed_data.',
+                weight=weights[i],
+                due_date=today + timedelta(days=(i - assessments // 2) * 14),
+                submit_by=today + timedelta(days=(i - assessments // 2) * 14 + 2),
+                submission_type='group' if i % 2 else 'individual',
+            )
+            for i in range(assessments)
+        ])
+        created['assessments'] = len(assessment_rows)
+
+        # Submissions from accepted applications, with earlier attempts and files
+        submissions = []
+        for application, members in zip(applications, memberships):
+            if application.status != 'accepted':
+                continue
+            for assessment in assessment_rows:
+                if assessment.due_date > today + timedelta(days=14) or rng.random() < 0.1:
+                    continue
+                attempt_count = rng.randint(1, attempts)
+                # Individual attempts follow on from the same student's, see StudentSubmission.same_owner()
+                submitter = rng.choice(members)
+                for attempt in range(1, attempt_count + 1):
+                    submitted_at = timezone.make_aware(datetime.combine(
+                        assessment.due_date - timedelta(days=rng.randint(-2, 10)), datetime.min.time()
+                    )) + timedelta(minutes=attempt)
+                    graded = assessment.due_date < today and rng.random() < 0.8
+                    submissions.append(StudentSubmission(
+                        application=application,
+                        assignment=assessment,
+                        submitted_by=rng.choice(members) if assessment.submission_type == 'group' else submitter,
+                        submitted_at=submitted_at,
+                        attempt_number=attempt,
+                        is_latest=attempt == attempt_count,
+                        is_late=submitted_at.date() > assessment.due_date,
+                        grades_received=rng.randint(assessment.weight // 3, assessment.weight) if graded else None,
+                        graded_at=submitted_at + timedelta(days=3) if graded else None,
+                        published_status='published' if graded and rng.random() < 0.5 else 'unpublished',
+                    ))
+        submissions = StudentSubmission.objects.bulk_create(submissions)
+        if files:
+            # Every seeded submission has the same bytes, so they all share one stored blob
+            sample = _save_file(f'{PREFIX}submission.pdf', blob_storage)
+            submission_files = SubmissionFile.objects.bulk_create([
+                SubmissionFile(submission=submission, file=sample, **_file_metadata(f'{PREFIX}{submission.pk}.pdf'))
+                for submission in submissions
+            ])
+            add_references(submission_file.file.name for submission_file in submission_files)
+        created['submissions'] = len(submissions)
+
+        # Notifications, some already read
+        notification_rows = Notification.objects.bulk_create([
+            Notification(user=user, message=f'Seed notification {i + 1}', is_read=rng.random() < 0.5)
+            for user in [admin, *supervisor_users, *student_users]
+            for i in range(notifications)
+        ])
+        created['notifications'] = len(notification_rows)
+
+    refresh_derived_data()
+    return created
@@ -0,0 +1,304 @@
+from collections import Counter, defaultdict
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from application.models import Application, ApplicationMember
+from assessment.models import Assessment, StudentSubmission
+from grading import results, statistics
+from projects.models import Project
+from . import background, dashboard_cache, notifications, previews, rollups, stats, storage, timeseries
+
+
+class _CommitBatch:
+    """Calls queued for one transaction, each run once when it commits."""
+
+    def __init__(self):
+        self.calls = {}
+
+    def add(self, func, args):
+        self.calls.setdefault((func, args), None)
+
+    def flush(self):
+        for func, args in self.calls:
+            func(*args)
+
+
+def _on_commit_once(func, *args):
+    """
+    transaction.on_commit(), except that the same call queued again before
+    the transaction commits runs only once, e.g. when a form saves many
+    assessments. Arguments must be hashable.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        func(*args)
+        return
+    batch = getattr(connection, '_signal_batch', None)
+    # A batch whose flush is no longer queued was run, or dropped by a rollback
+    if batch is None or not any(entry[1] == batch.flush for entry in connection.run_on_commit):
+        batch = connection._signal_batch = _CommitBatch()
+        transaction.on_commit(batch.flush)
+    batch.add(func, args)
+
+
+def _schedule_refresh(section):
+    # Run after the surrounding transaction commits so the counts include the change
+    _on_commit_once(stats.refresh_section, section)
+
+
+def _schedule_rollup(supervisor_id, *sections):
+    if supervisor_id is not None:
+        _on_commit_once(rollups.refresh_supervisor_rollup, supervisor_id, sections)
+
+
+def _supervisor_of_application(application_id):
+    # Looked up while the signal fires, the rows may be gone once a cascade commits
+    return Application.objects.filter(pk=application_id).values_list('project__supervisor_id', flat=True).first()
+
+
+def _schedule_final_marks(schema_id, student_ids=None):
+    if schema_id is not None:
+        _on_commit_once(results.refresh_final_marks, schema_id, None if student_ids is None else frozenset(student_ids))
+
+
+def _schedule_student_marks(student_ids):
+    if student_ids:
+        _on_commit_once(results.refresh_student_marks, frozenset(student_ids))
+
+
+def _students_of_applications(application_ids):
+    return list(ApplicationMember.objects.filter(application_id__in=application_ids).values_list('user_id', flat=True))
+
+
+def _is_login_update(kwargs):
+    # Logging in only touches last_login, which no statistic depends on
+    update_fields = kwargs.get('update_fields')
+    return update_fields is not None and set(update_fields) == {'last_login'}
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, **kwargs):
+    if _is_login_update(kwargs):
+        return
+    _schedule_refresh('users')
+
+
+@receiver(pre_save, sender='projects.Project')
+def remember_project_supervisor(sender, instance, **kwargs):
+    # A reassigned project moves its counts from one supervisor's rollup to another
+    instance._previous_supervisor_id = None
+    if instance.pk:
+        instance._previous_supervisor_id = Project.objects.filter(pk=instance.pk).values_list('supervisor_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender='projects.Project')
+def project_changed(sender, instance, **kwargs):
+    _schedule_refresh('projects')
+    _schedule_rollup(instance.supervisor_id, 'projects')
+    previous = getattr(instance, '_previous_supervisor_id', None)
+    if previous is not None and previous != instance.supervisor_id:
+        _schedule_rollup(previous, *rollups.SECTIONS)
+        _schedule_rollup(instance.supervisor_id, *rollups.SECTIONS)
+
+
+@receiver([post_save, post_delete], sender='application.Application')
+def application_changed(sender, instance, **kwargs):
+    _schedule_refresh('applications')
+    transaction.on_commit(partial(timeseries.invalidate_bucket, 'applications', instance.applied_at))
+    # Accepting an application brings its submissions into the supervisor's figures
+    supervisor_id = Project.objects.filter(pk=instance.project_id).values_list('supervisor_id', flat=True).first()
+    _schedule_rollup(supervisor_id, 'applications', 'submissions', 'assessments')
+    # Accepting or declining an application adds or removes its members from the results
+    _schedule_student_marks(_students_of_applications([instance.pk]))
+
+
+@receiver([post_save, post_delete], sender='application.ApplicationMember')
+def application_member_changed(sender, instance, **kwargs):
+    _schedule_rollup(_supervisor_of_application(instance.application_id), 'applications')
+    _schedule_student_marks([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender='assessment.Assessment')
+def assessment_changed(sender, instance, **kwargs):
+    _schedule_refresh('assessments')
+    # Grade bins are normalised by the assessment weight
+    _schedule_refresh('submissions')
+    # Saving N assessments in one form refreshes all of this once
+    _on_commit_once(rollups.refresh_all_rollups, ('submissions', 'assessments'))
+    # So are final marks, and the type decides who a grade counts for
+    _schedule_final_marks(instance.schema_id)
+    _on_commit_once(statistics.bump_grade_version, instance.pk)
+
+
+def _schedule_submission_counts(deltas, supervisor_deltas):
+    """
+    Add the summed submission_delta()s to the snapshot and, by supervisor id,
+    to the rollups once the transaction commits. The per assessment figures
+    of the rollups need a grouped count, made on the worker pool.
+    """
+    delta, by_supervisor = Counter(), defaultdict(Counter)
+    for change in deltas:
+        delta.update(change)
+    for supervisor_id, change in supervisor_deltas:
+        by_supervisor[supervisor_id].update(change)
+    delta = {field: value for field, value in delta.items() if value}
+    if delta:
+        transaction.on_commit(partial(stats.apply_snapshot_delta, delta))
+    for supervisor_id, change in by_supervisor.items():
+        change = {field: value for field, value in change.items() if value}
+        if change:
+            transaction.on_commit(partial(rollups.apply_rollup_delta, supervisor_id, change))
+        _on_commit_once(background.submit, rollups.refresh_supervisor_rollup, supervisor_id, ('assessments',))
+
+
+@receiver(pre_save, sender='assessment.StudentSubmission')
+def remember_submission_grade(sender, instance, **kwargs):
+    # What the counters hold for the row, so saving it adjusts them by the difference
+    instance._counted_as = None
+    if instance.pk:
+        instance._counted_as = (
+            StudentSubmission.objects.filter(pk=instance.pk).values_list('grades_received', 'assignment__weight').first()
+        )
+
+
+@receiver([post_save, post_delete], sender='assessment.StudentSubmission')
+def submission_changed(sender, instance, signal, created=False, **kwargs):
+    weight, schema_id = (
+        Assessment.objects.filter(pk=instance.assignment_id).values_list('weight', 'schema_id').first() or (0, None)
+    )
+    # Looked up while the signal fires, the rows may be gone once a cascade commits
+    supervisor_id, status = (
+        Application.objects.filter(pk=instance.application_id).values_list('project__supervisor_id', 'status').first()
+        or (None, None)
+    )
+    if signal is post_delete:
+        delta = stats.submission_delta(before=(instance.grades_received, weight))
+    else:
+        before = None if created else getattr(instance, '_counted_as', None)
+        delta = stats.submission_delta(before=before, after=(instance.grades_received, weight))
+    # Rollups only count accepted applications, accepting one recounts them
+    counted = status == 'accepted' and supervisor_id is not None
+    _schedule_submission_counts([delta], [(supervisor_id, delta)] if counted else [])
+
+    transaction.on_commit(partial(timeseries.invalidate_bucket, 'submissions', instance.submitted_at))
+    transaction.on_commit(partial(timeseries.invalidate_bucket, 'gradings', instance.graded_at))
+    _schedule_final_marks(schema_id, {instance.submitted_by_id, *_students_of_applications([instance.application_id])})
+    transaction.on_commit(partial(statistics.bump_grade_version, instance.assignment_id))
+
+
+@receiver(post_delete, sender='assessment.StudentSubmission')
+def promote_previous_attempt(sender, instance, **kwargs):
+    # Deleting the latest attempt makes the one before it the latest
+    if not instance.is_latest:
+        return
+    previous = (
+        StudentSubmission.objects.filter(
+            StudentSubmission.same_owner(instance.submitted_by_id),
+            application_id=instance.application_id, assignment_id=instance.assignment_id,
+        )
+        .order_by('-attempt_number', '-id').values_list('pk', flat=True).first()
+    )
+    if previous is not None:
+        StudentSubmission.objects.filter(pk=previous).update(is_latest=True)
+
+
+def submissions_changed_in_bulk(submissions, previous_grades=None):
+    """
+    What submission_changed does, once for a whole batch. Call it after
+    bulk_update/bulk_create on submissions, which send no signals. Pass the
+    grades the rows had before, by submission id, to adjust the dashboard
+    counters by the difference; without them they are recounted.
+    """
+    submissions = list(submissions)
+    if not submissions:
+        return
+    for moment in {submission.graded_at for submission in submissions}:
+        transaction.on_commit(partial(timeseries.invalidate_bucket, 'gradings', moment))
+    application_ids = {submission.application_id for submission in submissions}
+    applications = {
+        application_id: (supervisor_id, status)
+        for application_id, supervisor_id, status in Application.objects.filter(pk__in=application_ids)
+        .values_list('id', 'project__supervisor_id', 'status')
+    }
+    assessment_ids = {submission.assignment_id for submission in submissions}
+    assessments = {
+        assessment_id: (weight, schema_id)
+        for assessment_id, weight, schema_id in Assessment.objects.filter(pk__in=assessment_ids)
+        .values_list('id', 'weight', 'schema_id')
+    }
+
+    if previous_grades is None:
+        _schedule_refresh('submissions')
+        for supervisor_id in {supervisor_id for supervisor_id, _ in applications.values()}:
+            _schedule_rollup(supervisor_id, 'submissions', 'assessments')
+    else:
+        deltas, supervisor_deltas = [], []
+        for submission in submissions:
+            weight = assessments.get(submission.assignment_id, (0, None))[0]
+            delta = stats.submission_delta(
+                before=(previous_grades[submission.pk], weight) if submission.pk in previous_grades else None,
+                after=(submission.grades_received, weight),
+            )
+            deltas.append(delta)
+            supervisor_id, status = applications.get(submission.application_id, (None, None))
+            if status == 'accepted' and supervisor_id is not None:
+                supervisor_deltas.append((supervisor_id, delta))
+        _schedule_submission_counts(deltas, supervisor_deltas)
+
+    student_ids = {submission.submitted_by_id for submission in submissions}
+    student_ids.update(_students_of_applications(application_ids))
+    for schema_id in {schema_id for _, schema_id in assessments.values()}:
+        _schedule_final_marks(schema_id, student_ids)
+    for assessment_id in assessment_ids:
+        transaction.on_commit(partial(statistics.bump_grade_version, assessment_id))
+    transaction.on_commit(partial(dashboard_cache.bump_version, 'assessment.StudentSubmission'))
+
+
+@receiver([post_save, post_delete], sender='defaults.Notification')
+def notification_changed(sender, instance, **kwargs):
+    notifications.invalidate_notification_summaries([instance.user_id])
+
+
+def bump_dashboard_version(sender, **kwargs):
+    if _is_login_update(kwargs):
+        return
+    transaction.on_commit(partial(dashboard_cache.bump_version, sender._meta.label))
+
+
+for label in dashboard_cache.dependent_models():
+    post_save.connect(bump_dashboard_version, sender=label, dispatch_uid=f'dashboard_version_save_{label}')
+    post_delete.connect(bump_dashboard_version, sender=label, dispatch_uid=f'dashboard_version_delete_{label}')
+
+
+def blob_file_saved(sender, instance, created, **kwargs):
+    # In the same transaction as the row, so a rolled back upload adds no reference
+    if created and instance.file:
+        storage.add_references([instance.file.name])
+
+
+def blob_file_deleted(sender, instance, **kwargs):
+    if instance.file:
+        storage.release_references([instance.file.name])
+
+
+for label in storage.BLOB_MODELS:
+    post_save.connect(blob_file_saved, sender=label, dispatch_uid=f'blob_reference_save_{label}')
+    post_delete.connect(blob_file_deleted, sender=label, dispatch_uid=f'blob_reference_delete_{label}')
+
+
+def preview_file_saved(sender, instance, created, **kwargs):
+    if created and instance.file:
+        previews.schedule_previews([instance])
+
+
+def preview_file_deleted(sender, instance, **kwargs):
+    # Thumbnails belong to one row, unlike the shared blobs
+    if instance.thumbnail:
+        transaction.on_commit(partial(instance.thumbnail.delete, save=False))
+
+
+for label in previews.PREVIEW_MODELS:
+    post_save.connect(preview_file_saved, sender=label, dispatch_uid=f'preview_save_{label}')
+    post_delete.connect(preview_file_deleted, sender=label, dispatch_uid=f'preview_delete_{label}')
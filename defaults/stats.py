@@ -0,0 +1,149 @@
+from collections import Counter
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from application.models import Application
+from projects.models import Project
+from assessment.models import Assessment, StudentSubmission
+from grading.distribution import bin_index, grade_distribution
+from .models import DashboardStats
+
+User = get_user_model()
+
+SNAPSHOT_PK = 1
+
+
+def user_counts():
+    return User.objects.aggregate(
+        total_students=Count('id', filter=Q(is_staff=False, is_superuser=False)),
+        total_supervisors=Count('id', filter=Q(is_staff=True, is_superuser=False)),
+    )
+
+
+def project_counts():
+    counts = Project.objects.aggregate(
+        total_projects=Count('id'),
+        available_projects=Count('id', filter=Q(availability='available')),
+        taken_projects=Count('id', filter=Q(availability='taken')),
+        **{
+            f'type_{i}': Count('id', filter=Q(project_type=project_type))
+            for i, (project_type, _) in enumerate(Project.PROJECT_TYPES)
+        }
+    )
+    counts['project_type_counts'] = {
+        project_type: counts.pop(f'type_{i}')
+        for i, (project_type, _) in enumerate(Project.PROJECT_TYPES)
+    }
+    return counts
+
+
+def application_counts():
+    return Application.objects.aggregate(
+        total_applications=Count('id'),
+        pending_applications=Count('id', filter=Q(status='applied')),
+        accepted_applications=Count('id', filter=Q(status='accepted')),
+        declined_applications=Count('id', filter=Q(status='declined')),
+    )
+
+
+def assessment_counts():
+    return {'total_assessments': Assessment.objects.count()}
+
+
+def grade_counters(distribution):
+    """SubmissionCounters grade fields from a grade_distribution() result."""
+    counters = {'grade_percent_total': distribution['total']}
+    counters.update({f'grade_bin_{i}': row['count'] for i, row in enumerate(distribution['ranges'])})
+    return counters
+
+
+def submission_counts():
+    counts = StudentSubmission.objects.aggregate(
+        total_submissions=Count('id'),
+        graded_submissions=Count('id', filter=Q(grades_received__isnull=False)),
+    )
+    counts.update(grade_counters(grade_distribution()))
+    return counts
+
+
+def _contribution(grade, weight):
+    # What one submission adds to the counters, percentages as grade_distribution() computes them
+    counts = {'total_submissions': 1}
+    if grade is not None:
+        counts['graded_submissions'] = 1
+        if weight:
+            percent = grade * 100 / weight
+            counts['grade_percent_total'] = percent
+            counts[f'grade_bin_{bin_index(percent)}'] = 1
+    return counts
+
+
+def submission_delta(before=None, after=None):
+    """
+    Change to the submission counters when a submission goes from `before`
+    to `after`, each a (grade, assessment weight) pair or None when the row
+    does not exist. Empty when nothing counted changed.
+    """
+    delta = Counter()
+    if after is not None:
+        delta.update(_contribution(*after))
+    if before is not None:
+        delta.subtract(_contribution(*before))
+    return {field: value for field, value in delta.items() if value}
+
+
+def apply_submission_delta(queryset, delta):
+    """Add a submission_delta() to the counters of the rows in queryset with one UPDATE."""
+    if not delta:
+        return
+    values = {}
+    for field, value in delta.items():
+        if value > 0:
+            values[field] = F(field) + value
+        else:
+            # Never below zero, should the counters have drifted; rebuild_dashboard_stats recounts them
+            values[field] = Greatest(F(field) + value, 0, output_field=queryset.model._meta.get_field(field))
+    queryset.update(updated_at=timezone.now(), **values)
+
+
+# Each section is refreshed on its own when one of its models changes
+SECTIONS = {
+    'users': user_counts,
+    'projects': project_counts,
+    'applications': application_counts,
+    'assessments': assessment_counts,
+    'submissions': submission_counts,
+}
+
+
+def get_dashboard_stats():
+    """Return the statistics snapshot, building it on first use."""
+    stats = DashboardStats.objects.filter(pk=SNAPSHOT_PK).first()
+    if stats is None:
+        stats = rebuild_dashboard_stats()
+    return stats
+
+
+def apply_snapshot_delta(delta):
+    """Apply a submission_delta() to the snapshot. Without one yet, it is counted in full when first read."""
+    apply_submission_delta(DashboardStats.objects.filter(pk=SNAPSHOT_PK), delta)
+
+
+def refresh_section(section):
+    """Recompute one section of the snapshot with a single aggregate query."""
+    values = SECTIONS[section]()
+    values['updated_at'] = timezone.now()
+    updated = DashboardStats.objects.filter(pk=SNAPSHOT_PK).update(**values)
+    if not updated:
+        # No snapshot yet, build every section at once
+        rebuild_dashboard_stats()
+
+
+def rebuild_dashboard_stats():
+    """Recount everything and overwrite the snapshot."""
+    values = {}
+    for compute in SECTIONS.values():
+        values.update(compute())
+    stats, _ = DashboardStats.objects.update_or_create(pk=SNAPSHOT_PK, defaults=values)
+    return stats
@@ -0,0 +1,324 @@
+import hashlib
+import logging
+import os
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+from .models import Blob
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = 'blobs'
+
+# Unreferenced blobs younger than this are kept, the row pointing at them may still be on its way
+BLOB_GC_GRACE = timedelta(seconds=getattr(settings, 'BLOB_GC_GRACE', 60 * 60))
+BLOB_GC_BATCH_SIZE = 500
+
+# Models whose `file` lives in blob_storage, their rows hold the references
+BLOB_MODELS = ('assessment.SubmissionFile', 'assessment.AssessmentDetailFile', 'assessment.AssessmentSampleFile')
+
+READ_SIZE = 64 * 1024
+
+
+def blob_name(sha256, ext=''):
+    return f'{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(f'{BLOB_PREFIX}/')
+
+
+def _extension(name):
+    # Kept so the blob is still served with the right type, dropped if it is anything odd
+    ext = os.path.splitext(name)[1].lower()
+    return ext if 1 < len(ext) <= 10 and ext[1:].isalnum() else ''
+
+
+@deconstructible
+class PrivateStorage(FileSystemStorage):
+    """
+    Files kept outside MEDIA_ROOT, in PRIVATE_MEDIA_ROOT, so no /media/
+    location can serve them; views send them with defaults.media.serve_file
+    after checking access.
+    """
+    # nginx internal location aliased to PRIVATE_MEDIA_ROOT, for MEDIA_DELIVERY = 'x-accel-redirect'
+    accel_prefix = getattr(settings, 'PRIVATE_MEDIA_ACCEL_PREFIX', '/protected-private-media/')
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(
+            self._location, getattr(settings, 'PRIVATE_MEDIA_ROOT', os.path.join(settings.BASE_DIR, 'private_media')),
+        )
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        # Follows PRIVATE_MEDIA_ROOT the way FileSystemStorage follows MEDIA_ROOT, e.g. in tests
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PRIVATE_MEDIA_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+
+private_storage = PrivateStorage()
+
+
+@deconstructible
+class ContentAddressedStorage(PrivateStorage):
+    """
+    Stores every distinct file once, named after the SHA-256 of its bytes
+    whatever name it is saved under; saving bytes that are already stored
+    writes nothing. Blobs are shared, so delete() leaves them to
+    collect_garbage(), which removes those no row references any more.
+    Blobs hold students' work, so they are private like previews. Files saved
+    before this storage keep their names, adopt_files() moves them in.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content, the requested one never collides
+        return name
+
+    def stage(self, name, content, sha256=None):
+        """
+        Hash the content and put it next to the blobs, without touching the
+        database, so it can run on a worker thread. commit() files it.
+        Pass the `sha256` when the caller has already read the content for
+        it, e.g. from inspect_file(), and it is not hashed again.
+        """
+        os.makedirs(self.path(BLOB_PREFIX), exist_ok=True)
+        digest = None if sha256 else hashlib.sha256()
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk, hash it where it is and move it rather than copy
+            source = content.temporary_file_path()
+            if digest is not None:
+                with open(source, 'rb') as handle:
+                    for data in iter(lambda: handle.read(READ_SIZE), b''):
+                        digest.update(data)
+                sha256 = digest.hexdigest()
+            return {'name': name, 'source': source, 'temporary': False, 'sha256': sha256, 'size': os.path.getsize(source)}
+        # Hashed while written, so the content is read only once
+        fd, temporary = tempfile.mkstemp(dir=self.path(BLOB_PREFIX), suffix='.upload')
+        size = 0
+        with os.fdopen(fd, 'wb') as out:
+            content.seek(0)
+            for data in content.chunks():
+                if digest is not None:
+                    digest.update(data)
+                size += len(data)
+                out.write(data)
+        return {'name': name, 'source': temporary, 'temporary': True, 'sha256': sha256 or digest.hexdigest(), 'size': size}
+
+    def commit(self, staged):
+        """Record a staged file's blob and move the file into place unless the blob exists. Returns the blob name."""
+        return self.commit_many([staged])[0]
+
+    def commit_many(self, staged):
+        """commit() for a batch of staged files, with a fixed number of queries. Returns the blob names in order."""
+        names = [blob_name(item['sha256'], _extension(item['name'])) for item in staged]
+        try:
+            with transaction.atomic():
+                # The row locks keep collect_garbage() from removing files while they are reused
+                existing = set(Blob.objects.select_for_update().filter(name__in=set(names)).values_list('name', flat=True))
+                # Restarts the grace period of blobs that had lost their last reference
+                Blob.objects.filter(name__in=existing).update(updated_at=timezone.now())
+                new = {name: item for name, item in zip(names, staged) if name not in existing}
+                Blob.objects.bulk_create(
+                    [Blob(name=name, sha256=item['sha256'], size=item['size']) for name, item in new.items()],
+                    ignore_conflicts=True,
+                )
+                for name, item in zip(names, staged):
+                    full_path = self.path(name)
+                    if os.path.exists(full_path):
+                        continue
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    if item['temporary']:
+                        os.replace(item['source'], full_path)
+                    else:
+                        file_move_safe(item['source'], full_path, allow_overwrite=True)
+                    os.chmod(full_path, self.file_permissions_mode or 0o644)
+        finally:
+            for item in staged:
+                self.discard(item)
+        return names
+
+    def discard(self, staged):
+        if staged['temporary'] and os.path.exists(staged['source']):
+            os.remove(staged['source'])
+
+    def _save(self, name, content):
+        return self.commit(self.stage(name, content))
+
+    def delete(self, name):
+        # Shared blobs go through reference counting, older files are deleted as usual
+        if not is_blob(name):
+            super().delete(name)
+
+    def remove_blob(self, name):
+        super().delete(name)
+
+
+blob_storage = ContentAddressedStorage()
+
+
+
+def add_references(names):
+    """Count new rows pointing at these blobs. post_save does it per row, call it after bulk_create."""
+    for name, count in Counter(name for name in names if is_blob(name)).items():
+        Blob.objects.filter(name=name).update(ref_count=F('ref_count') + count)
+
+
+def release_references(names):
+    for name, count in Counter(name for name in names if is_blob(name)).items():
+        Blob.objects.filter(name=name).update(ref_count=Greatest(F('ref_count') - count, 0), updated_at=timezone.now())
+
+
+def recount_references():
+    """Rebuild every blob's ref_count from the rows, in case bulk changes skipped the signals."""
+    counts = Counter()
+    for label in BLOB_MODELS:
+        rows = (
+            apps.get_model(label).objects.filter(file__startswith=f'{BLOB_PREFIX}/')
+            .values('file').annotate(rows=Count('pk')).order_by()
+        )
+        counts.update({row['file']: row['rows'] for row in rows})
+    changed = []
+    with transaction.atomic():
+        for blob in Blob.objects.select_for_update().only('pk', 'name', 'ref_count'):
+            if blob.ref_count != counts.get(blob.name, 0):
+                blob.ref_count = counts.get(blob.name, 0)
+                changed.append(blob)
+        Blob.objects.bulk_update(changed, ['ref_count'], batch_size=BLOB_GC_BATCH_SIZE)
+    return len(changed)
+
+
+def collect_garbage(batch_size=BLOB_GC_BATCH_SIZE, dry_run=False):
+    """
+    Delete blobs no row has referenced for BLOB_GC_GRACE, batch_size at a
+    time, each batch in its own transaction. Returns (blobs, bytes) removed.
+    """
+    cutoff = timezone.now() - BLOB_GC_GRACE
+    orphans = Blob.objects.filter(ref_count=0, updated_at__lt=cutoff).order_by('pk')
+    if dry_run:
+        return orphans.count(), sum(orphans.values_list('size', flat=True))
+
+    removed = freed = 0
+    while True:
+        with transaction.atomic():
+            batch = list(orphans.select_for_update()[:batch_size])
+            if not batch:
+                break
+            for blob in batch:
+                try:
+                    blob_storage.remove_blob(blob.name)
+                except OSError as e:
+                    logger.warning("Could not remove blob %s: %s", blob.name, e)
+            Blob.objects.filter(pk__in=[blob.pk for blob in batch]).delete()
+        removed += len(batch)
+        freed += sum(blob.size for blob in batch)
+    return removed, freed
+
+
+def _untracked_files(batch_size):
+    # Files under blobs/ in batches of (name, path, size, age in seconds)
+    root = blob_storage.path(BLOB_PREFIX)
+    now = timezone.now().timestamp()
+    batch = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            name = os.path.relpath(path, blob_storage.location).replace(os.sep, '/')
+            # ctime moves when a file is renamed into place, mtime stays that of the upload
+            batch.append((name, path, stat.st_size, now - max(stat.st_mtime, stat.st_ctime)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def sweep_untracked(batch_size=BLOB_GC_BATCH_SIZE, dry_run=False):
+    """
+    Delete files under blobs/ that have no Blob row and are older than
+    BLOB_GC_GRACE: blobs whose transaction rolled back after the file was
+    moved into place, and temporary files of interrupted uploads.
+    Returns (files, bytes) removed.
+    """
+    grace = BLOB_GC_GRACE.total_seconds()
+    removed = freed = 0
+    for batch in _untracked_files(batch_size):
+        known = set(Blob.objects.filter(name__in=[name for name, *_ in batch]).values_list('name', flat=True))
+        for name, path, size, age in batch:
+            if name in known or age < grace:
+                continue
+            if not dry_run:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning("Could not remove untracked blob file %s: %s", name, e)
+                    continue
+            removed += 1
+            freed += size
+    return removed, freed
+
+
+def _move_public_blobs():
+    # Blobs written under MEDIA_ROOT before blob storage was private
+    moved = 0
+    for directory, _, filenames in os.walk(default_storage.path(BLOB_PREFIX)):
+        for filename in filenames:
+            source = os.path.join(directory, filename)
+            target = blob_storage.path(os.path.relpath(source, default_storage.location))
+            try:
+                if os.path.exists(target):
+                    os.remove(source)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    file_move_safe(source, target)
+            except OSError as e:
+                logger.warning("Could not move %s out of MEDIA_ROOT: %s", source, e)
+                continue
+            moved += 1
+    return moved
+
+
+def adopt_files(batch_size=BLOB_GC_BATCH_SIZE):
+    """
+    Move files out of MEDIA_ROOT into private blob storage: blobs stored there
+    before, and files saved before content-addressed storage, so copies of
+    the same bytes collapse into one. Returns how many files were moved.
+    """
+    moved = _move_public_blobs()
+    for label in BLOB_MODELS:
+        model = apps.get_model(label)
+        rows = model.objects.exclude(file='').exclude(file__startswith=f'{BLOB_PREFIX}/').only('pk', 'file', 'original_name')
+        for row in rows.iterator(chunk_size=batch_size):
+            old_name = row.file.name
+            # Older files are still under MEDIA_ROOT, unless moved by hand
+            source = default_storage if default_storage.exists(old_name) else blob_storage
+            try:
+                with source.open(old_name, 'rb') as handle:
+                    new_name = blob_storage.save(old_name, handle)
+            except OSError as e:
+                logger.warning("Could not move %s into blob storage: %s", old_name, e)
+                continue
+            with transaction.atomic():
+                # The blob name says nothing about the upload, keep the name it had
+                model.objects.filter(pk=row.pk).update(
+                    file=new_name, original_name=row.original_name or os.path.basename(old_name)[:255],
+                )
+                add_references([new_name])
+            source.delete(old_name)
+            moved += 1
+    return moved
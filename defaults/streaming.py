@@ -0,0 +1,183 @@
+import csv
+import os
+import zipfile
+from xml.sax.saxutils import escape
+from django.http import StreamingHttpResponse
+
+# Rows are written to the client in chunks of about this many bytes
+CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """File-like object whose write() hands the value straight back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+class ZipStream:
+    """
+    Write-only file for zipfile that keeps what was written until it is
+    collected. It has no tell() or seek(), so zipfile writes data
+    descriptors after each member and never goes back in the output.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def collect(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+# Formats that are compressed already, deflating them again costs CPU for a few bytes
+COMPRESSED_EXTENSIONS = {
+    '.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.heic',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub',
+    '.mp3', '.mp4', '.m4a', '.mov', '.avi', '.mkv', '.webm',
+}
+
+
+def stream_zip(members, compression=zipfile.ZIP_DEFLATED):
+    """
+    Yield a zip archive piece by piece. `members` is an iterable of
+    (name, chunks) where chunks is an iterable of bytes, so neither the
+    archive nor any one member is ever held in memory. Members in
+    COMPRESSED_EXTENSIONS are stored as they are.
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, mode='w', compression=compression) as archive:
+        for name, chunks in members:
+            info = zipfile.ZipInfo(name)
+            stored = os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS
+            info.compress_type = zipfile.ZIP_STORED if stored else compression
+            with archive.open(info, mode='w', force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    if len(stream.buffer) >= CHUNK_SIZE:
+                        yield stream.collect()
+            yield stream.collect()
+    yield stream.collect()
+
+
+def csv_chunks(rows):
+    """Rows rendered as CSV text, grouped into chunks of about CHUNK_SIZE."""
+    writer = csv.writer(Echo())
+    chunk = []
+    size = 0
+    for row in rows:
+        line = writer.writerow(row)
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+# Minimal SpreadsheetML package: one sheet with inline strings, no styles
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_SHEET_END = '</sheetData></worksheet>'
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_sheet(rows):
+    chunk = [XLSX_SHEET_START]
+    size = 0
+    for row in rows:
+        line = '<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>'
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(chunk).encode()
+            chunk, size = [], 0
+    chunk.append(XLSX_SHEET_END)
+    yield ''.join(chunk).encode()
+
+
+def xlsx_chunks(rows, sheet_name='Sheet1'):
+    """Rows as an .xlsx workbook, written as they come without openpyxl."""
+    # Sheet names are limited to 31 characters and a few symbols are not allowed
+    name = ''.join(ch for ch in sheet_name if ch not in '[]:*?/\\')[:31] or 'Sheet1'
+    return stream_zip([
+        ('[Content_Types].xml', [XLSX_CONTENT_TYPES.encode()]),
+        ('_rels/.rels', [XLSX_ROOT_RELS.encode()]),
+        ('xl/workbook.xml', [XLSX_WORKBOOK.format(name=escape(name, {'"': '&quot;'})).encode()]),
+        ('xl/_rels/workbook.xml.rels', [XLSX_WORKBOOK_RELS.encode()]),
+        ('xl/worksheets/sheet1.xml', _xlsx_sheet(rows)),
+    ])
+
+
+def streaming_download(chunks, filename, content_type):
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def stream_csv(rows, filename):
+    """Stream rows (the header first) as a CSV download."""
+    return streaming_download(csv_chunks(rows), filename, 'text/csv')
+
+
+def stream_xlsx(rows, filename, sheet_name='Sheet1'):
+    """Stream rows (the header first) as an .xlsx download."""
+    return streaming_download(
+        xlsx_chunks(rows, sheet_name), filename,
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
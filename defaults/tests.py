@@ -1,3 +1,283 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, models
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from application.models import Application, ApplicationMember
+from assessment.models import Assessment, AssessmentSchema, StudentSubmission, SubmissionFile
+from projects.models import Project
+from . import background, documents, storage
+from .dashboard_views import admin_dashboard_context, student_dashboard_context, supervisor_dashboard_context
+from .media import parse_range
+from .models import Blob, DashboardStats
+from .stats import rebuild_dashboard_stats, submission_counts
+from .storage import add_references, blob_storage, collect_garbage, sweep_untracked
 
-# Create your tests here.
+
+class BlobStorageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        supervisor = User.objects.create_user('sup', 'sup@example.com', 'pw', is_staff=True)
+        student = User.objects.create_user('student', 'student@example.com', 'pw')
+        project = Project.objects.create(
+            title='Project', project_type='Research', prerequisites='-', description='-', supervisor=supervisor,
+        )
+        schema = AssessmentSchema.objects.create(name='Schema', start_date=date.today(), end_date=date.today())
+        assessment = Assessment.objects.create(
+            schema=schema, title='Report', weight=100, submission_type='individual',
+            due_date=date.today() + timedelta(days=7), submit_by=date.today() + timedelta(days=7),
+        )
+        application = Application.objects.create(project=project, application_type='individual', status='accepted')
+        cls.submission = StudentSubmission.objects.create(application=application, assignment=assessment, submitted_by=student)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, PRIVATE_MEDIA_ROOT=os.path.join(media_root, 'private'))
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def upload(self, content=b'report', name='report.pdf'):
+        return SubmissionFile.objects.create(submission=self.submission, file=ContentFile(content, name=name))
+
+    def blob(self, name):
+        return Blob.objects.get(name=name)
+
+    def test_identical_files_share_a_blob(self):
+        first = self.upload(name='first.pdf')
+        second = self.upload(name='second.pdf')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(self.blob(first.file.name).ref_count, 2)
+        self.assertEqual(Blob.objects.count(), 1)
+
+    def test_deleting_a_row_releases_its_reference(self):
+        first = self.upload()
+        self.upload()
+        first.delete()
+        self.assertEqual(self.blob(first.file.name).ref_count, 1)
+        # The other row still points at the file
+        self.assertTrue(blob_storage.exists(first.file.name))
+
+    def test_bulk_create_counts_with_add_references(self):
+        name = self.upload().file.name
+        rows = SubmissionFile.objects.bulk_create([SubmissionFile(submission=self.submission, file=name) for _ in range(3)])
+        add_references(row.file.name for row in rows)
+        self.assertEqual(self.blob(name).ref_count, 4)
+
+    def test_garbage_collection_waits_for_the_grace_period(self):
+        upload = self.upload()
+        name = upload.file.name
+        upload.delete()
+        self.assertEqual(self.blob(name).ref_count, 0)
+
+        # Just released, the row pointing at it again may still be on its way
+        self.assertEqual(collect_garbage(), (0, 0))
+        self.assertTrue(blob_storage.exists(name))
+
+        Blob.objects.filter(name=name).update(updated_at=timezone.now() - timedelta(days=1))
+        removed, freed = collect_garbage()
+        self.assertEqual((removed, freed), (1, len(b'report')))
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+        self.assertFalse(blob_storage.exists(name))
+
+    def test_referenced_blobs_are_kept(self):
+        name = self.upload().file.name
+        Blob.objects.filter(name=name).update(updated_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(collect_garbage(), (0, 0))
+        self.assertTrue(blob_storage.exists(name))
+
+    def test_untracked_files_are_swept_after_the_grace_period(self):
+        name = blob_storage.save('orphan.pdf', ContentFile(b'rolled back'))
+        Blob.objects.filter(name=name).delete()
+        self.assertEqual(sweep_untracked(), (0, 0))
+
+        old = (timezone.now() - timedelta(days=1)).timestamp()
+        os.utime(blob_storage.path(name), (old, old))
+        # ctime cannot be set back, so shorten the grace period instead
+        with mock.patch.object(storage, 'BLOB_GC_GRACE', timedelta(0)):
+            self.assertEqual(sweep_untracked(), (1, len(b'rolled back')))
+        self.assertFalse(blob_storage.exists(name))
+
+
+class ParseRangeTests(SimpleTestCase):
+    size = 10240
+
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', self.size), (0, 99))
+        self.assertEqual(parse_range('bytes=-40', self.size), (10200, 10239))
+        self.assertEqual(parse_range('bytes=100-', self.size), (100, 10239))
+        # An end past the file is cut to its last byte
+        self.assertEqual(parse_range('bytes=100-99999', self.size), (100, 10239))
+        self.assertEqual(parse_range('bytes=-99999', self.size), (0, 10239))
+
+    def test_unsatisfiable(self):
+        self.assertIs(parse_range('bytes=20000-', self.size), False)
+        self.assertIs(parse_range(f'bytes={self.size}-', self.size), False)
+        self.assertIs(parse_range('bytes=-0', self.size), False)
+        self.assertIs(parse_range('bytes=0-', 0), False)
+
+    def test_whole_file(self):
+        for header in (None, '', 'bytes=-', 'bytes=0-9,20-29', 'items=0-9', 'bytes=a-b', 'bytes=5-2'):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, self.size))
+
+
+class PdfWithoutPyMuPDFTests(SimpleTestCase):
+
+    def setUp(self):
+        page = mock.Mock(**{'extract_text.return_value': 'Chapter one'})
+        pypdf = mock.Mock(**{'PdfReader.return_value.pages': [page, page]})
+        for name, value in (('fitz', None), ('pypdf', pypdf), ('Image', mock.Mock())):
+            patcher = mock.patch.object(documents, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_failed_thumbnail_keeps_the_text(self):
+        with mock.patch.object(documents, 'convert_from_bytes', side_effect=OSError('poppler not found')), \
+                mock.patch.object(documents, 'convert_from_path'):
+            result = documents.extract(b'%PDF-1.4', 'application/pdf')
+        self.assertEqual(result['status'], 'done')
+        self.assertEqual((result['page_count'], result['text']), (2, 'Chapter one\nChapter one'))
+        self.assertIsNone(result['thumbnail'])
+
+
+@override_settings(BACKGROUND_TASKS_SYNC=True)
+class SyncBackgroundTaskTests(SimpleTestCase):
+
+    def test_result_is_returned_in_a_done_future(self):
+        future = background.submit(sum, [1, 2, 3])
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), 6)
+
+    def test_exception_is_kept_on_the_future(self):
+        with self.assertLogs('defaults.background', 'ERROR'):
+            future = background.submit(int, 'not a number')
+        self.assertIsInstance(future.exception(), ValueError)
+
+
+@override_settings(BACKGROUND_TASKS_SYNC=True)
+class DashboardCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        supervisor = User.objects.create_user('sup', 'sup@example.com', 'pw', is_staff=True)
+        cls.student = User.objects.create_user('student', 'student@example.com', 'pw')
+        project = Project.objects.create(
+            title='Project', project_type='Research', prerequisites='-', description='-', supervisor=supervisor,
+        )
+        schema = AssessmentSchema.objects.create(name='Schema', start_date=date.today(), end_date=date.today())
+        cls.assessment = Assessment.objects.create(
+            schema=schema, title='Report', weight=40, submission_type='individual',
+            due_date=date.today() + timedelta(days=7), submit_by=date.today() + timedelta(days=7),
+        )
+        cls.application = Application.objects.create(project=project, application_type='individual', status='accepted')
+
+    def setUp(self):
+        rebuild_dashboard_stats()
+
+    def assertCounted(self):
+        stats = DashboardStats.objects.get()
+        expected = DashboardStats(**submission_counts())
+        self.assertEqual(
+            (stats.total_submissions, stats.graded_submissions, stats.grade_bin_counts),
+            (expected.total_submissions, expected.graded_submissions, expected.grade_bin_counts),
+        )
+        self.assertAlmostEqual(stats.average_grade, expected.average_grade)
+
+    def test_saves_adjust_the_counters(self):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            submission = StudentSubmission.objects.create(
+                application=self.application, assignment=self.assessment, submitted_by=self.student,
+            )
+        # No recount of the submissions table while the student waits
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if 'COUNT(' in query['sql'] and 'assessment_studentsubmission' in query['sql']
+        ])
+        self.assertCounted()
+
+        for grade in (36, 10):
+            submission.grades_received = grade
+            with self.captureOnCommitCallbacks(execute=True):
+                submission.save()
+            self.assertCounted()
+        self.assertEqual(DashboardStats.objects.get().grade_bin_counts, [0, 0, 0, 0, 1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.delete()
+        self.assertCounted()
+        self.assertEqual(DashboardStats.objects.get().total_submissions, 0)
+
+
+class DashboardCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', is_staff=True, is_superuser=True)
+        cls.supervisor = User.objects.create_user('sup', 'sup@example.com', 'pw', is_staff=True)
+        cls.student = User.objects.create_user('student', 'student@example.com', 'pw', first_name='Stu')
+        project = Project.objects.create(
+            title='Project', project_type='Research', prerequisites='-', description='-', supervisor=cls.supervisor,
+        )
+        schema = AssessmentSchema.objects.create(name='Schema', start_date=date.today(), end_date=date.today())
+        assessment = Assessment.objects.create(
+            schema=schema, title='Report', weight=40, submission_type='individual',
+            due_date=date.today() + timedelta(days=7), submit_by=date.today() + timedelta(days=7),
+        )
+        accepted = Application.objects.create(project=project, application_type='individual', status='accepted')
+        ApplicationMember.objects.create(application=accepted, user=cls.student, is_leader=True)
+        applied = Application.objects.create(project=project, application_type='individual', status='applied')
+        ApplicationMember.objects.create(application=applied, user=cls.student, is_leader=True)
+        StudentSubmission.objects.create(application=accepted, assignment=assessment, submitted_by=cls.student)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertPlainData(self, value):
+        # Cached contexts are pickled, querysets in them would be re-run on every hit
+        self.assertNotIsInstance(value, (models.QuerySet, models.Model))
+        items = value.values() if isinstance(value, dict) else value if isinstance(value, list) else ()
+        for item in items:
+            self.assertPlainData(item)
+
+    def test_contexts_hold_only_rendered_data(self):
+        for user, build_context in (
+            (self.student, student_dashboard_context),
+            (self.supervisor, supervisor_dashboard_context),
+            (self.admin, admin_dashboard_context),
+        ):
+            with self.subTest(user=user.username):
+                context = build_context(user)
+                self.assertPlainData(context)
+                self.assertNotIn('submissions', context)
+
+        context = student_dashboard_context(self.student)
+        self.assertEqual(context['applications'][0]['members'][0]['name'], 'Stu')
+        self.assertEqual(context['recent_submissions'][0]['assignment_title'], 'Report')
+        self.assertEqual(len(supervisor_dashboard_context(self.supervisor)['project_applications']), 1)
+
+    def test_cached_dashboards_render(self):
+        for user in (self.student, self.supervisor, self.admin):
+            with self.subTest(user=user.username):
+                self.client.force_login(user)
+                first = self.client.get(reverse('home'))
+                second = self.client.get(reverse('home'))
+                self.assertEqual((first.status_code, second.status_code), (200, 200))
+                self.assertEqual((first['X-Dashboard-Cache'], second['X-Dashboard-Cache']), ('miss', 'hit'))
+                self.assertContains(second, 'Project')
+
+    def test_admin_application_trend_covers_a_year(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('dashboard_chart_data', args=['monthly_applications']))
+        data = response.json()['data']
+        self.assertEqual(len(data), 12)
+        self.assertEqual(data[-1]['count'], 2)
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from application.models import Application
+from assessment.models import StudentSubmission
+
+# series name -> (model, timestamp field)
+SERIES = {
+    'applications': (Application, 'applied_at'),
+    'submissions': (StudentSubmission, 'submitted_at'),
+    'gradings': (StudentSubmission, 'graded_at'),
+}
+
+TRUNCATE = {
+    'month': TruncMonth,
+    'week': TruncWeek,
+    'day': TruncDay,
+}
+
+LABEL_FORMATS = {
+    'month': '%b %Y',
+    'week': '%d %b',
+    'day': '%d %b',
+}
+
+CACHE_PREFIX = 'timeseries:v1'
+
+
+def _bucket_start(day, period):
+    """First day of the bucket containing `day` (weeks start on Monday)."""
+    if period == 'month':
+        return day.replace(day=1)
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _previous_bucket(start, period):
+    if period == 'month':
+        return (start - timedelta(days=1)).replace(day=1)
+    if period == 'week':
+        return start - timedelta(days=7)
+    return start - timedelta(days=1)
+
+
+def bucket_starts(period='month', count=12, today=None):
+    """Calendar-correct bucket start dates, oldest first, ending with the current bucket."""
+    today = today or timezone.localdate()
+    start = _bucket_start(today, period)
+    starts = [start]
+    for _ in range(count - 1):
+        start = _previous_bucket(start, period)
+        starts.append(start)
+    starts.reverse()
+    return starts
+
+
+def _cache_key(series, period, start):
+    return f"{CACHE_PREFIX}:{series}:{period}:{start.isoformat()}"
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _count_buckets(series, period, since):
+    """Counts per bucket from `since` onwards, in one grouped query."""
+    model, field = SERIES[series]
+    rows = (
+        model.objects
+        .filter(**{f'{field}__gte': _start_of_day(since)})
+        .annotate(bucket=TRUNCATE[period](field))
+        .values('bucket')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    counts = {}
+    for row in rows:
+        bucket = row['bucket']
+        if isinstance(bucket, datetime):
+            bucket = timezone.localtime(bucket).date() if timezone.is_aware(bucket) else bucket.date()
+        counts[bucket] = counts.get(bucket, 0) + row['count']
+    return counts
+
+
+def time_series(series, period='month', count=12, today=None, label_format=None):
+    """
+    Return [{'month': label, 'start': 'YYYY-MM-DD', 'count': n}, ...] for the last
+    `count` buckets, oldest first, with empty buckets filled with zero.
+
+    Closed buckets never change once the period is over, so they are cached
+    permanently; only the current bucket (and any closed bucket missing from
+    the cache) is counted.
+    """
+    if series not in SERIES:
+        raise ValueError(f"Unknown series '{series}'")
+    if period not in TRUNCATE:
+        raise ValueError(f"Unknown period '{period}'")
+
+    starts = bucket_starts(period, count, today)
+    current = starts[-1]
+    closed = starts[:-1]
+
+    keys = {start: _cache_key(series, period, start) for start in closed}
+    cached = cache.get_many(keys.values())
+    counts = {start: cached[key] for start, key in keys.items() if key in cached}
+
+    missing = [start for start in closed if start not in counts]
+    since = missing[0] if missing else current
+    fresh = _count_buckets(series, period, since)
+
+    for start in missing:
+        counts[start] = fresh.get(start, 0)
+    counts[current] = fresh.get(current, 0)
+
+    if missing:
+        cache.set_many({keys[start]: counts[start] for start in missing}, timeout=None)
+
+    label_format = label_format or LABEL_FORMATS[period]
+    return [
+        {'month': start.strftime(label_format), 'start': start.isoformat(), 'count': counts[start]}
+        for start in starts
+    ]
+
+
+def invalidate_bucket(series, moment):
+    """Forget the cached buckets containing `moment`, e.g. after a backdated row changes."""
+    if moment is None:
+        return
+    day = timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+    cache.delete_many([
+        _cache_key(series, period, _bucket_start(day, period))
+        for period in TRUNCATE
+    ])
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path
-from . import views
+from . import views, dashboard_views
 
 urlpatterns = [
     path('home/', views.home, name='home'),
@@ -8,6 +8,8 @@ urlpatterns = [
     path('notifications/', views.view_all_notifications, name='view_all_notifications'),
     path('notification/read/<int:notification_id>/', views.mark_notification_as_read_and_redirect, name='mark_notification_as_read_and_redirect'),
     path('notifications/mark_all_as_read/', views.mark_all_notifications_as_read, name='mark_all_notifications_as_read'),
+    path('dashboard/charts/<str:chart>/', dashboard_views.dashboard_chart_data, name='dashboard_chart_data'),
+    path('profiling/queries/', views.query_profile_summary, name='query_profile_summary'),
 
 
 ]
\ No newline at end of file
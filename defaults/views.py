@@ -1,6 +1,8 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect
+from django.conf import settings
+from django.http import HttpResponseRedirect, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.urls import reverse
 from application.models import Application
 from projects.models import Project
@@ -10,7 +12,11 @@ from django.utils import timezone
 from django.db.models import Count, Avg, Q
 import json
 from .decorators import *
+from . import profiling
+from .profiling import query_budget
+from .notifications import invalidate_notification_summaries
 
+@query_budget(max_queries=30)
 def homepage(request):
     if request.user.is_authenticated:
         if request.user.is_superuser:
@@ -47,6 +53,7 @@ def homepage(request):
 
 
 @login_required
+@query_budget(max_queries=30)
 def home(request):
     """Home view that redirects to appropriate dashboard based on user role."""
     if request.user.is_superuser:
@@ -94,6 +101,18 @@ def mark_all_notifications_as_read(request):
     # Mark all unread notifications as read for the logged-in user
     notifications = Notification.objects.filter(user=request.user, is_read=False)
     notifications.update(is_read=True)
+    # update() sends no signals, so drop the cached summary here
+    invalidate_notification_summaries([request.user.pk])
 
     # Redirect back to the "View All Notifications" page after marking as read
     return HttpResponseRedirect(reverse('view_all_notifications'))
+
+
+@staff_member_required
+def query_profile_summary(request):
+    """Per-route query counts and timings collected by QueryProfilingMiddleware (?reset=1 clears them)."""
+    routes = profiling.summary(reset=request.GET.get('reset') == '1')
+    return JsonResponse({
+        'enabled': getattr(settings, 'QUERY_PROFILING', False),
+        'routes': routes,
+    })
@@ -0,0 +1,246 @@
+import csv
+import io
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Student
+from application.models import ApplicationMember
+from assessment.models import StudentSubmission
+from defaults.notifications import NotificationBatch
+from defaults.signals import submissions_changed_in_bulk
+from .queries import latest_attempts
+
+try:
+    import openpyxl
+except ImportError:  # Spreadsheet uploads are optional
+    openpyxl = None
+
+# Accepted column names, first match wins
+SUBMISSION_COLUMNS = ('submission_id', 'submission')
+STUDENT_COLUMNS = ('student_id', 'student', 'username', 'email')
+GRADE_COLUMNS = ('grade', 'grades_received', 'mark')
+FEEDBACK_COLUMNS = ('feedback', 'comment', 'comments')
+
+FEEDBACK_MAX_LENGTH = StudentSubmission._meta.get_field('feedback').max_length
+
+
+class GradeImportError(Exception):
+    """The upload as a whole could not be read."""
+
+
+def _pick(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, ''):
+            return str(value).strip()
+    return ''
+
+
+def _normalise_rows(header, rows):
+    header = [str(name or '').strip().lower() for name in header]
+    if not any(name in header for name in SUBMISSION_COLUMNS + STUDENT_COLUMNS):
+        raise GradeImportError("The file needs a submission_id or student_id column.")
+    if not any(name in header for name in GRADE_COLUMNS):
+        raise GradeImportError("The file needs a grade column.")
+    parsed = []
+    # Row numbers match what the marker sees in their spreadsheet (header is row 1)
+    for number, values in enumerate(rows, start=2):
+        row = dict(zip(header, values))
+        if not any(value not in (None, '') for value in row.values()):
+            continue
+        parsed.append({
+            'row': number,
+            'submission': _pick(row, SUBMISSION_COLUMNS),
+            'student': _pick(row, STUDENT_COLUMNS),
+            'grade': _pick(row, GRADE_COLUMNS),
+            'feedback': _pick(row, FEEDBACK_COLUMNS),
+        })
+    return parsed
+
+
+def read_grade_file(upload):
+    """Rows from an uploaded CSV or XLSX file as dicts of submission/student/grade/feedback."""
+    name = upload.name.lower()
+    if name.endswith('.xlsx'):
+        if openpyxl is None:
+            raise GradeImportError("Spreadsheet uploads need openpyxl installed, upload a CSV file instead.")
+        try:
+            workbook = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+        except Exception as e:
+            raise GradeImportError(f"Could not read the spreadsheet: {e}")
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise GradeImportError("The spreadsheet is empty.")
+        return _normalise_rows(header, rows)
+
+    if name.endswith('.csv'):
+        try:
+            text = io.TextIOWrapper(upload, encoding='utf-8-sig')
+            reader = csv.reader(text)
+            header = next(reader, None)
+            if header is None:
+                raise GradeImportError("The CSV file is empty.")
+            return _normalise_rows(header, reader)
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise GradeImportError(f"Could not read the CSV file: {e}")
+
+    raise GradeImportError("Upload a .csv or .xlsx file.")
+
+
+def read_grade_grid(post):
+    """Rows from the batch entry grid, fields named grade_<submission id> and feedback_<submission id>."""
+    rows = []
+    for key in post:
+        if not key.startswith('grade_'):
+            continue
+        submission_id = key[len('grade_'):]
+        grade = post.get(key, '').strip()
+        if grade == '':
+            continue
+        rows.append({
+            'row': submission_id,
+            'submission': submission_id,
+            'student': '',
+            'grade': grade,
+            'feedback': post.get(f'feedback_{submission_id}', '').strip(),
+        })
+    return rows
+
+
+def _student_memberships(identifiers):
+    """Map student id, username or email (lowercased) to the (user id, accepted application id) it names."""
+    students = Student.objects.filter(student_id__in=identifiers).values_list('student_id', 'user_id')
+    user_ids = {student_id.lower(): user_id for student_id, user_id in students}
+    memberships = (
+        ApplicationMember.objects.filter(application__status='accepted')
+        .filter(user_id__in=user_ids.values()) |
+        ApplicationMember.objects.filter(application__status='accepted')
+        .filter(user__username__in=identifiers) |
+        ApplicationMember.objects.filter(application__status='accepted')
+        .filter(user__email__in=identifiers)
+    ).values_list('user_id', 'user__username', 'user__email', 'application_id')
+    by_user = {}
+    members = {}
+    for user_id, username, email, application_id in memberships:
+        by_user[user_id] = (user_id, application_id)
+        members[username.lower()] = by_user[user_id]
+        if email:
+            members[email.lower()] = by_user[user_id]
+    for student_id, user_id in user_ids.items():
+        if user_id in by_user:
+            members[student_id] = by_user[user_id]
+    return members
+
+
+def validate_grade_rows(assessment, rows):
+    """
+    Check every row against the assessment in memory. Returns the changes to
+    apply as (submission, grade, feedback), the rows that match what is
+    already stored, and a list of per-row errors.
+    """
+    # Every latest attempt of the assessment, loaded once. Group assessments have
+    # one per application, individual ones one per student within it.
+    group = assessment.submission_type == 'group'
+
+    def owner(application_id, user_id):
+        return application_id if group else (application_id, user_id)
+
+    latest = {
+        owner(submission.application_id, submission.submitted_by_id): submission
+        for submission in latest_attempts(StudentSubmission.objects.filter(assignment=assessment))
+    }
+    by_id = {submission.pk: submission for submission in latest.values()}
+    submission_ids = {row['submission'] for row in rows if row['submission'].isdigit()}
+    missing = {int(pk) for pk in submission_ids} - set(by_id)
+    if missing:
+        # Earlier attempts can still be graded when named explicitly
+        for submission in StudentSubmission.objects.filter(assignment=assessment, pk__in=missing):
+            by_id[submission.pk] = submission
+
+    identifiers = [row['student'] for row in rows if row['student'] and not row['submission']]
+    members = _student_memberships(identifiers) if identifiers else {}
+
+    changes, unchanged, errors = [], [], []
+    seen = {}
+    for row in rows:
+        label = row['submission'] or row['student']
+
+        def error(message):
+            errors.append({'row': row['row'], 'identifier': label, 'message': message})
+
+        if row['submission']:
+            if not row['submission'].isdigit() or int(row['submission']) not in by_id:
+                error("No submission with this id for this assessment.")
+                continue
+            submission = by_id[int(row['submission'])]
+        elif row['student']:
+            member = members.get(row['student'].lower())
+            if member is None:
+                error("No accepted student with this id, username or email.")
+                continue
+            user_id, application_id = member
+            submission = latest.get(owner(application_id, user_id))
+            if submission is None:
+                error("This student has not submitted this assessment.")
+                continue
+        else:
+            error("Give a submission id or a student id.")
+            continue
+
+        try:
+            grade = float(row['grade'])
+        except ValueError:
+            error(f"'{row['grade']}' is not a number.")
+            continue
+        if not grade.is_integer():
+            error("Grades must be whole marks.")
+            continue
+        grade = int(grade)
+        if grade < 0 or grade > assessment.weight:
+            error(f"Grade must be between 0 and {assessment.weight}.")
+            continue
+
+        feedback = row['feedback'] or None
+        if feedback and len(feedback) > FEEDBACK_MAX_LENGTH:
+            error(f"Feedback is longer than {FEEDBACK_MAX_LENGTH} characters.")
+            continue
+
+        if submission.pk in seen:
+            error(f"Submission {submission.pk} is also graded on row {seen[submission.pk]}.")
+            continue
+        seen[submission.pk] = row['row']
+
+        if submission.grades_received == grade and (feedback is None or submission.feedback == feedback):
+            unchanged.append(submission)
+            continue
+        changes.append((submission, grade, feedback if feedback is not None else submission.feedback))
+
+    return changes, unchanged, errors
+
+
+def apply_grades(assessment, changes):
+    """Save the validated grades with one bulk_update and notify the students in one insert."""
+    now = timezone.now()
+    submissions = []
+    previous_grades = {submission.pk: submission.grades_received for submission, _, _ in changes}
+    for submission, grade, feedback in changes:
+        submission.grades_received = grade
+        submission.feedback = feedback
+        if submission.graded_at is None:
+            submission.graded_at = now
+        submissions.append(submission)
+
+    with transaction.atomic():
+        StudentSubmission.objects.bulk_update(submissions, ['grades_received', 'feedback', 'graded_at'], batch_size=500)
+        # bulk_update sends no signals, refresh the dashboard figures in one go
+        submissions_changed_in_bulk(submissions, previous_grades)
+
+        batch = NotificationBatch()
+        batch.add(
+            [submission.submitted_by_id for submission in submissions],
+            f"Your submission for '{assessment.title}' has been graded.",
+            url=reverse('grading:assessment_detail', args=[assessment.id])
+        )
+        batch.send()
+    return len(submissions)
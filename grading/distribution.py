@@ -0,0 +1,106 @@
+from django.db.models import Avg, Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast
+from application.models import Application
+from assessment.models import StudentSubmission
+
+# Lower edges of the grade bins, in percent. Anything below the last edge
+# falls into a final "Below" bin.
+DEFAULT_EDGES = (90, 80, 70, 60)
+
+DEFAULT_COLORS = ('#38c786', '#0c768a', '#f4ba40', '#ed5e49', '#8590a5')
+
+
+def _bin_labels(edges, top):
+    labels = []
+    upper = top
+    for edge in edges:
+        labels.append(f"{edge}-{upper}")
+        upper = edge - 1 if isinstance(edge, int) else edge
+    labels.append(f"Below {edges[-1]}")
+    return labels
+
+
+def scoped_submissions(queryset=None, schema=None, assessment=None, supervisor=None, student=None):
+    """Narrow a submission queryset to a schema, assessment, supervisor or student."""
+    submissions = queryset if queryset is not None else StudentSubmission.objects.all()
+    if schema is not None:
+        submissions = submissions.filter(assignment__schema=schema)
+    if assessment is not None:
+        submissions = submissions.filter(assignment=assessment)
+    if supervisor is not None:
+        submissions = submissions.filter(application__project__supervisor=supervisor)
+    if student is not None:
+        # Covers group submissions made by another member of the same application
+        submissions = submissions.filter(
+            application__in=Application.objects.filter(members__user=student)
+        )
+    return submissions
+
+
+def grade_distribution(queryset=None, schema=None, assessment=None, supervisor=None, student=None,
+                       edges=DEFAULT_EDGES, normalise=True, colors=DEFAULT_COLORS):
+    """
+    Count graded submissions per grade bin in a single aggregate query.
+
+    With `normalise` grades are converted to a percentage of the assessment
+    weight first, since `grades_received` is marked out of the weight.
+    Returns the chart-ready bins, the number of graded submissions and the
+    average and total grade (percentages when normalised).
+    """
+    edges = sorted(edges, reverse=True)
+    submissions = scoped_submissions(queryset, schema, assessment, supervisor, student)
+    submissions = submissions.filter(grades_received__isnull=False)
+
+    if normalise:
+        submissions = submissions.filter(assignment__weight__gt=0).annotate(
+            percent=Cast(F('grades_received'), FloatField()) * 100 / F('assignment__weight')
+        )
+    else:
+        submissions = submissions.annotate(percent=Cast(F('grades_received'), FloatField()))
+
+    bin_filters = []
+    upper = None
+    for edge in edges:
+        condition = Q(percent__gte=edge)
+        if upper is not None:
+            condition &= Q(percent__lt=upper)
+        bin_filters.append(condition)
+        upper = edge
+    bin_filters.append(Q(percent__lt=edges[-1]))
+
+    totals = submissions.aggregate(
+        graded=Count('id'),
+        average=Avg('percent'),
+        total=Sum('percent'),
+        **{f'bin_{i}': Count('id', filter=condition) for i, condition in enumerate(bin_filters)}
+    )
+
+    counts = [totals[f'bin_{i}'] for i in range(len(bin_filters))]
+    return {
+        'ranges': distribution_ranges(counts, edges, colors),
+        'graded': totals['graded'],
+        'average': totals['average'] or 0,
+        'total': totals['total'] or 0,
+    }
+
+
+def distribution_ranges(counts, edges=DEFAULT_EDGES, colors=DEFAULT_COLORS):
+    """Chart-ready bins from the count of each bin, top bin first."""
+    labels = _bin_labels(sorted(edges, reverse=True), 100)
+    return [
+        {'range': label, 'count': count, 'color': colors[i % len(colors)]}
+        for i, (label, count) in enumerate(zip(labels, counts))
+    ]
+
+
+def bin_index(percent, edges=DEFAULT_EDGES):
+    """The bin a percentage falls into, matching the filters of grade_distribution()."""
+    for i, edge in enumerate(sorted(edges, reverse=True)):
+        if percent >= edge:
+            return i
+    return len(edges)
+
+
+def empty_distribution(edges=DEFAULT_EDGES, colors=DEFAULT_COLORS):
+    """Zero-count bins, used when the real distribution cannot be computed."""
+    return distribution_ranges([0] * (len(edges) + 1), edges, colors)
@@ -0,0 +1,58 @@
+import logging
+import os
+from django.utils.text import slugify
+from assessment.models import SubmissionFile
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from storage per chunk while building an archive
+FILE_CHUNK_SIZE = 256 * 1024
+
+
+def submission_folder(submission):
+    """Archive folder for a submission: the group for group applications, the student otherwise."""
+    application = submission.application
+    if application.application_type == 'group':
+        project = slugify(application.project.title) or 'project'
+        return f'group-{application.id}-{project}'
+    return submission.submitted_by.username
+
+
+def _read_chunks(handle):
+    try:
+        while True:
+            chunk = handle.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        handle.close()
+
+
+def submission_archive_members(submissions):
+    """
+    (archive name, chunks) for every file of the given submissions, laid out
+    as <student or group>/attempt-<n>/<file>. Files are opened one at a time
+    as the archive reaches them; missing files are skipped.
+    """
+    files = (
+        SubmissionFile.objects.filter(submission__in=submissions.order_by().values('pk'))
+        .select_related('submission__submitted_by', 'submission__application__project')
+        .order_by('submission__application_id', 'submission__attempt_number', 'id')
+    )
+    used = set()
+    for submission_file in files.iterator(chunk_size=200):
+        submission = submission_file.submission
+        folder = f'{submission_folder(submission)}/attempt-{submission.attempt_number}'
+        name = f'{folder}/{submission_file.filename}'
+        if name in used:
+            # Same file name uploaded twice in one attempt
+            base, ext = os.path.splitext(name)
+            name = f'{base}-{submission_file.id}{ext}'
+        used.add(name)
+        try:
+            handle = submission_file.file.open('rb')
+        except (OSError, ValueError) as e:
+            logger.warning("Skipping submission file %s in archive: %s", submission_file.id, e)
+            continue
+        yield name, _read_chunks(handle)
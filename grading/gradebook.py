@@ -0,0 +1,52 @@
+from .models import FinalMark
+from .results import refresh_final_marks
+
+# Rows fetched from the database at a time while streaming
+EXPORT_CHUNK_SIZE = 500
+
+
+def ensure_final_marks(schema):
+    """
+    Compute the schema's final marks if none are stored yet, e.g. right
+    after an upgrade. Call it before streaming starts, so the write runs in
+    the request and a failure can still be reported.
+    """
+    if not schema.final_marks.exists():
+        refresh_final_marks(schema.pk)
+
+
+def gradebook_rows(schema):
+    """
+    Header then one list per student, from the precomputed final marks:
+    the grade and late flag of the latest graded attempt at every assessment
+    and the weighted total. Marks are read from the database in chunks,
+    only reading, see ensure_final_marks().
+    """
+    assessments = list(schema.assessments.order_by('due_date', 'id'))
+
+    header = ['Student ID', 'Username', 'First Name', 'Last Name', 'Email', 'Project']
+    for assessment in assessments:
+        header += [f'{assessment.title} (/{assessment.weight})', f'{assessment.title} Late']
+    header += [f'Weighted Total (/{sum(assessment.weight for assessment in assessments)})', 'Percentage']
+    yield header
+
+    marks = (
+        FinalMark.objects.filter(schema=schema)
+        .select_related('student__student', 'application__project')
+        .order_by('student__last_name', 'student__first_name', 'student_id')
+    )
+    for mark in marks.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        student = mark.student
+        profile = getattr(student, 'student', None)
+        row = [
+            profile.student_id if profile else '', student.username, student.first_name,
+            student.last_name, student.email, mark.application.project.title if mark.application else '',
+        ]
+        for assessment in assessments:
+            entry = mark.grades.get(str(assessment.id))
+            if entry is None:
+                row += [None, '']
+            else:
+                row += [entry['grade'], 'Yes' if entry['late'] else 'No']
+        row += [mark.total_marks, mark.percentage]
+        yield row
@@ -1,3 +1,67 @@
 from django.db import models
+from django.conf import settings
+from django.utils import timezone
 
-# Create your models here.
+
+class PublishEvent(models.Model):
+    """One request to publish the grades of an assessment, run as a background job."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    assessment = models.ForeignKey('assessment.Assessment', on_delete=models.CASCADE, related_name='publish_events')
+    published_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='publish_events')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time a job was queued for the event and when that job claimed it, to spot jobs lost to a restart
+    queued_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    submissions_published = models.PositiveIntegerField(default=0)
+    students_notified = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        return f"Publish {self.assessment.title} ({self.status})"
+
+
+class FinalMark(models.Model):
+    """
+    Precomputed result of a student for an assessment schema, from the latest
+    graded attempt of every assessment. Rebuilt by grading.results when grades,
+    assessments or group membership change.
+    """
+    schema = models.ForeignKey('assessment.AssessmentSchema', on_delete=models.CASCADE, related_name='final_marks')
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='final_marks')
+    application = models.ForeignKey('application.Application', on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='final_marks')
+    total_marks = models.PositiveIntegerField(default=0)
+    published_marks = models.PositiveIntegerField(default=0)
+    possible_marks = models.PositiveIntegerField(default=0)
+    graded_assessments = models.PositiveIntegerField(default=0)
+    # {assessment id: {'submission', 'grade', 'late', 'published'}}
+    grades = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['schema', 'student'], name='final_mark_schema_student'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.schema}: {self.total_marks}/{self.possible_marks}"
+
+    @property
+    def percentage(self):
+        return round(self.total_marks / self.possible_marks * 100, 2) if self.possible_marks else 0
+
+    @property
+    def published_percentage(self):
+        return round(self.published_marks / self.possible_marks * 100, 2) if self.possible_marks else 0
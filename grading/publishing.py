@@ -0,0 +1,110 @@
+import logging
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from application.models import ApplicationMember
+from assessment.models import Assessment, StudentSubmission
+from defaults import background, dashboard_cache
+from defaults.notifications import NotificationBatch
+from . import results
+from .models import PublishEvent
+
+logger = logging.getLogger(__name__)
+
+# A pending or running event older than this lost its job, e.g. to a restart, and may be retried
+PUBLISH_TIMEOUT = timedelta(seconds=getattr(settings, 'PUBLISH_TIMEOUT', 15 * 60))
+
+
+def start_publish(assessment, user):
+    """Record a publish event and run it on the worker pool once the request's transaction commits."""
+    event = PublishEvent.objects.create(assessment=assessment, published_by=user)
+    background.run_after_commit(run_publish, event.id)
+    return event
+
+
+def _stalled():
+    # Events whose job was lost with its process: the worker pool keeps
+    # nothing across restarts, so they would stay pending or running for good
+    cutoff = timezone.now() - PUBLISH_TIMEOUT
+    return Q(status='pending', queued_at__lt=cutoff) | Q(status='running', started_at__lt=cutoff)
+
+
+def can_retry(event):
+    return PublishEvent.objects.filter(Q(status='failed') | _stalled(), pk=event.pk).exists()
+
+
+def retry_publish(event):
+    """
+    Queue a failed or stalled event again. Publishing only touches what is
+    still unpublished, so reruns are safe.
+    """
+    retryable = PublishEvent.objects.filter(Q(status='failed') | _stalled(), pk=event.pk)
+    if retryable.update(status='pending', error='', queued_at=timezone.now()):
+        background.run_after_commit(run_publish, event.id)
+        return True
+    return False
+
+
+def requeue_stalled():
+    """Run every stalled event again, in this process. Returns how many were published."""
+    published = 0
+    for event_id in PublishEvent.objects.filter(_stalled()).values_list('pk', flat=True):
+        # Same condition again, so two runs of the command never take the same event
+        if not PublishEvent.objects.filter(_stalled(), pk=event_id).update(status='pending', queued_at=timezone.now()):
+            continue
+        try:
+            if run_publish(event_id) is not None:
+                published += 1
+        except Exception as e:
+            logger.exception("Publish event %s failed again", event_id)
+    return published
+
+
+def run_publish(event_id):
+    """
+    Publish every graded, unpublished submission of the event's assessment
+    and notify the members of the affected applications, all in one
+    transaction. Returns the event, or None when another run already claimed it.
+    """
+    # Claim the event so a duplicate job for it does nothing
+    if not PublishEvent.objects.filter(pk=event_id, status='pending').update(status='running', started_at=timezone.now()):
+        return None
+    event = PublishEvent.objects.select_related('assessment').get(pk=event_id)
+    try:
+        with transaction.atomic():
+            # Runs for the same assessment take turns, so no submission is announced twice
+            assessment = Assessment.objects.select_for_update().get(pk=event.assessment_id)
+            submissions = StudentSubmission.objects.filter(
+                assignment=assessment, grades_received__isnull=False,
+            ).exclude(published_status='published')
+            application_ids = set(submissions.values_list('application_id', flat=True))
+            published = submissions.update(published_status='published')
+
+            # Group grades reach every member of the group
+            students = list(
+                ApplicationMember.objects.filter(application_id__in=application_ids).values_list('user_id', flat=True)
+            )
+            notified = NotificationBatch().add(
+                students,
+                f"Grades for '{assessment.title}' have been published.",
+                url=reverse('student_view_assignment'),
+            ).send(defer=False)
+
+            # update() sends no signals, so the students' cached dashboards are dropped here
+            transaction.on_commit(partial(dashboard_cache.bump_version, 'assessment.StudentSubmission'))
+            # Published totals on the students' results
+            transaction.on_commit(partial(results.refresh_final_marks, assessment.schema_id, students))
+
+            event.status = 'done'
+            event.finished_at = timezone.now()
+            event.submissions_published = published
+            event.students_notified = notified
+            event.save(update_fields=['status', 'finished_at', 'submissions_published', 'students_notified'])
+    except Exception as e:
+        PublishEvent.objects.filter(pk=event_id).update(status='failed', error=str(e), finished_at=timezone.now())
+        raise
+    return event
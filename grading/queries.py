@@ -0,0 +1,157 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils.dateparse import parse_datetime
+from application.models import Application
+from assessment.models import Assessment, StudentSubmission
+
+
+def expected_totals():
+    """
+    Submissions expected per submission type, in one query: one per accepted
+    student for individual assessments, one per accepted group otherwise.
+    """
+    totals = Application.objects.filter(status='accepted').aggregate(
+        individual=Count('members'),
+        group=Count('id', filter=Q(application_type='group'), distinct=True),
+    )
+    return totals
+
+
+def expected_total(assessment, totals=None):
+    totals = totals or expected_totals()
+    return totals['individual'] if assessment.submission_type == 'individual' else totals['group']
+
+
+def latest_attempts(queryset=None):
+    """
+    Submissions that are the newest attempt of their owner for their
+    assessment: the application's for group assessments, each student's own
+    for individual ones.
+    """
+    submissions = queryset if queryset is not None else StudentSubmission.objects.all()
+    return submissions.filter(is_latest=True)
+
+
+def sync_latest_flags(queryset=None):
+    """
+    Recompute is_latest for the given submissions in one UPDATE, e.g. after
+    rows were bulk inserted or deleted. Returns the number of rows updated.
+    """
+    submissions = queryset if queryset is not None else StudentSubmission.objects.all()
+    # Equal attempt numbers, left by old double submits, go to the newer row
+    later_attempt = StudentSubmission.objects.filter(
+        Q(attempt_number__gt=OuterRef('attempt_number'))
+        | Q(attempt_number=OuterRef('attempt_number'), pk__gt=OuterRef('pk')),
+        StudentSubmission.same_owner(OuterRef('submitted_by')),
+        application=OuterRef('application'),
+        assignment=OuterRef('assignment'),
+    )
+    with transaction.atomic():
+        # Cleared before set, so no moment has two latest attempts for the unique constraint
+        cleared = submissions.filter(Exists(later_attempt), is_latest=True).update(is_latest=False)
+        flagged = submissions.filter(~Exists(later_attempt), is_latest=False).update(is_latest=True)
+    return cleared + flagged
+
+
+def grading_overview(assessments=None):
+    """
+    Assessments annotated with their submission figures in a single statement:
+    submitted, graded and late attempts, plus latest attempts (one per
+    application, or per student for individual assessments) and how many of
+    those still need a grade.
+    """
+    assessments = assessments if assessments is not None else Assessment.objects.all()
+    return assessments.annotate(
+        total_submissions=Count('studentsubmission'),
+        graded_submissions=Count('studentsubmission', filter=Q(studentsubmission__grades_received__isnull=False)),
+        late_submissions=Count('studentsubmission', filter=Q(studentsubmission__is_late=True)),
+        latest_submissions=Count('studentsubmission', filter=Q(studentsubmission__is_latest=True)),
+        latest_ungraded=Count('studentsubmission', filter=Q(
+            studentsubmission__is_latest=True, studentsubmission__grades_received__isnull=True,
+        )),
+    )
+
+
+# Grading queue
+
+QUEUE_PAGE_SIZE = 25
+
+
+def submission_summary(assessment):
+    """Submitted, graded and published counts for an assessment from one aggregate."""
+    return StudentSubmission.objects.filter(assignment=assessment).aggregate(
+        total=Count('id'),
+        graded=Count('id', filter=Q(grades_received__isnull=False)),
+        published=Count('id', filter=Q(published_status='published')),
+    )
+
+
+def grading_queue(assessment, ungraded=False, late=False, latest=False, project=None, supervisor=None):
+    """Submissions for an assessment with the queue filters applied, newest first."""
+    submissions = StudentSubmission.objects.filter(assignment=assessment)
+    if ungraded:
+        submissions = submissions.filter(grades_received__isnull=True)
+    if late:
+        submissions = submissions.filter(is_late=True)
+    if latest:
+        submissions = latest_attempts(submissions)
+    if project:
+        submissions = submissions.filter(application__project_id=project)
+    if supervisor:
+        submissions = submissions.filter(application__project__supervisor_id=supervisor)
+    return submissions.order_by('-submitted_at', '-id')
+
+
+def encode_cursor(submission):
+    raw = f"{submission.submitted_at.isoformat()}|{submission.pk}"
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (submitted_at, id) or None when the cursor is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        submitted_at, pk = raw.rsplit('|', 1)
+        submitted_at = parse_datetime(submitted_at)
+        if submitted_at is None:
+            return None
+        return submitted_at, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def queue_page(submissions, after=None, before=None, size=QUEUE_PAGE_SIZE):
+    """
+    One page of a queue ordered newest first, using keyset pagination on
+    (submitted_at, id): `after` continues past the last row of the previous
+    page, `before` goes back from the first row of the next one. Only the
+    page itself (plus one row to detect more) is read, whatever the cohort size.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    if before:
+        submitted_at, pk = before
+        rows = list(
+            submissions.filter(Q(submitted_at__gt=submitted_at) | Q(submitted_at=submitted_at, id__gt=pk))
+            .order_by('submitted_at', 'id')[:size + 1]
+        )
+        has_previous = len(rows) > size
+        items = list(reversed(rows[:size]))
+        has_next = True
+    else:
+        if after:
+            submitted_at, pk = after
+            submissions = submissions.filter(
+                Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__lt=pk)
+            )
+        rows = list(submissions[:size + 1])
+        has_next = len(rows) > size
+        items = rows[:size]
+        has_previous = after is not None
+    return {
+        'items': items,
+        'next_cursor': encode_cursor(items[-1]) if items and has_next else None,
+        'previous_cursor': encode_cursor(items[0]) if items and has_previous else None,
+    }
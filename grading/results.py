@@ -0,0 +1,127 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from application.models import ApplicationMember
+from assessment.models import AssessmentSchema, StudentSubmission
+from .models import FinalMark
+
+MARK_FIELDS = ['application', 'total_marks', 'published_marks', 'possible_marks', 'graded_assessments', 'grades']
+ROW_FIELDS = ('id', 'application_id', 'submitted_by_id', 'assignment_id', 'grades_received', 'is_late', 'published_status')
+
+
+def _latest_graded(submissions, *owners):
+    """Graded submissions with no later graded attempt by the same owner (application, or student within it)."""
+    later_graded = StudentSubmission.objects.filter(
+        assignment=OuterRef('assignment'),
+        grades_received__isnull=False,
+        attempt_number__gt=OuterRef('attempt_number'),
+        **{owner: OuterRef(owner) for owner in owners}
+    )
+    return submissions.filter(grades_received__isnull=False).filter(~Exists(later_graded)).values(*ROW_FIELDS)
+
+
+def compute_final_marks(schema, student_ids=None):
+    """
+    Unsaved FinalMark rows for the schema's cohort, or just the given
+    students. Group assessments count the latest graded attempt of the
+    student's application for every member; individual assessments count the
+    student's own latest graded attempt for that application. Students with no
+    accepted application get no row. Reads the whole cohort in four queries.
+    """
+    assessments = list(schema.assessments.all())
+    possible = sum(assessment.weight for assessment in assessments)
+    group_ids = [assessment.id for assessment in assessments if assessment.submission_type == 'group']
+    individual_ids = [assessment.id for assessment in assessments if assessment.submission_type != 'group']
+
+    memberships = ApplicationMember.objects.filter(application__status='accepted')
+    if student_ids is not None:
+        memberships = memberships.filter(user_id__in=student_ids)
+    application_of = {}
+    members = defaultdict(list)
+    for user_id, application_id in memberships.values_list('user_id', 'application_id'):
+        application_of[user_id] = application_id
+        members[application_id].append(user_id)
+
+    group_rows = _latest_graded(
+        StudentSubmission.objects.filter(assignment_id__in=group_ids, application_id__in=memberships.values('application_id')),
+        'application',
+    )
+    # Only students in the cohort, and only what they submitted for their current application
+    individual_submissions = StudentSubmission.objects.filter(assignment_id__in=individual_ids).filter(
+        Exists(memberships.filter(user_id=OuterRef('submitted_by'), application_id=OuterRef('application')))
+    )
+    individual_rows = _latest_graded(individual_submissions, 'application', 'submitted_by')
+
+    grades = {user_id: {} for user_id in application_of}
+
+    def record(user_id, row):
+        grades[user_id][str(row['assignment_id'])] = {
+            'submission': row['id'],
+            'grade': row['grades_received'],
+            'late': row['is_late'],
+            'published': row['published_status'] == 'published',
+        }
+
+    for row in group_rows:
+        for user_id in members[row['application_id']]:
+            record(user_id, row)
+    for row in individual_rows:
+        record(row['submitted_by_id'], row)
+
+    marks = []
+    for user_id, entries in grades.items():
+        marks.append(FinalMark(
+            schema=schema,
+            student_id=user_id,
+            application_id=application_of.get(user_id),
+            total_marks=sum(entry['grade'] for entry in entries.values()),
+            published_marks=sum(entry['grade'] for entry in entries.values() if entry['published']),
+            possible_marks=possible,
+            graded_assessments=len(entries),
+            grades=entries,
+        ))
+    return marks
+
+
+def refresh_final_marks(schema_id, student_ids=None):
+    """Recompute and store the final marks of a schema, for everyone or for the given students."""
+    schema = AssessmentSchema.objects.filter(pk=schema_id).first()
+    if schema is None:
+        return []
+    if student_ids is not None:
+        student_ids = set(student_ids)
+    marks = compute_final_marks(schema, student_ids)
+    with transaction.atomic():
+        FinalMark.objects.bulk_create(
+            marks, batch_size=500,
+            update_conflicts=True, unique_fields=['schema', 'student'], update_fields=MARK_FIELDS,
+        )
+        # Students who left the cohort lose their row
+        existing = FinalMark.objects.filter(schema=schema)
+        if student_ids is not None:
+            existing = existing.filter(student_id__in=student_ids)
+        stale = set(existing.values_list('student_id', flat=True)) - {mark.student_id for mark in marks}
+        if stale:
+            FinalMark.objects.filter(schema=schema, student_id__in=stale).delete()
+    return marks
+
+
+def refresh_student_marks(student_ids):
+    """Recompute the given students' final marks in every schema, e.g. after they join or leave a group."""
+    for schema_id in AssessmentSchema.objects.values_list('pk', flat=True):
+        refresh_final_marks(schema_id, student_ids)
+
+
+def rebuild_final_marks():
+    """Recompute every schema's final marks for the whole cohort."""
+    for schema_id in AssessmentSchema.objects.values_list('pk', flat=True):
+        refresh_final_marks(schema_id)
+
+
+def get_final_mark(user, schema):
+    """A student's stored final mark, computed on first use."""
+    mark = FinalMark.objects.filter(schema=schema, student=user).first()
+    if mark is None:
+        marks = refresh_final_marks(schema.pk, [user.pk])
+        mark = marks[0] if marks else None
+    return mark
@@ -0,0 +1,137 @@
+import time
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from assessment.models import StudentSubmission
+from .queries import latest_attempts
+
+STATISTICS_TIMEOUT = getattr(settings, 'GRADE_STATISTICS_TIMEOUT', 60 * 60)
+
+VERSION_KEY = 'grading:grades:version:{}'
+STATISTICS_KEY = 'grading:statistics:{}:{}'
+
+PERCENTILES = (10, 25, 75, 90)
+
+# A supervisor's average is flagged for moderation when it is this many
+# standard errors away from the cohort average, with at least MIN_GROUP grades
+OUTLIER_Z = 2.0
+MIN_GROUP = 3
+
+
+def grade_version(assessment_id):
+    key = VERSION_KEY.format(assessment_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_grade_version(assessment_id):
+    """Called after grades of the assessment change, cached statistics are then rebuilt on next read."""
+    key = VERSION_KEY.format(assessment_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def _number(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def _summary(grades, late, weight):
+    """Figures for one set of latest attempts; `grades` is NaN where not graded yet."""
+    graded = grades[~np.isnan(grades)]
+    summary = {
+        'submissions': int(grades.size),
+        'graded': int(graded.size),
+        'late_ratio': _number(late.mean() if late.size else np.nan, 3),
+        'mean': None, 'median': None, 'std': None, 'min': None, 'max': None,
+        'mean_percent': None,
+        'percentiles': {str(p): None for p in PERCENTILES},
+    }
+    if graded.size:
+        quantiles = np.percentile(graded, (50,) + PERCENTILES)
+        summary.update({
+            'mean': _number(graded.mean()),
+            'median': _number(quantiles[0]),
+            'std': _number(graded.std()),
+            'min': _number(graded.min()),
+            'max': _number(graded.max()),
+            'mean_percent': _number(graded.mean() * 100 / weight) if weight else None,
+            'percentiles': {str(p): _number(q) for p, q in zip(PERCENTILES, quantiles[1:])},
+        })
+    return summary
+
+
+def compute_grade_statistics(assessment):
+    """
+    Mean, median, spread, percentiles and late ratio of an assessment's latest
+    attempts (every member's own on individual assessments), overall and per
+    supervisor, plus moderation outliers. Grades are read with one values_list
+    query and all figures computed on numpy arrays.
+    """
+    rows = list(
+        latest_attempts(StudentSubmission.objects.filter(assignment=assessment))
+        .values_list('id', 'grades_received', 'is_late', 'application__project__supervisor_id',
+                     'application__project__supervisor__first_name', 'application__project__supervisor__last_name',
+                     'application__project__supervisor__username')
+    )
+    statistics = {'assessment': assessment.id, 'weight': assessment.weight}
+    if not rows:
+        empty = np.array([], dtype=float)
+        statistics.update({'overall': _summary(empty, empty.astype(bool), assessment.weight),
+                           'supervisors': [], 'outlier_submissions': []})
+        return statistics
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    grades = np.fromiter((np.nan if row[1] is None else row[1] for row in rows), dtype=float, count=len(rows))
+    late = np.fromiter((row[2] for row in rows), dtype=bool, count=len(rows))
+    supervisor_ids = np.fromiter((row[3] or 0 for row in rows), dtype=np.int64, count=len(rows))
+    names = {row[3]: f"{row[4]} {row[5]}".strip() or row[6] for row in rows}
+
+    overall = _summary(grades, late, assessment.weight)
+    statistics['overall'] = overall
+
+    # Individual grades outside 1.5 IQR of the middle half
+    graded_mask = ~np.isnan(grades)
+    outliers = []
+    if graded_mask.sum() >= 4:
+        q1, q3 = np.percentile(grades[graded_mask], (25, 75))
+        spread = 1.5 * (q3 - q1)
+        with np.errstate(invalid='ignore'):
+            outlier_mask = graded_mask & ((grades < q1 - spread) | (grades > q3 + spread))
+        outliers = [int(pk) for pk in ids[outlier_mask]]
+    statistics['outlier_submissions'] = outliers
+
+    # Per supervisor, flagging averages far from the cohort average
+    cohort_mean = overall['mean']
+    cohort_std = overall['std']
+    supervisors = []
+    groups, inverse = np.unique(supervisor_ids, return_inverse=True)
+    for index, supervisor_id in enumerate(groups):
+        mask = inverse == index
+        summary = _summary(grades[mask], late[mask], assessment.weight)
+        z_score = None
+        if summary['graded'] >= MIN_GROUP and cohort_std:
+            z_score = _number((summary['mean'] - cohort_mean) / (cohort_std / np.sqrt(summary['graded'])))
+        summary.update({
+            'supervisor_id': int(supervisor_id) or None,
+            'supervisor': names.get(int(supervisor_id) or None) or 'Unassigned',
+            'z_score': z_score,
+            'moderate': z_score is not None and abs(z_score) >= OUTLIER_Z,
+        })
+        supervisors.append(summary)
+    statistics['supervisors'] = supervisors
+    return statistics
+
+
+def get_grade_statistics(assessment):
+    """Statistics for an assessment, cached until its grades change."""
+    key = STATISTICS_KEY.format(assessment.id, grade_version(assessment.id))
+    statistics = cache.get(key)
+    if statistics is None:
+        statistics = compute_grade_statistics(assessment)
+        cache.set(key, statistics, STATISTICS_TIMEOUT)
+    return statistics
@@ -1,3 +1,155 @@
+from datetime import date, timedelta
+from unittest import mock
+from django.db import connection
 from django.test import TestCase
+from accounts.models import Student, User
+from application.models import Application, ApplicationMember
+from assessment.models import Assessment, AssessmentSchema, StudentSubmission
+from projects.models import Project
+from . import results
+from .bulk import validate_grade_rows
+from .queries import grading_overview, sync_latest_flags
+from .statistics import compute_grade_statistics
 
-# Create your tests here.
+
+class GroupApplicationTestCase(TestCase):
+    """A group application of Alice and Bob, with an individual and a group assessment."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = User.objects.create_user('sup', 'sup@example.com', 'pw', is_staff=True)
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        project = Project.objects.create(
+            title='Project', project_type='Research', prerequisites='-', description='-', supervisor=cls.supervisor,
+        )
+        cls.schema = AssessmentSchema.objects.create(name='Schema', start_date=date.today(), end_date=date.today())
+        due = date.today() + timedelta(days=7)
+        cls.individual = Assessment.objects.create(
+            schema=cls.schema, title='Reflection', weight=50, submission_type='individual', due_date=due, submit_by=due,
+        )
+        cls.group = Assessment.objects.create(
+            schema=cls.schema, title='Report', weight=50, submission_type='group', due_date=due, submit_by=due,
+        )
+        cls.application = Application.objects.create(project=project, application_type='group', status='accepted')
+        ApplicationMember.objects.create(application=cls.application, user=cls.alice, is_leader=True)
+        ApplicationMember.objects.create(application=cls.application, user=cls.bob)
+
+    def submit(self, student, assessment, **fields):
+        return StudentSubmission.objects.create(
+            application=self.application, assignment=assessment, submitted_by=student,
+            attempt_number=StudentSubmission.next_attempt_number(self.application, assessment, student), **fields
+        )
+
+    def latest(self, *submissions):
+        return [StudentSubmission.objects.get(pk=submission.pk).is_latest for submission in submissions]
+
+
+class LatestAttemptTests(GroupApplicationTestCase):
+
+    def test_individual_attempts_are_latest_per_student(self):
+        alice = self.submit(self.alice, self.individual)
+        bob = self.submit(self.bob, self.individual)
+        self.assertEqual(self.latest(alice, bob), [True, True])
+        self.assertEqual(bob.attempt_number, 1)
+
+        alice_again = self.submit(self.alice, self.individual)
+        self.assertEqual(alice_again.attempt_number, 2)
+        self.assertEqual(self.latest(alice, bob, alice_again), [False, True, True])
+        self.assertEqual(grading_overview().get(pk=self.individual.pk).latest_submissions, 2)
+
+    def test_group_attempts_are_latest_per_application(self):
+        alice = self.submit(self.alice, self.group)
+        bob = self.submit(self.bob, self.group)
+        self.assertEqual(bob.attempt_number, 2)
+        self.assertEqual(self.latest(alice, bob), [False, True])
+        self.assertEqual(grading_overview().get(pk=self.group.pk).latest_submissions, 1)
+
+    def test_deleting_promotes_the_students_previous_attempt(self):
+        alice = self.submit(self.alice, self.individual)
+        bob = self.submit(self.bob, self.individual)
+        self.submit(self.alice, self.individual).delete()
+        self.assertEqual(self.latest(alice, bob), [True, True])
+
+    def test_sync_agrees_with_save(self):
+        self.submit(self.alice, self.individual)
+        self.submit(self.bob, self.individual)
+        self.submit(self.alice, self.individual)
+        self.submit(self.alice, self.group)
+        self.submit(self.bob, self.group)
+        self.assertEqual(sync_latest_flags(), 0)
+
+        StudentSubmission.objects.update(is_latest=False)
+        sync_latest_flags()
+        self.assertEqual(StudentSubmission.objects.filter(assignment=self.individual, is_latest=True).count(), 2)
+        self.assertEqual(StudentSubmission.objects.filter(assignment=self.group, is_latest=True).count(), 1)
+
+
+class GradeStatisticsTests(GroupApplicationTestCase):
+
+    def test_every_members_individual_grade_counts(self):
+        self.submit(self.alice, self.individual, grades_received=10)
+        self.submit(self.alice, self.individual, grades_received=30)
+        self.submit(self.bob, self.individual, grades_received=40)
+        overall = compute_grade_statistics(self.individual)['overall']
+        self.assertEqual((overall['submissions'], overall['graded']), (2, 2))
+        self.assertEqual(overall['mean'], 35.0)
+
+    def test_group_grade_counts_once(self):
+        self.submit(self.alice, self.group, grades_received=20)
+        self.submit(self.bob, self.group, grades_received=40)
+        overall = compute_grade_statistics(self.group)['overall']
+        self.assertEqual((overall['submissions'], overall['mean']), (1, 40.0))
+
+
+class BulkGradeTests(GroupApplicationTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Student.objects.create(user=cls.alice, student_id='S1')
+        Student.objects.create(user=cls.bob, student_id='S2')
+
+    def row(self, student, grade):
+        return {'row': 2, 'submission': '', 'student': student, 'grade': str(grade), 'feedback': ''}
+
+    def test_student_rows_grade_their_own_individual_attempt(self):
+        alice = self.submit(self.alice, self.individual)
+        bob = self.submit(self.bob, self.individual)
+        for identifier, submission in (('S1', alice), ('bob', bob), ('alice@example.com', alice)):
+            with self.subTest(identifier=identifier):
+                changes, unchanged, errors = validate_grade_rows(self.individual, [self.row(identifier, 30)])
+                self.assertEqual(errors, [])
+                self.assertEqual([change[0].pk for change in changes], [submission.pk])
+
+    def test_student_without_an_individual_attempt(self):
+        self.submit(self.bob, self.individual)
+        changes, unchanged, errors = validate_grade_rows(self.individual, [self.row('S1', 30)])
+        self.assertEqual(changes, [])
+        self.assertEqual(errors[0]['message'], "This student has not submitted this assessment.")
+
+    def test_any_member_names_the_group_attempt(self):
+        self.submit(self.alice, self.group)
+        latest = self.submit(self.bob, self.group)
+        changes, unchanged, errors = validate_grade_rows(self.group, [self.row('S1', 30)])
+        self.assertEqual([change[0].pk for change in changes], [latest.pk])
+
+
+class StudentMarkRefreshTests(GroupApplicationTestCase):
+
+    def setUp(self):
+        # setUpTestData's batch waits on the class transaction, which never commits
+        connection._signal_batch = None
+
+    def test_refresh_is_queued_once_per_transaction(self):
+        alice = ApplicationMember.objects.get(user=self.alice)
+        with mock.patch.object(results, 'refresh_student_marks') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.application.save()
+                self.application.save()
+                alice.save()
+                alice.save()
+        self.assertCountEqual(
+            [call.args for call in refresh.call_args_list],
+            [(frozenset({self.alice.pk, self.bob.pk}),), (frozenset({self.alice.pk}),)],
+        )
@@ -8,6 +8,10 @@ urlpatterns = [
 
     # path('', views.assessment_list, name='assessment_list'),
     path('assessments/<int:assessment_id>/', views.assessment_detail, name='assessment_detail'),
+    path('assessments/<int:assessment_id>/statistics/', views.assessment_statistics, name='assessment_statistics'),
+    path('assessments/<int:assessment_id>/bulk/', views.bulk_grade, name='bulk_grade'),
+    path('assessments/<int:assessment_id>/download/', views.download_submissions, name='download_submissions'),
+    path('schemas/<int:schema_id>/gradebook/', views.export_gradebook, name='export_gradebook'),
     path('submissions/<int:submission_id>/grade/', views.grade_submission, name='grade_submission'),
     path('submissions/<int:submission_id>/files/', views.submission_files, name='submission_files'),
     path('publish_grade/<int:assessment_id>/', views.publish_grades, name='publish_grades'),
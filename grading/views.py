@@ -1,58 +1,54 @@
+import csv
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Count, Avg, Q
-from django.http import Http404, JsonResponse
-from assessment.models import Assessment, StudentSubmission
+from django.http import Http404, HttpResponse, JsonResponse
+from assessment.models import Assessment, AssessmentSchema, StudentSubmission
 from projects.models import Project
 from .forms import GradeSubmissionForm
+from .distribution import grade_distribution
+from .downloads import submission_archive_members
+from .gradebook import ensure_final_marks, gradebook_rows
+from .publishing import can_retry, retry_publish, start_publish
+from .statistics import get_grade_statistics
+from .bulk import GradeImportError, apply_grades, read_grade_file, read_grade_grid, validate_grade_rows
+from .queries import (
+    expected_total, expected_totals, grading_overview, grading_queue, latest_attempts, queue_page,
+    submission_summary,
+)
 from django.urls import reverse
-from defaults.models import Notification  
+from django.utils.text import slugify
+from defaults.notifications import notify
+from defaults.streaming import stream_csv, stream_xlsx, stream_zip, streaming_download
 from application.models import *
 from defaults.decorators import *
 
 @login_required
 def assessment_list(request):
+    # Expected totals are the same for every assessment of a type, count them once
+    totals = expected_totals()
     assessments = []
 
-    for assessment in Assessment.objects.all().prefetch_related('detail_files', 'sample_files'):
-        # Total expected submissions
-        if assessment.submission_type == "individual":
-            expected_total = ApplicationMember.objects.filter(
-                application__status="accepted"
-            ).count()
-        else:  # group
-            expected_total = Application.objects.filter(
-                status="accepted",
-                application_type="group"
-            ).count()
-
-        # Total submitted
-        submitted_total = StudentSubmission.objects.filter(assignment=assessment).count()
-
-        # Total graded
-        graded_total = StudentSubmission.objects.filter(
-            assignment=assessment,
-            grades_received__isnull=False
-        ).count()
-
-        # Left to grade
-        left_to_grade = submitted_total - graded_total
-
+    # Submitted, graded and late counts for every assessment in one statement
+    for assessment in grading_overview().order_by('due_date', 'id'):
         assessments.append({
             'assessment': assessment,
             'title': assessment.title,
             'due_date': assessment.due_date,
             'weight': assessment.weight,
             'submission_type': assessment.submission_type,
-            'total_submissions': submitted_total,
-            'graded_submissions': graded_total,
-            'expected_total': expected_total,
-            'left_to_grade': left_to_grade,
+            'total_submissions': assessment.total_submissions,
+            'graded_submissions': assessment.graded_submissions,
+            'late_submissions': assessment.late_submissions,
+            'latest_submissions': assessment.latest_submissions,
+            'expected_total': expected_total(assessment, totals),
+            'left_to_grade': assessment.total_submissions - assessment.graded_submissions,
         })
 
     context = {
         'assessments': assessments,
+        'schemas': AssessmentSchema.objects.order_by('-start_date', '-id'),
         'title': 'Assessments for Grading'
     }
     return render(request, 'grading/assessment_list.html', context)
@@ -61,73 +57,101 @@ from django.shortcuts import get_object_or_404, render
 from django.contrib.auth.decorators import login_required
 from datetime import date
 
+def _int_param(request, name):
+    value = request.GET.get(name, '')
+    return int(value) if value.isdigit() else None
+
+
+def _queue_filters(request):
+    return {
+        'ungraded': request.GET.get('ungraded') == '1',
+        'late': request.GET.get('late') == '1',
+        'latest': request.GET.get('latest') == '1',
+        'project': _int_param(request, 'project'),
+        'supervisor': _int_param(request, 'supervisor'),
+    }
+
+
 @login_required
 @is_supervisor
 def assessment_detail(request, assessment_id):
-    """Show all submissions for a specific assessment"""
+    """Summary and a paginated, filterable grading queue for an assessment"""
     assessment = get_object_or_404(Assessment, id=assessment_id)
-    submissions = StudentSubmission.objects.filter(
-        assignment=assessment
-    ).select_related(
-        'submitted_by',
-        'application__project'
-    ).order_by('-submitted_at')
 
-    # Calculate average grade
-    avg_grade = submissions.aggregate(Avg('grades_received'))['grades_received__avg']
+    # Grade distribution, graded count and average in one query
+    distribution = grade_distribution(assessment=assessment)
+    graded_submissions = distribution['graded']
 
-    # Total submissions
-    total_submissions = submissions.count()
+    # Average grade in marks (the distribution average is a percentage of the weight)
+    avg_grade = None
+    if graded_submissions:
+        avg_grade = round(distribution['average'] * assessment.weight / 100, 2)
 
-    # Total graded submissions
-    graded_submissions = submissions.filter(grades_received__isnull=False).count()
+    # Total and published submissions in one aggregate
+    summary = submission_summary(assessment)
+    total_submissions = summary['total']
 
     # Left to grade
     left_to_grade = total_submissions - graded_submissions
 
     # Total expected submissions
-    if assessment.submission_type == "individual":
-        expected_total = ApplicationMember.objects.filter(
-            application__status="accepted"
-        ).count()
-    else:  # group
-        expected_total = Application.objects.filter(
-            status="accepted",
-            application_type="group"
-        ).count()
+    expected = expected_total(assessment)
 
     # Grading progress %
     grading_progress = (graded_submissions / total_submissions * 100) if total_submissions > 0 else 0
 
     # Published status
-    published_status = 'unpublished'
-    for sub in submissions:
-        if sub.published_status == 'published':
-            published_status = 'published'
+    published_status = 'published' if summary['published'] else 'unpublished'
     today = date.today()
     can_publish = False
     if assessment.submit_by and assessment.submit_by <= today:
         can_publish = True    
-    if expected_total == total_submissions:
+    if expected == total_submissions:
         can_publish = True
 
+    # Grading queue: filters from the query string, one page at a time
+    filters = _queue_filters(request)
+    queue = grading_queue(assessment, **filters).select_related('submitted_by', 'application__project')
+    page = queue_page(queue, after=request.GET.get('after'), before=request.GET.get('before'))
+
+    # Query string without the cursor, so the page links keep the filters
+    query = request.GET.copy()
+    for key in ('after', 'before'):
+        query.pop(key, None)
+
     context = {
         'assessment': assessment,
         'can_publish': can_publish,
-        'submissions': submissions,
+        'submissions': page['items'],
+        'next_cursor': page['next_cursor'],
+        'previous_cursor': page['previous_cursor'],
+        'filters': filters,
+        'filter_query': query.urlencode(),
+        'projects': Project.objects.filter(applications__studentsubmission__assignment=assessment).distinct().order_by('title'),
+        'supervisors': User.objects.filter(project__applications__studentsubmission__assignment=assessment).distinct().order_by('first_name', 'last_name'),
         'avg_grade': avg_grade,
+        'grade_ranges': distribution['ranges'],
         'total_submissions': total_submissions,
         'graded_submissions': graded_submissions,
         'left_to_grade': left_to_grade,
-        'expected_total': expected_total,
+        'expected_total': expected,
         'published_status': published_status,
         'grading_progress': grading_progress,
+        'statistics': get_grade_statistics(assessment),
         'title': f'Submissions for {assessment.title}'
     }
 
     return render(request, 'grading/assessment_detail.html', context)
 
 
+@login_required
+@is_supervisor
+def assessment_statistics(request, assessment_id):
+    """Grade statistics of an assessment as JSON"""
+    assessment = get_object_or_404(Assessment, id=assessment_id)
+    return JsonResponse(get_grade_statistics(assessment))
+
+
 @login_required
 @is_supervisor
 def grade_submission(request, submission_id):
@@ -144,9 +168,9 @@ def grade_submission(request, submission_id):
         form = GradeSubmissionForm(request.POST, instance=submission)
         if form.is_valid():
             form.save()
-            Notification.objects.create(
-                user=submission.submitted_by,  
-                message=f"Your submission for '{submission.assignment.title}' has been graded.",
+            notify(
+                submission.submitted_by_id,
+                f"Your submission for '{submission.assignment.title}' has been graded.",
                 url=reverse('grading:assessment_detail', args=[submission.assignment.id])
             )
 
@@ -164,6 +188,112 @@ def grade_submission(request, submission_id):
     }
     return render(request, 'grading/grade_submission.html', context)
 
+@login_required
+@is_supervisor
+def bulk_grade(request, assessment_id):
+    """Grade many submissions at once from a CSV/XLSX upload or the batch entry grid"""
+    assessment = get_object_or_404(Assessment, id=assessment_id)
+    latest = (
+        latest_attempts(StudentSubmission.objects.filter(assignment=assessment))
+        .select_related('submitted_by', 'application__project')
+        .order_by('submitted_by__first_name', 'submitted_by__last_name', 'id')
+    )
+
+    # Prefilled sheet for markers who grade offline
+    if request.GET.get('template') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="grades-{assessment.id}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['submission_id', 'student', 'project', 'attempt', 'grade', 'feedback'])
+        for submission in latest:
+            writer.writerow([
+                submission.id, submission.submitted_by.username, submission.application.project.title,
+                submission.attempt_number, submission.grades_received if submission.grades_received is not None else '',
+                submission.feedback or '',
+            ])
+        return response
+
+    report = None
+    posted = {}
+    if request.method == 'POST':
+        try:
+            if request.FILES.get('file'):
+                rows = read_grade_file(request.FILES['file'])
+            else:
+                rows = read_grade_grid(request.POST)
+                posted = request.POST
+        except GradeImportError as e:
+            messages.error(request, str(e))
+            rows = None
+
+        if rows is not None:
+            changes, unchanged, errors = validate_grade_rows(assessment, rows)
+            # Nothing is saved while any row is wrong, unless the marker asked to skip those rows
+            applied = 0
+            if changes and (not errors or request.POST.get('skip_invalid') == '1'):
+                applied = apply_grades(assessment, changes)
+            report = {
+                'rows': len(rows),
+                'applied': applied,
+                'valid': len(changes),
+                'unchanged': len(unchanged),
+                'errors': errors,
+            }
+            if applied:
+                messages.success(request, f'Saved grades for {applied} submission(s).')
+                if not errors:
+                    return redirect('grading:assessment_detail', assessment_id=assessment.id)
+            elif errors:
+                messages.error(request, 'No grades were saved, fix the rows below and upload again.')
+            else:
+                messages.info(request, 'No grades changed.')
+
+    # Grid rows, keeping what the marker typed when the batch was rejected
+    grid = []
+    for submission in latest:
+        grid.append({
+            'submission': submission,
+            'grade': posted.get(f'grade_{submission.id}', submission.grades_received if submission.grades_received is not None else ''),
+            'feedback': posted.get(f'feedback_{submission.id}', submission.feedback or ''),
+        })
+
+    context = {
+        'assessment': assessment,
+        'grid': grid,
+        'report': report,
+        'title': f'Bulk grading {assessment.title}'
+    }
+    return render(request, 'grading/bulk_grade.html', context)
+
+
+@login_required
+@is_supervisor
+def export_gradebook(request, schema_id):
+    """Gradebook for a schema as CSV or XLSX, streamed while it is read"""
+    schema = get_object_or_404(AssessmentSchema, id=schema_id)
+    try:
+        ensure_final_marks(schema)
+    except Exception as e:
+        messages.error(request, f"Could not compute the final marks: {e}")
+        return redirect('grading:grading')
+    rows = gradebook_rows(schema)
+    filename = f"gradebook-{slugify(schema.name) or schema.id}"
+    if request.GET.get('format') == 'xlsx':
+        return stream_xlsx(rows, f'{filename}.xlsx', sheet_name=schema.name)
+    return stream_csv(rows, f'{filename}.csv')
+
+
+@login_required
+@is_supervisor
+def download_submissions(request, assessment_id):
+    """ZIP of the submission files matching the queue filters, streamed as it is built"""
+    assessment = get_object_or_404(Assessment, id=assessment_id)
+    submissions = grading_queue(assessment, **_queue_filters(request))
+    archive = stream_zip(submission_archive_members(submissions))
+    filename = f"{slugify(assessment.title) or assessment.id}-submissions.zip"
+    return streaming_download(archive, filename, 'application/zip')
+
+
 #AJAX view for loading submission files in modal
 @login_required
 @is_supervisor
@@ -191,34 +321,30 @@ def publish_grades(request, assessment_id):
     Publish grades for an assessment with confirmation modal.
     """
     assessment = get_object_or_404(Assessment, id=assessment_id)
-    submissions = StudentSubmission.objects.filter(assignment=assessment)
 
     # Total expected submissions
-    if assessment.submission_type == "individual":
-        expected_total = ApplicationMember.objects.filter(
-            application__status="accepted"
-        ).count()
-    else:
-        expected_total = Application.objects.filter(
-            status="accepted",
-            application_type="group"
-        ).count()
-
-    submitted_total = submissions.count()
-    graded_total = submissions.filter(grades_received__isnull=False).count()
+    expected = expected_total(assessment)
 
-    pending_submissions = expected_total - submitted_total
-    ungraded_submissions = submitted_total - graded_total
+    # Submitted and graded counts in one aggregate
+    summary = submission_summary(assessment)
+    pending_submissions = expected - summary['total']
+    ungraded_submissions = summary['total'] - summary['graded']
+    last_event = assessment.publish_events.select_related('published_by').first()
 
     if request.method == "POST":
-        # Publish graded submissions
-        submissions.filter(grades_received__isnull=False).update(published_status='published')
-        messages.success(request, "Grades published successfully for all graded submissions.")
+        # Publishing and the notifications run in the background, the marker does not wait for them
+        if last_event and request.POST.get('retry') == str(last_event.id) and can_retry(last_event):
+            retry_publish(last_event)
+        else:
+            start_publish(assessment, request.user)
+        messages.success(request, "Grades are being published, students will be notified shortly.")
         return redirect('grading:assessment_detail', assessment_id=assessment.id)
 
     context = {
         'assessment': assessment,
         'pending_submissions': pending_submissions,
         'ungraded_submissions': ungraded_submissions,
+        'last_event': last_event,
+        'can_retry': last_event is not None and can_retry(last_event),
     }
     return render(request, 'grading/publish_grades_confirm.html', context)
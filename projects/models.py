@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from accounts.models import *
 from django.utils import timezone
+from defaults.models import FileMetadata
 
 
 class Project(models.Model):
@@ -32,7 +33,7 @@ class ProjectArea(models.Model):
 
 
 
-class ProjectFile(models.Model):
+class ProjectFile(FileMetadata):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='files')
     file = models.FileField(upload_to='project_files/%Y/%m/%d/')  # Organized storage
     display_name = models.CharField(max_length=255)
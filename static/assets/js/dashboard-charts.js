@@ -0,0 +1,31 @@
+// Loads dashboard chart data from the JSON endpoints after the page has rendered.
+// Responses carry an ETag and "Cache-Control: no-cache", so the browser
+// revalidates and the server answers 304 while the data is unchanged.
+function loadChartData(url, selector, render) {
+  var container = document.querySelector(selector);
+  if (!container) {
+    return;
+  }
+
+  fetch(url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error('HTTP ' + response.status);
+      }
+      return response.json();
+    })
+    .then(function (payload) {
+      var data = payload.data || [];
+      var hasData = data.some(function (item) { return item.count > 0; });
+      if (!hasData) {
+        container.innerHTML = '<div class="text-center py-4"><p class="text-muted">' +
+          (container.getAttribute('data-empty-message') || 'No data yet') + '</p></div>';
+        return;
+      }
+      render(container, data);
+    })
+    .catch(function (error) {
+      console.error('Error loading chart data:', error);
+      container.innerHTML = '<div class="text-center py-4"><p class="text-muted">Chart data unavailable</p></div>';
+    });
+}
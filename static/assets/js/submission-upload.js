@@ -0,0 +1,139 @@
+// Uploads submission files in chunks so a dropped connection only costs the
+// chunk in flight. Each chunk is sent with its SHA-256, and after a failure the
+// same file resumes its upload session, skipping the chunks the server already has.
+// Without fetch or Web Crypto the form falls back to a plain multipart POST.
+(function () {
+  var form = document.getElementById('submission-form');
+  if (!form || !window.fetch || !(window.crypto && window.crypto.subtle)) {
+    return;
+  }
+
+  var CHUNK_RETRIES = 3;
+  var csrfToken = form.querySelector('[name=csrfmiddlewaretoken]').value;
+  var input = form.querySelector('input[type=file]');
+  var button = form.querySelector('button[type=submit]');
+  var progress = document.getElementById('upload-progress');
+  var bar = progress.querySelector('.progress-bar');
+  var statusText = document.getElementById('upload-status');
+
+  function request(url, options) {
+    options = options || {};
+    options.credentials = 'same-origin';
+    options.headers = Object.assign({ 'X-CSRFToken': csrfToken, 'Accept': 'application/json' }, options.headers || {});
+    return fetch(url, options).then(function (response) {
+      return response.json().catch(function () { return {}; }).then(function (data) {
+        if (!response.ok) {
+          var error = new Error(data.error || 'HTTP ' + response.status);
+          error.status = response.status;
+          throw error;
+        }
+        return data;
+      });
+    });
+  }
+
+  function postJson(url, data) {
+    return request(url, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(data)
+    });
+  }
+
+  function toHex(buffer) {
+    return Array.prototype.map.call(new Uint8Array(buffer), function (byte) {
+      return ('0' + byte.toString(16)).slice(-2);
+    }).join('');
+  }
+
+  function wait(ms) {
+    return new Promise(function (resolve) { setTimeout(resolve, ms); });
+  }
+
+  function sendChunk(session, file, index, attempt) {
+    var start = index * session.chunk_size;
+    var blob = file.slice(start, Math.min(start + session.chunk_size, file.size));
+    return blob.arrayBuffer()
+      .then(function (buffer) {
+        return window.crypto.subtle.digest('SHA-256', buffer).then(function (digest) {
+          return request(session.url + 'chunks/' + index, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-Checksum': toHex(digest) },
+            body: buffer
+          });
+        });
+      })
+      .catch(function (error) {
+        // Network errors and server hiccups are retried with a growing pause
+        if (attempt >= CHUNK_RETRIES || (error.status && error.status < 500 && error.status !== 400)) {
+          throw error;
+        }
+        return wait(1000 * Math.pow(2, attempt)).then(function () {
+          return sendChunk(session, file, index, attempt + 1);
+        });
+      });
+  }
+
+  function uploadFile(file, report) {
+    var fingerprint = [file.name, file.size, file.lastModified].join(':');
+    return postJson(form.dataset.startUrl, { filename: file.name, size: file.size, fingerprint: fingerprint })
+      .then(function (session) {
+        var received = {};
+        session.received.forEach(function (index) { received[index] = true; });
+        var pending = [];
+        for (var index = 0; index < session.total_chunks; index++) {
+          if (!received[index]) {
+            pending.push(index);
+          }
+        }
+        report(session.total_chunks - pending.length, session.total_chunks);
+        return pending.reduce(function (previous, index) {
+          return previous.then(function () {
+            return sendChunk(session, file, index, 0).then(function (status) {
+              report(status.received.length, session.total_chunks);
+            });
+          });
+        }, Promise.resolve()).then(function () { return session.upload_id; });
+      });
+  }
+
+  form.addEventListener('submit', function (event) {
+    event.preventDefault();
+    var files = Array.prototype.slice.call(input.files);
+    if (!files.length) {
+      return;
+    }
+    var totalBytes = files.reduce(function (sum, file) { return sum + file.size; }, 0) || 1;
+    var doneBytes = 0;
+    var uploadIds = [];
+
+    button.disabled = true;
+    progress.classList.remove('d-none');
+    bar.classList.remove('bg-danger');
+
+    files.reduce(function (previous, file) {
+      return previous.then(function () {
+        return uploadFile(file, function (received, total) {
+          var fileBytes = total ? file.size * received / total : 0;
+          bar.style.width = Math.round(100 * (doneBytes + fileBytes) / totalBytes) + '%';
+          statusText.textContent = 'Uploading ' + file.name + ' (' + received + '/' + total + ' chunks)';
+        }).then(function (uploadId) {
+          doneBytes += file.size;
+          uploadIds.push(uploadId);
+        });
+      });
+    }, Promise.resolve())
+      .then(function () {
+        statusText.textContent = 'Checking files...';
+        return postJson(form.dataset.submitUrl, { uploads: uploadIds });
+      })
+      .then(function (data) {
+        window.location = data.redirect;
+      })
+      .catch(function (error) {
+        bar.classList.add('bg-danger');
+        statusText.textContent = error.message + ' Submit again to resume, finished chunks are not sent twice.';
+        button.disabled = false;
+      });
+  });
+})();
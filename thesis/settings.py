@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'defaults.middleware.QueryProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'thesis.urls'
@@ -134,9 +135,30 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # settings.py
 MEDIA_URL = '/media/'  # URL prefix for media files
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Path where files are stored
+# Submission files are served by a view that checks access (defaults/media.py).
+# In production set this to 'x-accel-redirect' (nginx, with an internal location
+# at MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile' (Apache, lighttpd)
+# so the web server sends the bytes; empty streams them from Django.
+MEDIA_DELIVERY = ''
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Files that must never be reachable under MEDIA_URL: submission and assessment
+# files (blobs/) and their previews. For 'x-accel-redirect' nginx needs an
+# internal location at PRIVATE_MEDIA_ACCEL_PREFIX aliased to PRIVATE_MEDIA_ROOT.
+PRIVATE_MEDIA_ROOT = os.path.join(BASE_DIR, 'private_media')
+PRIVATE_MEDIA_ACCEL_PREFIX = '/protected-private-media/'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-AUTH_USER_MODEL = 'accounts.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'accounts.User'
+
+# Per-request query profiling (defaults/middleware.py). Switch on to get query
+# counts and timings in response headers and at /profiling/queries/.
+QUERY_PROFILING = False
+# Raise instead of logging when a view goes over its @query_budget
+QUERY_BUDGET_RAISE = DEBUG
+
+# Create notifications on the background worker pool (defaults/background.py)
+# instead of inside the request
+DEFER_NOTIFICATIONS = False